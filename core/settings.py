@@ -100,6 +100,31 @@ DATABASES = {
     }
 }
 
+# Caches. "default" is per process (memo caches); "shared" is seen by every worker and
+# management command, for data produced in one process and read in others (weather,
+# `manage.py prefetch_weather`, memoized prices, cache counters): redis when SHARED_CACHE_URL is set (e.g. redis://127.0.0.1:6379/1,
+# needs the `redis` package), otherwise files under var/cache on this host
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("SHARED_CACHE_URL"),
+        }
+        if os.getenv("SHARED_CACHE_URL")
+        else {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": BASE_DIR / "var" / "cache",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    ),
+}
+
+# cross-process locks for one-at-a-time jobs (main/locks.py)
+LOCK_DIR = BASE_DIR / "var" / "locks"
+
 
 
 # Password validation
@@ -174,3 +199,136 @@ PROFANITY_API_TIMEOUT = 5  # seconds
 OPENMETEO_GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
 OPENMETEO_WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
 OPENMETEO_TIMEOUT = 5
+
+
+# ---- ML models ----
+# artist classifier is loaded lazily on the first prediction;
+# set ARTIST_MODEL_PRELOAD=1 on web workers to load it at boot instead
+ARTIST_MODEL_PRELOAD = os.getenv("ARTIST_MODEL_PRELOAD", "0") == "1"
+ARTIST_MODEL_IDLE_TIMEOUT = int(os.getenv("ARTIST_MODEL_IDLE_TIMEOUT", "900"))  # seconds, 0 = keep forever
+
+# micro-batching: concurrent predict_image calls share one forward pass
+# (useful with threaded workers; a sync worker never has two requests at once)
+ARTIST_BATCHING_ENABLED = os.getenv("ARTIST_BATCHING_ENABLED", "0") == "1"
+ARTIST_BATCH_MAX_SIZE = int(os.getenv("ARTIST_BATCH_MAX_SIZE", "8"))
+ARTIST_BATCH_MAX_WAIT_MS = float(os.getenv("ARTIST_BATCH_MAX_WAIT_MS", "5"))
+ARTIST_BATCH_TIMEOUT = 60  # seconds a caller waits for its batch before giving up
+
+# persistent prediction cache (sha256 of upload + checkpoint version, LRU-bounded)
+ARTIST_PREDICTION_CACHE_ENABLED = True
+ARTIST_PREDICTION_CACHE_MAX_ENTRIES = 5000
+ARTIST_PREDICTION_CACHE_EVICT_EVERY = 100  # stores between LRU trims per process; or `artist_model cache-evict`
+
+# inference backend: eager | torchscript | quantized | onnx
+# (export first with `manage.py export_artist_model`; falls back to eager if missing)
+ARTIST_MODEL_BACKEND = os.getenv("ARTIST_MODEL_BACKEND", "eager")
+
+# visual similarity ("more like this" / search by image)
+SIMILARITY_INDEX_DIR = BASE_DIR / "var" / "similarity"
+SIMILARITY_EMBED_ON_SAVE = True      # recompute an artwork's embedding when its image changes
+SIMILARITY_IVF_NPROBE = 8            # lists scanned per query when the index is built with --ivf
+SIMILARITY_INDEX_CHECK_INTERVAL = 5  # seconds between checks for a rebuilt index
+
+# uploads to the artist identifier are decoded from memory; keeping a preview
+# copy (content-addressed, LRU-trimmed) is optional
+ARTIST_UPLOAD_KEEP_PREVIEW = True
+ARTIST_UPLOAD_PREVIEW_MAX_FILES = 500
+ARTIST_UPLOAD_PREVIEW_CLEANUP_INTERVAL = 60  # seconds between trims per process; or `artist_model trim-previews`
+FILE_UPLOAD_MAX_MEMORY_SIZE = 20 * 1024 * 1024  # keep typical photo uploads in memory instead of spooling to /tmp
+
+# classifier preprocessing: reduced-resolution JPEG decode + one-pass normalize,
+# and a pixel cap checked from the header before any decoding
+ARTIST_FAST_PREPROCESS = True
+ARTIST_MAX_IMAGE_PIXELS = 50_000_000
+
+# admission control for model calls (per worker process): at most MAX_CONCURRENT
+# executions, up to MAX_QUEUE waiting for QUEUE_TIMEOUT seconds, then 503 + Retry-After.
+# torch gets ML_CPU_BUDGET // (ML_WEB_WORKERS * MAX_CONCURRENT) intra-op threads.
+# With ARTIST_BATCHING_ENABLED, keep MAX_CONCURRENT >= ARTIST_BATCH_MAX_SIZE or batches can't fill.
+ML_GATE_ENABLED = os.getenv("ML_GATE_ENABLED", "1") == "1"
+ML_GATE_MAX_CONCURRENT = int(os.getenv("ML_GATE_MAX_CONCURRENT", "2"))
+ML_GATE_MAX_QUEUE = int(os.getenv("ML_GATE_MAX_QUEUE", "8"))
+ML_GATE_QUEUE_TIMEOUT = float(os.getenv("ML_GATE_QUEUE_TIMEOUT", "10"))
+ML_GATE_RETRY_AFTER = 2  # seconds, lower bound for the Retry-After estimate
+ML_CPU_BUDGET = int(os.getenv("ML_CPU_BUDGET", "0")) or os.cpu_count()
+ML_WEB_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))  # gunicorn workers on this host
+
+# asynchronous identification jobs (upload -> job id -> poll)
+ARTIST_JOB_WORKERS = 1          # model threads per web process running queued jobs
+ARTIST_JOB_MAX_PENDING = 32     # per process; more gets a 503
+ARTIST_JOB_BUSY_RETRIES = 3     # waits for a free model slot before a job ends as "busy"
+ARTIST_JOB_STALE_AFTER = 300    # seconds in queued/running before a job is marked expired
+ARTIST_JOB_TTL = 3600           # seconds before any job row is deleted
+
+# optional local inference daemon (`manage.py inference_server`): set INFERENCE_SOCKET on
+# the web workers and they send predictions there instead of each loading the models;
+# they fall back to in-process inference while it's down (re-checked every RETRY_INTERVAL s)
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "") or None
+INFERENCE_TIMEOUT = 30
+INFERENCE_RETRY_INTERVAL = 5
+
+# frozen backbone features cached by `finetune_artist_head` (memory-mapped, append-only)
+ARTIST_FEATURE_CACHE_DIR = BASE_DIR / "var" / "features"
+
+# batch price upload (/predict-price/batch/): rows per CSV/XLSX file
+PRICE_BATCH_MAX_ROWS = 50000
+
+# single price predictions skip pandas/ColumnTransformer via a predictor compiled from the
+# pipeline at load (main/price_compiled.py); it's only used if it matches the pipeline
+PRICE_COMPILED_ENABLED = os.getenv("PRICE_COMPILED_ENABLED", "1") == "1"
+
+# memoized price predictions: per-process LRU in front of CACHES["shared"], which all
+# workers read; keys include the sha256 of the artifact that scored them
+PRICE_CACHE_ENABLED = True
+PRICE_CACHE_MAX_ENTRIES = 2048  # per process
+PRICE_CACHE_TTL = 3600          # seconds
+
+# versioned model artifacts (`manage.py model_registry`); models not published there
+# keep loading from artist_model.pth / art_price_ecom_pipeline.joblib next to manage.py
+MODEL_REGISTRY_DIR = BASE_DIR / "var" / "models"
+MODEL_REGISTRY_POLL_INTERVAL = 5  # seconds between manifest checks on the prediction path
+MODEL_REGISTRY_RETRY_MAX = 300    # a failed reload is retried with backoff, at most this many seconds apart
+MODEL_REGISTRY_VERIFY = True      # sha256 of each version checked before it's loaded
+MODEL_RELOAD_SIGNAL = os.getenv("MODEL_RELOAD_SIGNAL", "") or None  # e.g. "SIGUSR2"; unset = polling only
+MODEL_MMAP = True                 # memory-map registry versions (page cache shared between workers)
+
+# stored Artwork price estimates (gallery/pricing.py, `manage.py reprice_artworks`)
+PRICE_CATALOG_BATCH_SIZE = 1000          # artworks per pipeline call
+PRICE_CATALOG_ON_SAVE = True             # re-price in the background when `artist` changes
+PRICE_CATALOG_REPRICE_ON_CHANGE = True   # re-price stale artworks when the active price model changes (one process per host)
+
+# price sensitivity sweep (/predict-price/sweep/): most grid points scored per request
+PRICE_SWEEP_MAX_POINTS = 400
+
+# "why this price?" attribution (/predict-price/explain/, main/price_explain.py)
+PRICE_EXPLAIN_BUDGET_MS = 1500      # orderings are cut to what fits; the response says "truncated"
+PRICE_EXPLAIN_MAX_SAMPLES = 64      # sampled orderings for method="shapley"
+PRICE_EXPLAIN_CACHE_TTL = 3600      # seconds; 0 disables the cache
+
+# outbound API calls (main/http_client.py): one keep-alive requests.Session per host and
+# process; size the pool to at least the threads per worker (gunicorn --threads)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+HTTP_CONNECT_TIMEOUT = 3.05   # seconds; a number passed as timeout= is the read timeout
+HTTP_READ_TIMEOUT = 10        # when the caller gives none
+HTTP_RETRIES = 2              # connect errors always; read errors and 429/5xx for GET/HEAD only
+HTTP_BACKOFF = 0.3            # 0.3s, 0.6s, ... between retries
+GROQ_TIMEOUT = 30
+GROQ_MAX_RETRIES = 2
+
+# weather on event/workshop pages (main/weather_cache.py), in CACHES["shared"]
+WEATHER_CACHE_TTL = 600                 # seconds a location's weather counts as fresh
+WEATHER_STALE_TTL = 24 * 3600           # last known value, served with "stale" when upstream fails
+WEATHER_FAILURE_BACKOFF = 30            # seconds without upstream calls for a location after a failure
+WEATHER_GEOCODE_TTL = 7 * 24 * 3600     # city -> coordinates
+WEATHER_GEOCODE_MISS_TTL = 3600         # "City not found."
+WEATHER_COALESCE_WAIT = 5               # seconds a worker waits for another one's fetch of the same key
+
+# place coordinates (events/geocoding.py): geocode a place's city in the background when it
+# changes, so the weather call skips geocoding; `manage.py geocode_places` backfills the rest
+PLACE_GEOCODE_ON_SAVE = True
+
+# weather prefetch (`manage.py prefetch_weather`, main/weather_prefetch.py); run it from cron
+# more often than WEATHER_CACHE_TTL, e.g. every 5 minutes
+WEATHER_PREFETCH_BATCH_SIZE = 50         # locations per Open-Meteo request
+WEATHER_PREFETCH_INTERVAL = 1.0          # seconds between upstream requests
+WEATHER_PREFETCH_MIN_AGE = 300           # skip locations fetched more recently than this
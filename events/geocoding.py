@@ -0,0 +1,78 @@
+"""
+Coordinates for Place, resolved from `city` once instead of per weather request.
+
+A place counts as resolved when geocoded_city == city: after a save that
+changes the city (signals.py) or via `manage.py geocode_places`, the city
+is geocoded through main.weather_cache (cached, one upstream call per
+city at a time) and latitude / longitude / geocoded_name are stored. A
+city the geocoder doesn't know is recorded too (coordinates left empty),
+so it isn't looked up again until the city changes; an unreachable
+geocoder records nothing, and the next save or backfill retries.
+"""
+import logging
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Place
+
+logger = logging.getLogger(__name__)
+
+
+def resolve(city):
+    """City -> {"lat", "lon", "name"} or {"error": ..., ["temporary": True]}."""
+    from main import weather_cache
+    from main.utils import geocode_city
+
+    return weather_cache.location_for_city(city, geocode_city)
+
+
+def unresolved():
+    """Places whose coordinates don't belong to their current city."""
+    return Place.objects.exclude(geocoded_city=F("city"))
+
+
+def apply(queryset, city, location):
+    """Store `location` on the places of `queryset` that still have this city; returns rows updated."""
+    found = "error" not in location
+    return queryset.filter(city=city).update(
+        latitude=round(location["lat"], 6) if found else None,
+        longitude=round(location["lon"], 6) if found else None,
+        geocoded_name=location.get("name", "") if found else "",
+        geocoded_city=city,
+        geocoded_at=timezone.now(),
+    )
+
+
+def geocode_place(place_id):
+    place = Place.objects.filter(id=place_id).only("id", "city", "geocoded_city").first()
+    if place is None or place.geocoded_city == place.city:
+        return False
+    updated, _ = _geocode_city(Place.objects.filter(id=place_id), place.city)
+    return updated > 0
+
+
+def _geocode_city(queryset, city):
+    """-> (places updated, "found" | "not_found" | "failed")"""
+    location = resolve(city) if city.strip() else {"error": "No city provided."}
+    if location.get("temporary"):
+        logger.warning("Geocoding %r failed (%s); will retry", city, location["error"])
+        return 0, "failed"
+    return apply(queryset, city, location), "not_found" if "error" in location else "found"
+
+
+def backfill(queryset=None, progress=None):
+    """
+    Geocode every distinct city of `queryset` (default: unresolved places) once
+    and store the result on all of its places. Returns a summary dict.
+    """
+    queryset = unresolved() if queryset is None else queryset
+    cities = sorted(set(queryset.values_list("city", flat=True)))
+    summary = {"cities": len(cities), "places": 0, "found": 0, "not_found": 0, "failed": 0}
+    for city in cities:
+        updated, status = _geocode_city(queryset, city)
+        summary["places"] += updated
+        summary[status] += 1
+        if progress:
+            progress(city, status, updated)
+    return summary
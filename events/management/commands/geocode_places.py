@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from events.models import Place
+
+
+class Command(BaseCommand):
+    help = (
+        "Store coordinates on places whose city hasn't been geocoded yet (or "
+        "changed since). Each distinct city is looked up once, however many "
+        "places share it, so it is cheap to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-geocode every place, not just unresolved ones")
+
+    def handle(self, *args, **opts):
+        from events import geocoding
+
+        qs = Place.objects.all() if opts["all"] else geocoding.unresolved()
+        total = qs.count()
+        self.stdout.write(f"{total} places to geocode")
+        if not total:
+            return
+
+        summary = geocoding.backfill(
+            qs,
+            progress=lambda city, status, updated: self.stdout.write(f"  {city!r}: {status} ({updated} places)"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Geocoded {summary['places']} places in {summary['cities']} cities "
+            f"({summary['found']} found, {summary['not_found']} not found, {summary['failed']} failed)"
+        ))
@@ -6,9 +6,17 @@ class Place(models.Model):
     city = models.CharField(max_length=100, blank=True)
     capacity = models.PositiveIntegerField(null=True, blank=True)  # optional: how many seats
 
-    # you can expand later (map coords, etc.)
-    # latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
-    # longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # filled by geocoding `city` after save (events/geocoding.py) or `manage.py geocode_places`;
+    # the weather widget uses them directly instead of geocoding on every request
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geocoded_name = models.CharField(max_length=200, blank=True)  # place name the geocoder resolved
+    geocoded_city = models.CharField(max_length=100, blank=True)  # `city` as it was when geocoded
+    geocoded_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def has_coordinates(self):
+        return self.latitude is not None and self.longitude is not None
 
     def __str__(self):
         return self.name
@@ -0,0 +1,37 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Place
+
+logger = logging.getLogger(__name__)
+
+# one background thread: geocoding is an outbound call, kept off the request path
+_geocode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="place-geocode")
+
+
+@receiver(post_save, sender=Place)
+def geocode_place_city(sender, instance, raw=False, **kwargs):
+    """Resolve the coordinates when a place's city is new or changed."""
+    if raw or not getattr(settings, "PLACE_GEOCODE_ON_SAVE", True):
+        return
+    if instance.geocoded_city == instance.city:
+        return
+
+    place_id = instance.id
+    transaction.on_commit(lambda: _geocode_executor.submit(_geocode_in_background, place_id))
+
+
+def _geocode_in_background(place_id):
+    from .geocoding import geocode_place
+
+    try:
+        geocode_place(place_id)
+    except Exception:
+        logger.exception("Geocoding failed for place %s", place_id)
+    finally:
+        close_old_connections()
@@ -1,3 +1,58 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from main import utils
+
+from . import geocoding
+from .models import Place
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-default"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-shared"},
+}
+
+
+def fake_geocode(city):
+    if city == "Paris":
+        return {"lat": 48.8566, "lon": 2.3522, "name": "Paris"}
+    return {"error": "City not found."}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PLACE_GEOCODE_ON_SAVE=False)
+class BackfillTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        self.louvre = Place.objects.create(name="Louvre", city="Paris")
+        self.orsay = Place.objects.create(name="Orsay", city="Paris")
+        self.lost = Place.objects.create(name="Lost Hall", city="Atlantis")
+        self.done = Place.objects.create(
+            name="Done", city="Rome", latitude=41.9, longitude=12.5, geocoded_city="Rome",
+        )
+
+    def test_each_city_is_geocoded_once(self):
+        with mock.patch.object(utils, "geocode_city", side_effect=fake_geocode) as geocode:
+            summary = geocoding.backfill()
+
+        self.assertEqual(summary, {"cities": 2, "places": 3, "found": 1, "not_found": 1, "failed": 0})
+        self.assertEqual(sorted(call.args[0] for call in geocode.call_args_list), ["Atlantis", "Paris"])
+        for place in (self.louvre, self.orsay):
+            place.refresh_from_db()
+            self.assertTrue(place.has_coordinates)
+            self.assertEqual(place.geocoded_city, "Paris")
+
+        # an unknown city is recorded, so it isn't looked up again
+        self.lost.refresh_from_db()
+        self.assertFalse(self.lost.has_coordinates)
+        self.assertEqual(self.lost.geocoded_city, "Atlantis")
+        self.assertEqual(geocoding.backfill()["cities"], 0)
+
+    def test_unreachable_geocoder_records_nothing(self):
+        with mock.patch.object(utils, "geocode_city", side_effect=requests.ConnectionError("down")):
+            summary = geocoding.backfill()
+
+        self.assertEqual(summary["failed"], 2)
+        self.assertEqual(summary["places"], 0)
+        self.assertEqual(geocoding.unresolved().count(), 3)
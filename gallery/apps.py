@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class GalleryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "gallery"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the post_save receivers)
+        from main import model_registry, price_ml  # noqa: F401  (price_ml registers its reload first)
+
+        from .pricing import on_price_model_change
+
+        # runs after price_ml has swapped in the new version, in the reload thread
+        model_registry.watch("price", on_price_model_change)
@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Artwork, ArtworkFeedback
+from .models import Artwork, ArtworkFeedback, ArtworkAttribution
 from .forms import ArtworkForm, ArtworkFeedbackForm
 from django.db.models import Q
 from django.core.paginator import Paginator
@@ -13,6 +13,7 @@ from django.db.models import Count, Avg, Q, F
 from django.db.models.functions import TruncDate
 from django.utils import timezone
 import json
+import math
 from collections import defaultdict
 
 
@@ -34,9 +35,13 @@ def artwork_list_view(request):
     year_to       = request.GET.get('year_to', '').strip()
     created_from  = request.GET.get('created_from', '').strip()
     created_to    = request.GET.get('created_to', '').strip()
+    predicted_q   = request.GET.get('predicted', '').strip()   # predicted artist (from attribute_artworks)
+    price_min     = request.GET.get('price_min', '').strip()   # stored estimate (from reprice_artworks)
+    price_max     = request.GET.get('price_max', '').strip()
+    sort_q        = request.GET.get('sort', '').strip()
 
     # --- base queryset ---
-    qs = Artwork.objects.all()
+    qs = Artwork.objects.select_related('attribution')
 
     # text search by title, artist, description, year
     if search_q:
@@ -73,9 +78,44 @@ def artwork_list_view(request):
         if dto:
             qs = qs.filter(created_at__date__lte=dto)
 
+    # predicted artist: stored by `manage.py attribute_artworks`, no inference here
+    if predicted_q:
+        qs = qs.filter(
+            attribution__status=ArtworkAttribution.STATUS_OK,
+            attribution__predicted_artist=predicted_q,
+        )
+
+    # estimated price range: stored by `manage.py reprice_artworks` / on save
+    # each bound applies on its own; an empty or invalid one is ignored
+    for bound, lookup in ((price_min, 'estimated_price__gte'), (price_max, 'estimated_price__lte')):
+        try:
+            value = float(bound)
+        except ValueError:
+            continue
+        if math.isfinite(value):
+            qs = qs.filter(**{lookup: value})
+
     # default ordering is handled by Meta.ordering = ['-created_at'],
     # but we can be explicit too:
-    qs = qs.order_by('-created_at')
+    if sort_q == 'predicted':
+        qs = qs.order_by(F('attribution__predicted_artist').asc(nulls_last=True), '-created_at')
+    elif sort_q == 'confidence':
+        qs = qs.order_by(F('attribution__confidence').desc(nulls_last=True), '-created_at')
+    elif sort_q == 'price':
+        qs = qs.order_by(F('estimated_price').desc(nulls_last=True), '-created_at')
+    elif sort_q == 'price_asc':
+        qs = qs.order_by(F('estimated_price').asc(nulls_last=True), '-created_at')
+    else:
+        qs = qs.order_by('-created_at')
+
+    predicted_artists = (
+        ArtworkAttribution.objects
+        .filter(status=ArtworkAttribution.STATUS_OK)
+        .exclude(predicted_artist='')
+        .values_list('predicted_artist', flat=True)
+        .distinct()
+        .order_by('predicted_artist')
+    )
 
     # paginate
     p = Paginator(qs, 20)
@@ -93,6 +133,11 @@ def artwork_list_view(request):
         'filter_year_to': year_to,
         'filter_created_from': created_from,
         'filter_created_to': created_to,
+        'filter_predicted': predicted_q,
+        'filter_price_min': price_min,
+        'filter_price_max': price_max,
+        'filter_sort': sort_q,
+        'predicted_artists': predicted_artists,
     })
 
 
@@ -0,0 +1,152 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from gallery.models import Artwork, ArtworkAttribution
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the artist classifier over visible artworks and store the top-3 "
+        "prediction on ArtworkAttribution. Resumable: artworks already "
+        "attributed by the current model version are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only artworks created on/after this date (YYYY-MM-DD or ISO datetime)")
+        parser.add_argument("--chunk-size", type=int, default=256, help="Artworks fetched per DB query")
+        parser.add_argument("--batch-size", type=int, default=16, help="Images per forward pass")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=min(8, os.cpu_count() or 1),
+            help="Threads decoding/preprocessing images",
+        )
+        parser.add_argument("--force", action="store_true", help="Recompute even if already attributed by this model")
+
+    def handle(self, *args, **opts):
+        from main import ml_model
+        from main.prediction_cache import model_version
+
+        version = model_version()
+        if version is None:
+            raise CommandError(f"Checkpoint not found: {ml_model.manager.path}")
+
+        qs = Artwork.objects.filter(is_visible=True)
+
+        if opts["since"]:
+            qs = qs.filter(created_at__gte=self._parse_since(opts["since"]))
+        if not opts["force"]:
+            qs = qs.exclude(attribution__model_version=version)
+
+        qs = qs.order_by("id").only("id", "image")
+
+        ml_model.warm_up()
+
+        totals = {"ok": 0, "missing": 0, "error": 0}
+        started = time.perf_counter()
+        last_id = 0
+
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            while True:
+                # keyset pagination: stable under concurrent inserts, O(chunk) memory
+                chunk = list(qs.filter(id__gt=last_id)[:opts["chunk_size"]])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+
+                rows = self._attribute_chunk(chunk, pool, ml_model, version, opts["batch_size"])
+                ArtworkAttribution.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["artwork"],
+                    update_fields=[
+                        "predicted_artist", "confidence", "top3",
+                        "status", "error", "model_version", "predicted_at",
+                    ],
+                )
+
+                for row in rows:
+                    totals[row.status] += 1
+                done = sum(totals.values())
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  {done} artworks (last id {last_id}) — "
+                    f"{totals['ok'] / elapsed:.1f} images/sec"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Attributed {totals['ok']} artworks, {totals['missing']} missing images, "
+            f"{totals['error']} unreadable in {elapsed:.1f}s "
+            f"({(totals['ok'] / elapsed) if elapsed else 0:.1f} images/sec)"
+        ))
+
+    def _attribute_chunk(self, chunk, pool, ml_model, version, batch_size):
+        now = timezone.now()
+        rows = []
+        decoded = []  # (artwork, tensor)
+
+        for artwork, tensor, status, error in pool.map(lambda a: self._load(a, ml_model), chunk):
+            if tensor is None:
+                rows.append(ArtworkAttribution(
+                    artwork=artwork, status=status, error=error[:255],
+                    model_version=version, predicted_at=now,
+                ))
+            else:
+                decoded.append((artwork, tensor))
+
+        for i in range(0, len(decoded), batch_size):
+            batch = decoded[i:i + batch_size]
+            results = ml_model.predict_batch([t for _, t in batch])
+            for (artwork, _), result in zip(batch, results):
+                rows.append(ArtworkAttribution(
+                    artwork=artwork,
+                    predicted_artist=result["artist"],
+                    confidence=result["confidence"],
+                    top3=result["top3"],
+                    status=ArtworkAttribution.STATUS_OK,
+                    model_version=version,
+                    predicted_at=now,
+                ))
+        return rows
+
+    @staticmethod
+    def _load(artwork, ml_model):
+        """returns: (artwork, tensor or None, status, error)"""
+        if not artwork.image:
+            return artwork, None, ArtworkAttribution.STATUS_MISSING, "No image"
+        try:
+            path = artwork.image.path
+        except NotImplementedError:
+            path = None  # remote storage: fall back to opening through the storage API
+
+        if path is not None and not os.path.exists(path):
+            return artwork, None, ArtworkAttribution.STATUS_MISSING, f"File not found: {artwork.image.name}"
+
+        try:
+            if path is not None:
+                tensor = ml_model.load_image_tensor(path)
+            else:
+                with artwork.image.open("rb") as f:
+                    tensor = ml_model.load_image_tensor(f)
+        except Exception as e:
+            return artwork, None, ArtworkAttribution.STATUS_ERROR, str(e)
+        return artwork, tensor, ArtworkAttribution.STATUS_OK, ""
+
+    @staticmethod
+    def _parse_since(value):
+        dt = parse_datetime(value)
+        if dt is None:
+            d = parse_date(value)
+            if d is None:
+                raise CommandError(f"Invalid --since value: {value!r}")
+            dt = datetime.combine(d, dtime.min)
+        if timezone.is_naive(dt):
+            dt = timezone.make_aware(dt)
+        return dt
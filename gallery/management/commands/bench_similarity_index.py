@@ -0,0 +1,77 @@
+import json
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from gallery import similarity
+from main.benchmarking import percentiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Recall and latency of exact vs. IVF similarity search on a synthetic, "
+        "clustered catalog (nothing is read from or written to the real index)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100_000, help="Synthetic catalog size")
+        parser.add_argument("--dim", type=int, default=2048)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--nlist", type=int, nargs="+", default=[256, 1024])
+        parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+        parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+
+    def handle(self, *args, **opts):
+        rng = np.random.default_rng(0)
+        n, dim = opts["size"], opts["dim"]
+
+        # "styles": clustered vectors, roughly how real embeddings behave
+        centers = rng.normal(size=(max(8, n // 500), dim)).astype(np.float32)
+        vectors = centers[rng.integers(0, len(centers), n)]
+        vectors += 0.5 * rng.normal(size=vectors.shape).astype(np.float32)
+        ids = np.arange(1, n + 1)
+
+        picks = rng.choice(n, size=opts["queries"], replace=False)
+        queries = vectors[picks] + 0.1 * rng.normal(size=(len(picks), dim)).astype(np.float32)
+
+        root = tempfile.mkdtemp(prefix="similarity_bench_")
+        report = {"size": n, "dim": dim, "dtype": opts["dtype"], "k": opts["k"], "runs": []}
+
+        exact = similarity.SimilarityIndex(
+            similarity.build_index(ids, vectors, dtype=opts["dtype"], root=root)
+        )
+        truth, latencies = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            hits = exact.search(q, k=opts["k"])
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            truth.append({i for i, _ in hits})
+        report["runs"].append({"kind": "exact", "recall": 1.0, **percentiles(latencies)})
+
+        for nlist in opts["nlist"]:
+            t0 = time.perf_counter()
+            ivf = similarity.SimilarityIndex(
+                similarity.build_index(ids, vectors, kind="ivf", nlist=nlist, dtype=opts["dtype"], root=root)
+            )
+            build_s = round(time.perf_counter() - t0, 2)
+
+            for nprobe in opts["nprobe"]:
+                latencies, recalls = [], []
+                for q, expected in zip(queries, truth):
+                    t0 = time.perf_counter()
+                    hits = ivf.search(q, k=opts["k"], nprobe=nprobe)
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+                    recalls.append(len(expected & {i for i, _ in hits}) / opts["k"])
+                report["runs"].append({
+                    "kind": "ivf",
+                    "nlist": nlist,
+                    "nprobe": nprobe,
+                    "build_seconds": build_s,
+                    "recall": round(float(np.mean(recalls)), 4),
+                    **percentiles(latencies),
+                })
+
+        self.stdout.write(json.dumps(report, indent=2))
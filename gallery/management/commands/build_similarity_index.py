@@ -0,0 +1,156 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gallery import similarity
+from gallery.models import Artwork, ArtworkEmbedding
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed artworks that have no (or a stale) embedding, then write the "
+        "memory-mapped similarity index used by 'more like this' and search-by-image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ivf",
+            type=int,
+            default=0,
+            metavar="NLIST",
+            help="Build an inverted-file index with NLIST lists (0 = exact search; "
+                 "worth it past ~100k artworks, try NLIST ≈ 4·sqrt(n))",
+        )
+        parser.add_argument(
+            "--dtype",
+            choices=["float32", "float16"],
+            default="float32",
+            help="Stored vector precision (float16 halves the index size)",
+        )
+        parser.add_argument("--skip-embed", action="store_true", help="Only rebuild the index from stored embeddings")
+        parser.add_argument("--chunk-size", type=int, default=256)
+        parser.add_argument("--batch-size", type=int, default=16)
+        parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+
+    def handle(self, *args, **opts):
+        from main.prediction_cache import model_version
+
+        version = model_version()
+        if version is None:
+            raise CommandError("Artist model checkpoint not found")
+
+        if not opts["skip_embed"]:
+            self._embed_stale(version, opts)
+
+        self._build(version, opts)
+
+    # ---------------------- embeddings ----------------------
+
+    def _embed_stale(self, version, opts):
+        from main import ml_model
+
+        qs = (
+            Artwork.objects
+            .filter(is_visible=True)
+            .exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("id")
+            .only("id", "image")
+        )
+
+        done = 0
+        started = time.perf_counter()
+        last_id = 0
+
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            while True:
+                chunk = list(qs.filter(id__gt=last_id)[:opts["chunk_size"]])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+
+                current = {
+                    e["artwork_id"]: (e["image_name"], e["model_version"])
+                    for e in ArtworkEmbedding.objects
+                    .filter(artwork_id__in=[a.id for a in chunk])
+                    .values("artwork_id", "image_name", "model_version")
+                }
+                stale = [a for a in chunk if current.get(a.id) != (a.image.name, version)]
+                if not stale:
+                    continue
+
+                loaded = [
+                    (art, tensor)
+                    for art, tensor in pool.map(lambda a: (a, self._load(a, ml_model)), stale)
+                    if tensor is not None
+                ]
+
+                rows = []
+                now = timezone.now()
+                for i in range(0, len(loaded), opts["batch_size"]):
+                    batch = loaded[i:i + opts["batch_size"]]
+                    vectors = ml_model.embed_batch([t for _, t in batch])
+                    for (art, _), vec in zip(batch, vectors):
+                        rows.append(ArtworkEmbedding(
+                            artwork=art,
+                            vector=vec.tobytes(),
+                            image_name=art.image.name,
+                            model_version=version,
+                            updated_at=now,
+                        ))
+
+                ArtworkEmbedding.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["artwork"],
+                    update_fields=["vector", "image_name", "model_version", "updated_at"],
+                )
+                done += len(rows)
+                self.stdout.write(f"  embedded {done} artworks (last id {last_id})")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Embedded {done} artworks in {elapsed:.1f}s")
+
+    @staticmethod
+    def _load(artwork, ml_model):
+        try:
+            with artwork.image.open("rb") as f:
+                return ml_model.load_image_tensor(f)
+        except Exception:
+            return None  # missing / unreadable: `attribute_artworks` reports these
+
+    # ---------------------- index ----------------------
+
+    def _build(self, version, opts):
+        from main.ml_model import EMBEDDING_DIM
+
+        qs = ArtworkEmbedding.objects.filter(artwork__is_visible=True, model_version=version)
+        n = qs.count()
+
+        ids = np.empty(n, dtype=np.int64)
+        vectors = np.empty((n, EMBEDDING_DIM), dtype=np.float32)
+        i = 0
+        for artwork_id, raw in qs.order_by("artwork_id").values_list("artwork_id", "vector").iterator(chunk_size=2000):
+            if i == n:
+                break  # rows added since count(); the next build picks them up
+            ids[i] = artwork_id
+            vectors[i] = similarity.vector_from_bytes(raw)
+            i += 1
+        ids, vectors = ids[:i], vectors[:i]
+
+        started = time.perf_counter()
+        gen_dir = similarity.build_index(
+            ids,
+            vectors,
+            kind="ivf" if opts["ivf"] else "exact",
+            nlist=opts["ivf"],
+            dtype=opts["dtype"],
+            model_version=version,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Index with {i} artworks written to {gen_dir} in {time.perf_counter() - started:.1f}s"
+        ))
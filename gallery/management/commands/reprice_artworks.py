@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gallery.models import Artwork
+
+
+class Command(BaseCommand):
+    help = (
+        "Store a price estimate on every artwork, in batches scored with one "
+        "pipeline call each. By default only artworks not yet priced by the "
+        "active price model are done, so it is cheap to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-price every artwork, not just stale ones")
+        parser.add_argument("--batch-size", type=int, help="Artworks per pipeline call (default PRICE_CATALOG_BATCH_SIZE)")
+
+    def handle(self, *args, **opts):
+        from main import locks
+
+        with locks.held("reprice_artworks") as acquired:
+            if not acquired:
+                raise CommandError("Artworks are being re-priced by another process; try again later")
+            self._reprice(opts)
+
+    def _reprice(self, opts):
+        from gallery import pricing
+
+        version = pricing.current_version()
+        if version is None:
+            raise CommandError("No price model found (see `manage.py model_registry list`)")
+
+        qs = Artwork.objects.all() if opts["all"] else pricing.stale(version)
+        total = qs.count()
+        self.stdout.write(f"{total} artworks to price with model {version[:16]}")
+        if not total:
+            return
+
+        summary = pricing.reprice(
+            qs,
+            size=opts["batch_size"],
+            progress=lambda done, last_id: self.stdout.write(f"  {done}/{total} (last id {last_id})"),
+        )
+        rate = summary["priced"] / summary["seconds"] if summary["seconds"] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Priced {summary['priced']} artworks in {summary['seconds']}s ({rate:.0f}/s); "
+            f"model {', '.join(v[:16] for v in summary['versions'])}"
+        ))
+        unpriced = Artwork.objects.exclude(price_unavailable_reason="").count()
+        if unpriced:
+            self.stdout.write(self.style.WARNING(
+                f"{unpriced} artworks have no estimate (unknown or missing artist); "
+                f"see price_unavailable_reason"
+            ))
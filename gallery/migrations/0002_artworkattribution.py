@@ -0,0 +1,65 @@
+# Generated by Django 4.2.25 on 2026-10-18 12:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtworkAttribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('predicted_artist', models.CharField(blank=True, max_length=200)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('top3', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('ok', 'OK'), ('missing', 'Missing image'), ('error', 'Unreadable image')], default='ok', max_length=10)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('model_version', models.CharField(blank=True, max_length=64)),
+                ('predicted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='artwork',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['created_at'], name='gallery_art_created_a8ab78_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['is_visible'], name='gallery_art_is_visi_1eaa73_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['artist'], name='gallery_art_artist_c3721b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['year'], name='gallery_art_year_cc0327_idx'),
+        ),
+        migrations.AddField(
+            model_name='artworkattribution',
+            name='artwork',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attribution', to='gallery.artwork'),
+        ),
+        migrations.AddIndex(
+            model_name='artworkattribution',
+            index=models.Index(fields=['predicted_artist'], name='gallery_art_predict_8ebdf5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artworkattribution',
+            index=models.Index(fields=['confidence'], name='gallery_art_confide_03b498_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artworkattribution',
+            index=models.Index(fields=['model_version'], name='gallery_art_model_v_15f295_idx'),
+        ),
+    ]
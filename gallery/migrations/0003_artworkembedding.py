@@ -0,0 +1,29 @@
+# Generated by Django 4.2.25 on 2026-10-18 12:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0002_artworkattribution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtworkEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', models.BinaryField()),
+                ('image_name', models.CharField(blank=True, max_length=255)),
+                ('model_version', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('artwork', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='gallery.artwork')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_version'], name='gallery_art_model_v_d9fec4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.25 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0003_artworkembedding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='estimated_price',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='price_estimated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='price_model_version',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['estimated_price'], name='gallery_art_estimat_b3c8a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['price_model_version'], name='gallery_art_price_m_b680dd_idx'),
+        ),
+    ]
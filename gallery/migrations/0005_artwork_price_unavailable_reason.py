@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gallery', '0004_artwork_estimated_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='price_unavailable_reason',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+    ]
@@ -13,6 +13,13 @@ class Artwork(models.Model):
     is_visible = models.BooleanField(default=True)  # public or hidden
     created_at = models.DateTimeField(default=timezone.now)
 
+    # stored price estimate (gallery.pricing): filled by `manage.py reprice_artworks`
+    # and on save, never computed while rendering a list
+    estimated_price = models.FloatField(null=True, blank=True, editable=False)
+    price_model_version = models.CharField(max_length=64, blank=True, editable=False)  # sha256 of the price artifact
+    price_estimated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    price_unavailable_reason = models.CharField(max_length=200, blank=True, editable=False)  # why estimated_price is empty
+
     def __str__(self):
         return self.title
 
@@ -29,6 +36,8 @@ class Artwork(models.Model):
             models.Index(fields=['is_visible']),
             models.Index(fields=['artist']),
             models.Index(fields=['year']),
+            models.Index(fields=['estimated_price']),
+            models.Index(fields=['price_model_version']),
         ]
 
 
@@ -57,3 +66,61 @@ class ArtworkFeedback(models.Model):
 
     def __str__(self):
         return f"Feedback on {self.artwork.title}"
+
+
+class ArtworkAttribution(models.Model):
+    """
+    Machine attribution from the artist classifier.
+    Filled offline by `manage.py attribute_artworks`, never at request time.
+    """
+    STATUS_OK = 'ok'
+    STATUS_MISSING = 'missing'   # no image / file not on disk
+    STATUS_ERROR = 'error'       # image could not be decoded
+    STATUS_CHOICES = [
+        (STATUS_OK, 'OK'),
+        (STATUS_MISSING, 'Missing image'),
+        (STATUS_ERROR, 'Unreadable image'),
+    ]
+
+    artwork = models.OneToOneField(Artwork, on_delete=models.CASCADE, related_name='attribution')
+
+    predicted_artist = models.CharField(max_length=200, blank=True)
+    confidence = models.FloatField(null=True, blank=True)
+    top3 = models.JSONField(default=list, blank=True)  # [{"artist": ..., "confidence": ...}, ...]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_OK)
+    error = models.CharField(max_length=255, blank=True)
+
+    model_version = models.CharField(max_length=64, blank=True)  # sha256 of artist_model.pth
+    predicted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.artwork.title} → {self.predicted_artist or self.status}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['predicted_artist']),
+            models.Index(fields=['confidence']),
+            models.Index(fields=['model_version']),
+        ]
+
+
+class ArtworkEmbedding(models.Model):
+    """
+    2048-d ResNet50 image embedding (float32 bytes) used for similarity search.
+    Kept current by the post_save signal in gallery/signals.py; the searchable
+    index is built from these rows by `manage.py build_similarity_index`.
+    """
+    artwork = models.OneToOneField(Artwork, on_delete=models.CASCADE, related_name='embedding')
+    vector = models.BinaryField()
+    image_name = models.CharField(max_length=255, blank=True)  # which file the vector was computed from
+    model_version = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Embedding of {self.artwork.title}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_version']),
+        ]
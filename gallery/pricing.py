@@ -0,0 +1,205 @@
+"""
+Stored price estimates for the catalog.
+
+Artwork.estimated_price is what the public list and the dashboard sort and
+filter on; nothing here runs while a page renders. Estimates are written:
+
+- by `manage.py reprice_artworks` (all artworks, or only stale ones)
+- on save, when a field the price model reads changes (signals.py)
+- after the active price model version changes (on_price_model_change,
+  registered with the model registry in apps.py). Every worker sees the
+  change; a lock file (main/locks.py) lets one process per host do the
+  work. With several hosts, turn PRICE_CATALOG_REPRICE_ON_CHANGE off on all
+  but one, or run reprice_artworks from cron instead.
+
+Artwork only carries the artist of the price model's features; every other
+column is left empty and imputed by the pipeline, so artworks of the same
+artist share one estimate. That estimate only means something if the model
+knows the artist: an artist missing from the encoder's categories would be
+scored as "all zeros" (or make the encoder raise), so such artworks get no
+estimate and price_unavailable_reason says why. Each batch is deduplicated
+on its samples and scored with a single price_ml.predict_prices_versioned
+call; if that call fails, the samples are scored one by one so a bad row
+only fails itself.
+
+price_model_version is the sha256 of the artifact that produced the
+estimate (the same id the price cache keys on), so "stale" is simply
+`price_model_version != current`.
+"""
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Artwork
+
+logger = logging.getLogger(__name__)
+
+# Artwork fields price_ml reads; saving any of them re-prices the artwork
+PRICED_FIELDS = ("artist",)
+
+UPDATE_FIELDS = ["estimated_price", "price_unavailable_reason", "price_model_version", "price_estimated_at"]
+
+
+def batch_size():
+    return getattr(settings, "PRICE_CATALOG_BATCH_SIZE", 1000)
+
+
+def sample_for(artwork):
+    return {"artist": artwork.artist or ""}
+
+
+def current_version():
+    from main import price_ml
+    return price_ml.artifact_id()
+
+
+def stale(version=None):
+    """Artworks without an estimate from `version` (default: the active artifact)."""
+    version = version or current_version()
+    qs = Artwork.objects.all()
+    if version:
+        qs = qs.exclude(price_model_version=version)
+    return qs
+
+
+def unpriced_reason(sample, known):
+    """Why `sample` can't get a meaningful estimate ("" if it can); `known` from price_ml.known_categories."""
+    if not sample["artist"].strip():
+        return "No artist"
+    artists = known.get("artist")
+    if artists is not None and sample["artist"] not in artists:
+        return "Artist unknown to the price model"
+    return ""
+
+
+def price_batch(artworks):
+    """Set the estimate fields on `artworks` (not saved); returns the model version used."""
+    from main import price_ml
+
+    known, version = price_ml.known_categories()
+    known = {key: set(values) for key, values in known.items()}
+
+    keys = [tuple(sorted(sample_for(artwork).items())) for artwork in artworks]
+    result_of, scorable = {}, []
+    for key in dict.fromkeys(keys):
+        reason = unpriced_reason(dict(key), known)
+        if reason:
+            result_of[key] = (None, reason)
+        else:
+            scorable.append(key)
+    if scorable:
+        results, version = _score([dict(key) for key in scorable])
+        result_of.update(zip(scorable, results))
+
+    version = version or current_version() or ""
+    now = timezone.now()
+    for artwork, key in zip(artworks, keys):
+        artwork.estimated_price, artwork.price_unavailable_reason = result_of[key]
+        artwork.price_model_version = version
+        artwork.price_estimated_at = now
+    return version
+
+
+def _score(samples):
+    """-> ([(price, reason)], version): one call, or one call per sample if the batch fails."""
+    from main import price_ml
+
+    try:
+        prices, version = price_ml.predict_prices_versioned(samples)
+        return [(price, "") for price in prices], version
+    except Exception as e:
+        if len(samples) == 1:
+            raise
+        batch_error = e
+        logger.warning("Pricing %d artworks failed (%s); scoring them one by one", len(samples), e)
+
+    results, version = [], None
+    for sample in samples:
+        try:
+            (price,), version = price_ml.predict_prices_versioned([sample])
+            results.append((price, ""))
+        except Exception as e:
+            results.append((None, f"Price model error: {e}"[:200]))
+    if version is None:
+        raise batch_error  # every row failed: the model is broken, not the rows
+    return results, version
+
+
+def reprice(queryset, size=None, progress=None):
+    """
+    Price every artwork of `queryset` in batches; returns a summary dict.
+    `progress(done, last_id)` is called after each batch.
+    """
+    size = size or batch_size()
+    qs = queryset.order_by("id").only("id", *PRICED_FIELDS)
+    started = time.perf_counter()
+    done, versions, last_id = 0, set(), 0
+
+    while True:
+        # keyset pagination: works on `stale()` too, whose rows drop out as they are priced
+        batch = list(qs.filter(id__gt=last_id)[:size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        versions.add(price_batch(batch))
+        _save(batch)
+        done += len(batch)
+        if progress:
+            progress(done, last_id)
+
+    return {
+        "priced": done,
+        "versions": sorted(versions),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _save(batch):
+    # artworks with the same inputs share an estimate: one UPDATE per distinct result
+    # is far cheaper than bulk_update's per-row CASE, unless most results differ
+    by_result = defaultdict(list)
+    for artwork in batch:
+        by_result[(artwork.estimated_price, artwork.price_unavailable_reason)].append(artwork.id)
+    if len(by_result) > len(batch) // 4:
+        Artwork.objects.bulk_update(batch, UPDATE_FIELDS)
+        return
+    first = batch[0]
+    with transaction.atomic():
+        for (price, reason), ids in by_result.items():
+            Artwork.objects.filter(id__in=ids).update(
+                estimated_price=price,
+                price_unavailable_reason=reason,
+                price_model_version=first.price_model_version,
+                price_estimated_at=first.price_estimated_at,
+            )
+
+
+def reprice_ids(ids):
+    return reprice(Artwork.objects.filter(id__in=list(ids)))
+
+
+def on_price_model_change(artifact):
+    """
+    model_registry callback: re-price the catalog under the new active version.
+    Every process that watches the registry sees the change; the lock lets one
+    of them do the work (the others find nothing stale afterwards).
+    """
+    from main import locks
+
+    if not getattr(settings, "PRICE_CATALOG_REPRICE_ON_CHANGE", True):
+        return
+    version = artifact.sha256 if artifact else current_version()
+    if not version:
+        return
+    try:
+        with locks.held("reprice_artworks") as acquired:
+            if not acquired:
+                return  # another process on this host is re-pricing
+            summary = reprice(stale(version))
+            logger.info("Re-priced %s artworks for price model %s in %ss", summary["priced"], version[:16], summary["seconds"])
+    finally:
+        close_old_connections()
@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Artwork, ArtworkEmbedding
+
+logger = logging.getLogger(__name__)
+
+# one background thread: embeddings are computed off the request path, in save order
+_embed_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artwork-embed")
+_price_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artwork-price")
+
+
+@receiver(post_save, sender=Artwork)
+def refresh_artwork_embedding(sender, instance, raw=False, **kwargs):
+    """Recompute the similarity embedding when an artwork's image changes."""
+    if raw or not getattr(settings, "SIMILARITY_EMBED_ON_SAVE", True):
+        return
+
+    current = (
+        ArtworkEmbedding.objects
+        .filter(artwork_id=instance.id)
+        .values_list("image_name", flat=True)
+        .first()
+    )
+    image_name = instance.image.name if instance.image else ""
+    if current is not None and current == image_name:
+        return
+    if current is None and not image_name:
+        return
+
+    artwork_id = instance.id
+    transaction.on_commit(lambda: _embed_executor.submit(_embed_in_background, artwork_id))
+
+
+def _embed_in_background(artwork_id):
+    from .similarity import update_embedding
+
+    try:
+        update_embedding(artwork_id)
+    except Exception:
+        logger.exception("Embedding update failed for artwork %s", artwork_id)
+    finally:
+        close_old_connections()
+
+
+@receiver(pre_save, sender=Artwork)
+def remember_priced_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the stored values of the fields the price model reads, to compare after the save."""
+    from .pricing import PRICED_FIELDS
+
+    instance._priced_before = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(PRICED_FIELDS):
+        return
+    instance._priced_before = (
+        Artwork.objects.filter(pk=instance.pk).values_list(*PRICED_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=Artwork)
+def refresh_artwork_price(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Re-price an artwork when it is created or a field the price model reads changes."""
+    from .pricing import PRICED_FIELDS
+
+    if raw or not getattr(settings, "PRICE_CATALOG_ON_SAVE", True):
+        return
+    if not created:
+        if update_fields is not None and not set(update_fields) & set(PRICED_FIELDS):
+            return
+        before = getattr(instance, "_priced_before", None)
+        after = tuple(getattr(instance, f) for f in PRICED_FIELDS)
+        if before is not None and before == after and instance.price_model_version:
+            return
+
+    artwork_id = instance.id
+    transaction.on_commit(lambda: _price_executor.submit(_price_in_background, artwork_id))
+
+
+def _price_in_background(artwork_id):
+    from .pricing import reprice_ids
+
+    try:
+        reprice_ids([artwork_id])
+    except Exception:
+        logger.exception("Price estimate failed for artwork %s", artwork_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,331 @@
+"""
+"More like this" / search-by-image over ResNet50 artwork embeddings.
+
+Embeddings live in ArtworkEmbedding (one row per artwork). The searchable
+index is a set of .npy files written by `manage.py build_similarity_index`:
+
+    <SIMILARITY_INDEX_DIR>/CURRENT            -> name of the active generation
+    <SIMILARITY_INDEX_DIR>/index-<ts>/
+        meta.json      kind (exact | ivf), size, dtype, model version
+        vectors.npy    L2-normalized embeddings (float32 or float16)
+        ids.npy        artwork id per row
+        centroids.npy  ivf only: coarse centroids
+        offsets.npy    ivf only: rows of list c are offsets[c]:offsets[c+1]
+
+Workers open the files with mmap_mode="r", so every worker on a node shares
+the same page-cache copy. A rebuild writes a new generation and swaps
+CURRENT atomically; workers pick it up on their next search.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+POINTER = "CURRENT"
+SEARCH_BLOCK_ROWS = 65536  # rows scored per matmul (bounds temporary memory)
+
+
+def index_root():
+    return str(getattr(settings, "SIMILARITY_INDEX_DIR", os.path.join(settings.BASE_DIR, "var", "similarity")))
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def vector_from_bytes(raw):
+    return np.frombuffer(bytes(raw), dtype=np.float32)
+
+
+# ---------------------- build ----------------------
+
+def kmeans(vectors, k, iters=10, sample_per_list=64, seed=0):
+    """
+    Spherical k-means on a sample of the (normalized) vectors.
+    returns: (centroids (k, d), assignment of every vector)
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    k = max(1, min(k, n))
+
+    sample_size = min(n, k * sample_per_list)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, size=sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, size=k, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        nonempty = counts > 0
+        centroids[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+        # re-seed empty lists with random points
+        empty = int((~nonempty).sum())
+        if empty:
+            centroids[~nonempty] = sample[rng.choice(sample_size, size=empty)]
+        centroids = normalize(centroids)
+
+    assign = np.empty(n, dtype=np.int64)
+    for start in range(0, n, SEARCH_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, assign
+
+
+def build_index(ids, vectors, kind="exact", nlist=1024, dtype="float32", model_version="", root=None):
+    """
+    Write a new index generation and make it current. returns its directory.
+    """
+    root = root or index_root()
+    os.makedirs(root, exist_ok=True)
+
+    ids = np.asarray(ids, dtype=np.int64)
+    vectors = normalize(vectors)
+
+    meta = {
+        "kind": kind,
+        "size": int(len(ids)),
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "dtype": dtype,
+        "model_version": model_version,
+        "built_at": time.time(),
+    }
+
+    extra = {}
+    if kind == "ivf" and len(ids):
+        centroids, assign = kmeans(vectors, nlist)
+        order = np.argsort(assign, kind="stable")
+        ids, vectors = ids[order], vectors[order]
+        counts = np.bincount(assign, minlength=len(centroids))
+        extra["centroids"] = centroids.astype(np.float32)
+        extra["offsets"] = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        meta["nlist"] = int(len(centroids))
+
+    stamp = int(time.time() * 1000)
+    while True:  # two builds in the same millisecond get consecutive names
+        generation = f"index-{stamp}"
+        gen_dir = os.path.join(root, generation)
+        try:
+            os.makedirs(gen_dir)
+            break
+        except FileExistsError:
+            stamp += 1
+
+    np.save(os.path.join(gen_dir, "vectors.npy"), vectors.astype(dtype))
+    np.save(os.path.join(gen_dir, "ids.npy"), ids)
+    for name, arr in extra.items():
+        np.save(os.path.join(gen_dir, f"{name}.npy"), arr)
+    with open(os.path.join(gen_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # atomic pointer swap; readers see either the old or the new generation
+    tmp = os.path.join(root, POINTER + ".tmp")
+    with open(tmp, "w") as f:
+        f.write(generation)
+    os.replace(tmp, os.path.join(root, POINTER))
+
+    _cleanup_generations(root, keep={generation})
+    logger.info("Similarity index %s built: %s", generation, meta)
+    return gen_dir
+
+
+def _cleanup_generations(root, keep, retain=1):
+    # keep the newest `retain` old generations too; workers may still have them mapped
+    old = sorted(
+        (d for d in os.listdir(root) if d.startswith("index-") and d not in keep),
+        reverse=True,
+    )
+    for name in old[retain:]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+# ---------------------- search ----------------------
+
+class SimilarityIndex:
+    def __init__(self, gen_dir):
+        self.path = gen_dir
+        with open(os.path.join(gen_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.kind = self.meta["kind"]
+        self.vectors = np.load(os.path.join(gen_dir, "vectors.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(gen_dir, "ids.npy"), mmap_mode="r")
+        if self.kind == "ivf":
+            self.centroids = np.load(os.path.join(gen_dir, "centroids.npy"))
+            self.offsets = np.load(os.path.join(gen_dir, "offsets.npy"))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query, k=10, nprobe=None, exclude_ids=()):
+        """
+        query: (d,) embedding (normalized here)
+        returns: [(artwork_id, cosine similarity), ...] best first
+        """
+        if len(self.ids) == 0:
+            return []
+        q = normalize(query).reshape(-1)
+        want = k + len(exclude_ids)
+
+        if self.kind == "ivf":
+            nprobe = nprobe or getattr(settings, "SIMILARITY_IVF_NPROBE", 8)
+            lists = np.argsort(-(self.centroids @ q))[:nprobe]
+            rows = np.concatenate([
+                np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists
+            ]).astype(np.int64)
+            if len(rows) == 0:
+                return []
+            scores = self._score(q, self.vectors[rows])
+        else:
+            rows = None
+            scores = self._score(q, self.vectors)
+
+        want = min(want, len(scores))
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+
+        excluded = set(exclude_ids)
+        out = []
+        for i in top:
+            row = rows[i] if rows is not None else i
+            artwork_id = int(self.ids[row])
+            if artwork_id in excluded:
+                continue
+            out.append((artwork_id, float(scores[i])))
+            if len(out) == k:
+                break
+        return out
+
+    @staticmethod
+    def _score(q, vectors):
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ q
+        return scores
+
+
+_index = None
+_index_generation = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Current SimilarityIndex for this process (None until one is built)."""
+    global _index, _index_generation, _index_checked
+
+    interval = getattr(settings, "SIMILARITY_INDEX_CHECK_INTERVAL", 5)
+    if _index is not None and time.monotonic() - _index_checked < interval:
+        return _index
+
+    with _index_lock:
+        _index_checked = time.monotonic()
+        root = index_root()
+        try:
+            with open(os.path.join(root, POINTER)) as f:
+                generation = f.read().strip()
+        except OSError:
+            return None
+
+        if generation != _index_generation:
+            try:
+                _index = SimilarityIndex(os.path.join(root, generation))
+                _index_generation = generation
+            except (OSError, ValueError, KeyError) as e:
+                logger.error("Could not open similarity index %s: %s", generation, e)
+        return _index
+
+
+# ---------------------- embeddings ----------------------
+
+def embed_image(src):
+    """Embedding of one image (path or file-like)."""
+    from main import ml_model
+    return ml_model.embed_image(src)
+
+
+def update_embedding(artwork_id):
+    """
+    (Re)compute the stored embedding of one artwork. Used by the post_save signal.
+    The forward pass takes an ml_gate slot like the request path does; if the
+    model stays busy the artwork is left for build_similarity_index.
+    """
+    from main import ml_gate
+    from main.identify_jobs import busy_retries
+    from main.inference_client import InferenceUnavailable
+    from main.prediction_cache import model_version
+    from django.utils import timezone
+    from .models import Artwork, ArtworkEmbedding
+
+    artwork = Artwork.objects.filter(id=artwork_id).first()
+    if artwork is None:
+        return
+    if not artwork.image:
+        ArtworkEmbedding.objects.filter(artwork_id=artwork_id).delete()
+        return
+
+    for attempt in range(busy_retries() + 1):
+        try:
+            with ml_gate.slot(), artwork.image.open("rb") as f:
+                vector = embed_image(f)
+            break
+        except (ml_gate.Saturated, InferenceUnavailable) as e:
+            if attempt == busy_retries():
+                logger.warning("Embedding of artwork %s skipped, model busy: %s", artwork_id, e)
+                return
+            time.sleep(min(getattr(e, "retry_after", 1), 30))
+        except Exception as e:
+            logger.warning("Could not embed artwork %s: %s", artwork_id, e)
+            return
+
+    ArtworkEmbedding.objects.update_or_create(
+        artwork=artwork,
+        defaults={
+            "vector": vector.astype(np.float32).tobytes(),
+            "image_name": artwork.image.name,
+            "model_version": model_version(purge=False) or "",
+            "updated_at": timezone.now(),
+        },
+    )
+
+
+def similar_artworks(artwork, k=6):
+    """Visible artworks that look like `artwork`, best first."""
+    from .models import ArtworkEmbedding
+
+    index = get_index()
+    if index is None:
+        return []
+    emb = ArtworkEmbedding.objects.filter(artwork=artwork).only("vector").first()
+    if emb is None:
+        return []
+    hits = index.search(vector_from_bytes(emb.vector), k=k * 2, exclude_ids=(artwork.id,))
+    return [art for art, _ in _visible(hits)][:k]
+
+
+def search_by_image(src, k=12):
+    """[(artwork, score), ...] for an uploaded image."""
+    index = get_index()
+    if index is None:
+        return []
+    hits = index.search(embed_image(src), k=k * 2)
+    return _visible(hits)[:k]
+
+
+def _visible(hits):
+    # the index may be a little behind the DB: drop hidden/deleted artworks
+    from .models import Artwork
+
+    by_id = Artwork.objects.filter(id__in=[i for i, _ in hits], is_visible=True).in_bulk()
+    return [(by_id[i], score) for i, score in hits if i in by_id]
@@ -1,3 +1,152 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from main import ml_gate, prediction_cache
+
+from . import similarity
+from .models import Artwork, ArtworkAttribution, ArtworkEmbedding
+
+
+# ---------------------- similarity ----------------------
+
+class SimilarityIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(200, 16)).astype(np.float32)
+        self.ids = np.arange(1000, 1200)
+
+    def test_exact_search_finds_the_query_first(self):
+        index = similarity.SimilarityIndex(similarity.build_index(self.ids, self.vectors, root=self.root))
+        hits = index.search(self.vectors[7] * 3.0, k=5)
+        self.assertEqual(len(hits), 5)
+        self.assertEqual(hits[0][0], 1007)
+        self.assertAlmostEqual(hits[0][1], 1.0, places=5)
+        self.assertEqual([s for _, s in hits], sorted((s for _, s in hits), reverse=True))
+
+    def test_excluded_ids_are_skipped(self):
+        index = similarity.SimilarityIndex(similarity.build_index(self.ids, self.vectors, root=self.root))
+        hits = index.search(self.vectors[7], k=5, exclude_ids=(1007,))
+        self.assertEqual(len(hits), 5)
+        self.assertNotIn(1007, [i for i, _ in hits])
+
+    def test_ivf_probing_every_list_matches_exact(self):
+        exact = similarity.SimilarityIndex(similarity.build_index(self.ids, self.vectors, root=self.root))
+        ivf = similarity.SimilarityIndex(similarity.build_index(self.ids, self.vectors, kind="ivf", nlist=8, root=self.root))
+        query = self.vectors[42]
+        self.assertEqual(
+            [i for i, _ in ivf.search(query, k=10, nprobe=ivf.meta["nlist"])],
+            [i for i, _ in exact.search(query, k=10)],
+        )
+
+    def test_rebuild_swaps_the_current_generation(self):
+        with override_settings(SIMILARITY_INDEX_DIR=self.root, SIMILARITY_INDEX_CHECK_INTERVAL=0):
+            similarity.build_index(self.ids[:10], self.vectors[:10], root=self.root)
+            self.assertEqual(len(similarity.get_index()), 10)
+            similarity.build_index(self.ids, self.vectors, root=self.root)
+            self.assertEqual(len(similarity.get_index()), 200)
+
+
+@override_settings(SIMILARITY_EMBED_ON_SAVE=False, PRICE_CATALOG_ON_SAVE=False,
+                   ML_GATE_ENABLED=True, ARTIST_JOB_BUSY_RETRIES=1)
+class UpdateEmbeddingTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.artwork = Artwork.objects.create(
+            title="Study", image=SimpleUploadedFile("study.jpg", b"not decoded here", content_type="image/jpeg"),
+        )
+        self.vector = np.arange(4, dtype=np.float32)
+
+    def test_busy_model_is_waited_for_inside_a_gate_slot(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=0, min_retry_after=1)
+        held = gate.slot()
+        held.__enter__()
+
+        def embed(f):
+            self.assertEqual(gate.stats()["in_flight"], 1)
+            return self.vector
+
+        with mock.patch.object(ml_gate, "gate", gate), \
+                mock.patch.object(similarity, "embed_image", side_effect=embed) as embedded, \
+                mock.patch.object(similarity.time, "sleep", side_effect=lambda s: held.__exit__(None, None, None)), \
+                mock.patch.object(prediction_cache, "model_version", return_value="v1"):
+            similarity.update_embedding(self.artwork.id)
+
+        embedded.assert_called_once()
+        self.assertEqual(gate.stats()["in_flight"], 0)
+        stored = ArtworkEmbedding.objects.get(artwork=self.artwork)
+        self.assertEqual(similarity.vector_from_bytes(stored.vector).tolist(), self.vector.tolist())
+        self.assertEqual(stored.model_version, "v1")
+
+    def test_model_that_stays_busy_leaves_the_artwork_for_the_index_build(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=0, min_retry_after=1)
+        with mock.patch.object(ml_gate, "gate", gate), gate.slot(), \
+                mock.patch.object(similarity, "embed_image") as embedded, \
+                mock.patch.object(similarity.time, "sleep"):
+            similarity.update_embedding(self.artwork.id)
+        embedded.assert_not_called()
+        self.assertFalse(ArtworkEmbedding.objects.exists())
+
+    def test_reading_the_version_does_not_purge_cached_predictions(self):
+        checkpoint = tempfile.NamedTemporaryFile()
+        self.addCleanup(checkpoint.close)
+        checkpoint.write(b"new weights")
+        checkpoint.flush()
+        with mock.patch.object(prediction_cache, "_current_version", "old"), \
+                mock.patch.object(prediction_cache, "_version_memo", {}), \
+                mock.patch.object(prediction_cache, "purge_other_versions") as purge:
+            version = prediction_cache.model_version(checkpoint.name, purge=False)
+            purge.assert_not_called()
+            self.assertEqual(prediction_cache.model_version(checkpoint.name), version)
+            purge.assert_called_once_with(version)
+
+
+# ---------------------- dashboard ----------------------
+
+@override_settings(SIMILARITY_EMBED_ON_SAVE=False, PRICE_CATALOG_ON_SAVE=False)
+class ArtworkListFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user("curator", password="pw", is_staff=True)
+        for title, price in [("Cheap", 100.0), ("Middle", 500.0), ("Dear", 2000.0), ("Unpriced", None)]:
+            Artwork.objects.filter(pk=Artwork.objects.create(title=title).pk).update(estimated_price=price)
+        ArtworkAttribution.objects.create(artwork=Artwork.objects.get(title="Middle"), predicted_artist="Ava", confidence=0.9)
+        ArtworkAttribution.objects.create(
+            artwork=Artwork.objects.get(title="Dear"), predicted_artist="Ava", status=ArtworkAttribution.STATUS_ERROR,
+        )
+
+    def _titles(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("dashboard_artwork_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(art.title for art in response.context["artworks"])
+
+    def test_price_range(self):
+        self.assertEqual(self._titles(price_min="200", price_max="1000"), ["Middle"])
+        self.assertEqual(self._titles(price_min="200"), ["Dear", "Middle"])
+
+    def test_invalid_bound_is_ignored_on_its_own(self):
+        self.assertEqual(self._titles(price_min="abc", price_max="1000"), ["Cheap", "Middle"])
+        self.assertEqual(self._titles(price_min="200", price_max="nan"), ["Dear", "Middle"])
+
+    def test_predicted_artist_counts_only_successful_attributions(self):
+        self.assertEqual(self._titles(predicted="Ava"), ["Middle"])
+
+    def test_sort_by_price_puts_unpriced_last(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("dashboard_artwork_list"), {"sort": "price_asc"})
+        self.assertEqual([art.title for art in response.context["artworks"]], ["Cheap", "Middle", "Dear", "Unpriced"])
+
+    def test_non_staff_is_sent_away(self):
+        self.client.force_login(get_user_model().objects.create_user("visitor", password="pw"))
+        self.assertEqual(self.client.get(reverse("dashboard_artwork_list")).status_code, 302)
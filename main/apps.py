@@ -1,6 +1,21 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MainConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "main"
+
+    def ready(self):
+        # warm-up hook: load the artist model in the background at boot
+        # (off by default so manage.py commands stay fast)
+        if getattr(settings, "ARTIST_MODEL_PRELOAD", False):
+            from .ml_model import warm_up
+            threading.Thread(target=warm_up, name="artist-model-warmup", daemon=True).start()
+
+        # model registry hot reload: MODEL_RELOAD_SIGNAL makes workers re-read the manifest now
+        # (they also notice a changed manifest on their own within MODEL_REGISTRY_POLL_INTERVAL)
+        from . import model_registry
+        model_registry.install_signal_handler()
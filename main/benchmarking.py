@@ -0,0 +1,169 @@
+"""
+Small helpers shared by the ML benchmark commands:
+synthetic inputs (images, PriceForm rows), latency percentiles, a
+thread-pool load generator and the commit a report belongs to.
+"""
+import io
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+
+def synthetic_image(width, height, fmt="JPEG", seed=0):
+    """Random RGB image encoded as `fmt`; returns raw bytes."""
+    rng = np.random.default_rng(seed)
+    # smooth gradients + noise compress like a photo, not like pure noise
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    base = np.stack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))], axis=-1)
+    noise = rng.normal(0, 12, size=(height, width, 3)).astype(np.float32)
+    arr = np.clip(base + noise, 0, 255).astype(np.uint8)
+
+    buf = io.BytesIO()
+    Image.fromarray(arr, "RGB").save(buf, format=fmt, quality=90)
+    return buf.getvalue()
+
+
+def write_synthetic_images(directory, sizes, per_size=4, fmt="JPEG"):
+    """Write `per_size` synthetic images for each (w, h); returns the paths."""
+    os.makedirs(directory, exist_ok=True)
+    ext = "jpg" if fmt == "JPEG" else fmt.lower()
+    paths = []
+    for w, h in sizes:
+        for i in range(per_size):
+            path = os.path.join(directory, f"synthetic_{w}x{h}_{i}.{ext}")
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(synthetic_image(w, h, fmt=fmt, seed=i))
+            paths.append(path)
+    return paths
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def run_concurrent(fn, inputs, concurrency, total):
+    """
+    Call fn(inputs[i % len(inputs)]) `total` times from `concurrency` threads.
+    returns: throughput + latency percentiles
+    """
+    latencies = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput_per_s": round(total / elapsed, 2) if elapsed else None,
+        **percentiles(latencies),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (MB)."""
+    # VmHWM resets on exec; ru_maxrss on Linux carries over the forking parent's RSS
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def current_rss_mb():
+    """Current resident set size (MB); falls back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def git_commit(cwd):
+    """Short hash of HEAD, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=cwd,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def synthetic_price_rows(n, seed=0):
+    """
+    `n` PriceForm submissions (raw POST-style dicts), drawn from the form's own choices.
+    Run them through PriceForm to get what the view hands to predict_price.
+    """
+    from . import forms
+
+    rng = np.random.default_rng(seed)
+
+    def pick(choices):
+        values = [v for v, _ in choices if v]
+        return values[int(rng.integers(len(values)))]
+
+    rows = []
+    for _ in range(n):
+        unit = pick(forms.UNIT_CHOICES)
+        height = int(rng.integers(8, 120))
+        width = int(rng.integers(8, 120))
+        rows.append({
+            "artist": pick(forms.PAINTER_CHOICES),
+            "subject": pick(forms.SUBJECT_CHOICES),
+            "style": pick(forms.STYLE_CHOICES),
+            "medium": pick(forms.MEDIUM_CHOICES),
+            "unit": unit,
+            "height": height,
+            "width": width,
+            "size": f"{height}x{width}{unit}",
+            "frame": pick(forms.FRAME_CHOICES),
+            "location": pick(forms.LOCATION_CHOICES),
+            "delivery_days": int(rng.integers(1, 30)),
+            "shipment": pick(forms.SHIPMENT_CHOICES),
+            "color_palette": pick(forms.COLOR_PALETTE_CHOICES),
+            "copy_or_original": pick(forms.COPY_ORIGINAL_CHOICES),
+            "print_or_real": pick(forms.PRINT_REAL_CHOICES),
+            "environment": pick(forms.ENV_CHOICES),
+            "mood": pick(forms.MOOD_CHOICES),
+            "lighting": pick(forms.LIGHTING_CHOICES),
+            "reproduction_type": pick(forms.REPRO_CHOICES),
+            "audience": pick(forms.AUDIENCE_CHOICES),
+        })
+    return rows
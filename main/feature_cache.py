@@ -0,0 +1,108 @@
+"""
+Append-only, memory-mapped cache of frozen ResNet50 backbone features.
+
+    <ARTIST_FEATURE_CACHE_DIR>/<backbone fingerprint>/
+        features.f32   N x 2048 float32 rows, appended in batches
+        keys.jsonl     one JSON-encoded key per line: row i belongs to line i
+
+A key names one image version (path + size + mtime, or media name + size),
+so re-running only extracts features for new or changed files. The backbone
+fingerprint hashes every weight except `fc`: fine-tuning the head keeps the
+cache valid, while a different backbone starts a fresh one.
+
+Both files are append-only. Rows are written before their keys, so after a
+crash the extra rows (and any half-written key line) are cut off on open.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+
+FEATURE_DIM = 2048
+
+
+def cache_root():
+    return str(getattr(settings, "ARTIST_FEATURE_CACHE_DIR", settings.BASE_DIR / "var" / "features"))
+
+
+def backbone_fingerprint(model):
+    """sha256 of all backbone weights (everything but fc), first 16 hex chars."""
+    h = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        if name.startswith("fc."):
+            continue
+        h.update(name.encode())
+        h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+class FeatureCache:
+    def __init__(self, fingerprint, root=None):
+        self.dir = os.path.join(root or cache_root(), fingerprint)
+        os.makedirs(self.dir, exist_ok=True)
+        self.data_path = os.path.join(self.dir, "features.f32")
+        self.keys_path = os.path.join(self.dir, "keys.jsonl")
+
+        self.keys = []
+        complete = 0  # bytes of whole key lines
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # half-written last line
+                    self.keys.append(json.loads(line))
+                    complete += len(line)
+            if complete != os.path.getsize(self.keys_path):
+                with open(self.keys_path, "r+b") as f:
+                    f.truncate(complete)
+
+        # rows are written first: more rows than keys means an interrupted batch
+        n_rows = os.path.getsize(self.data_path) // (FEATURE_DIM * 4) if os.path.exists(self.data_path) else 0
+        if n_rows < len(self.keys):
+            self.keys = self.keys[:n_rows]
+            with open(self.keys_path, "w") as f:
+                f.writelines(json.dumps(k) + "\n" for k in self.keys)
+        expected = len(self.keys) * FEATURE_DIM * 4
+        if os.path.exists(self.data_path) and os.path.getsize(self.data_path) != expected:
+            with open(self.data_path, "r+b") as f:
+                f.truncate(expected)
+
+        self.rows = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def missing(self, keys):
+        return [k for k in keys if k not in self.rows]
+
+    def add(self, keys, vectors):
+        """Append one batch of rows, then their keys."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(keys), FEATURE_DIM):
+            raise ValueError(f"expected ({len(keys)}, {FEATURE_DIM}) features, got {vectors.shape}")
+
+        with open(self.data_path, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self.keys_path, "a") as f:
+            f.writelines(json.dumps(k) + "\n" for k in keys)
+
+        for key in keys:
+            self.rows[key] = len(self.keys)
+            self.keys.append(key)
+
+    def vectors(self):
+        """Read-only (N, 2048) memmap of every cached row."""
+        if not self.keys:
+            return np.empty((0, FEATURE_DIM), dtype=np.float32)
+        return np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(len(self.keys), FEATURE_DIM))
+
+    def rows_for(self, keys):
+        return np.array([self.rows[k] for k in keys], dtype=np.int64)
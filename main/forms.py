@@ -185,5 +185,19 @@ class PriceForm(forms.Form):
     audience = forms.ChoiceField(choices=AUDIENCE_CHOICES, required=False, label="Target Audience")
 
 
+class PriceBatchUploadForm(forms.Form):
+    file = forms.FileField(
+        label="CSV or Excel file",
+        help_text="One artwork per row; the same columns as the form (artist, style, medium, size or height/width/unit, ...).",
+        widget=forms.ClearableFileInput(attrs={"accept": ".csv,.xlsx"}),
+    )
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        if not f.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return f
+
+
 
 #-------------- fin ---------------------------
\ No newline at end of file
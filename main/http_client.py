@@ -0,0 +1,145 @@
+"""
+Outbound HTTP for the third-party APIs (Open-Meteo, API Ninjas, DeepAI,
+Face++, Groq).
+
+Calling requests.get/post directly opens a new connection per call, so each
+one pays DNS, TCP and TLS setup again. Here every host gets one
+requests.Session per process, whose connection pool (HTTP_POOL_MAXSIZE,
+at least the worker's thread count) keeps connections alive between calls:
+
+    resp = http_client.get(url, params=..., timeout=settings.OPENMETEO_TIMEOUT)
+
+- timeouts: a number is the read timeout; the connect timeout is always
+  HTTP_CONNECT_TIMEOUT, so a dead host fails fast. No timeout given means
+  (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), never "wait forever".
+- retries: connection failures are retried for any method (nothing was
+  sent); read errors and 429/5xx only for idempotent methods (GET, HEAD,
+  ...), HTTP_RETRIES times with exponential backoff (HTTP_BACKOFF) and
+  Retry-After respected. A POST to DeepAI or Face++ is never sent twice.
+- sessions are per process: a worker forked from a process that already
+  had one gets its own, instead of sharing sockets with its parent.
+
+groq_client() is the process-wide Groq client (it has its own pool).
+`manage.py bench_http_client` compares pooled and unpooled latency against
+a local stand-in server.
+"""
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_sessions = {}  # (pid, scheme, host) -> Session
+_groq = None    # (pid, api key, client)
+
+
+def pool_size():
+    return getattr(settings, "HTTP_POOL_MAXSIZE", 10)
+
+
+def default_timeout():
+    return (getattr(settings, "HTTP_CONNECT_TIMEOUT", 3.05), getattr(settings, "HTTP_READ_TIMEOUT", 10))
+
+
+def _timeout(value):
+    if value is None:
+        return default_timeout()
+    if isinstance(value, (tuple, list)):
+        return tuple(value)
+    return (default_timeout()[0], value)
+
+
+def _retry():
+    retries = getattr(settings, "HTTP_RETRIES", 2)
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # idempotent methods only (no POST)
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=getattr(settings, "HTTP_BACKOFF", 0.3),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last 5xx back to the caller, as before
+    )
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size(), max_retries=_retry())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def session_for(url):
+    """The pooled Session for `url`'s host (created on first use)."""
+    parts = urlsplit(url)
+    key = (os.getpid(), parts.scheme, parts.netloc)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _new_session()
+    return session
+
+
+def request(method, url, timeout=None, **kwargs):
+    return session_for(url).request(method, url, timeout=_timeout(timeout), **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def groq_client():
+    """Process-wide Groq client (rebuilt if GROQ_API_KEY changes)."""
+    global _groq
+    from groq import Groq
+
+    api_key = getattr(settings, "GROQ_API_KEY", None)
+    current = _groq
+    if current is None or current[0] != os.getpid() or current[1] != api_key:
+        with _lock:
+            current = _groq
+            if current is None or current[0] != os.getpid() or current[1] != api_key:
+                client = Groq(
+                    api_key=api_key,
+                    timeout=getattr(settings, "GROQ_TIMEOUT", 30),
+                    max_retries=getattr(settings, "GROQ_MAX_RETRIES", 2),
+                )
+                current = _groq = (os.getpid(), api_key, client)
+    return current[2]
+
+
+def close_all():
+    """Drop every pooled connection of this process (tests, benchmarks)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def stats():
+    pid = os.getpid()
+    return {
+        "hosts": sorted(f"{scheme}://{host}" for p, scheme, host in _sessions if p == pid),
+        "pool_maxsize": pool_size(),
+        "timeout": default_timeout(),
+        "retries": getattr(settings, "HTTP_RETRIES", 2),
+        "groq_client": _groq is not None and _groq[0] == pid,
+    }
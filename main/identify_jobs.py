@@ -0,0 +1,214 @@
+"""
+Asynchronous artist identification.
+
+submit() stores an IdentificationJob row and hands the upload bytes to a
+small in-process thread pool (ARTIST_JOB_WORKERS), so the request returns
+a job id immediately instead of holding a web worker through decode and
+inference. Status lives in the database: any worker can answer a poll.
+
+Jobs take an ml_gate slot like the synchronous view, so they share its
+concurrency limit and thread budget. When the gate (or the inference daemon)
+is saturated, a job waits the suggested Retry-After and tries again, up to
+ARTIST_JOB_BUSY_RETRIES times; after that it ends as "busy", which the
+client may resubmit.
+
+Jobs that sit in queued/running longer than ARTIST_JOB_STALE_AFTER seconds
+(their process died or restarted) are marked expired. Jobs older than
+ARTIST_JOB_TTL are deleted. The sweep runs at most once a minute from
+submit(), or on demand with `manage.py artist_model expire-jobs`.
+"""
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import ml_gate, prediction_cache, upload_store
+from .models import IdentificationJob
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, getattr(settings, "ARTIST_JOB_WORKERS", 1)),
+    thread_name_prefix="identify-job",
+)
+
+_lock = threading.Lock()
+_pending = 0  # submitted to this process's pool, not finished yet
+_last_sweep = 0.0
+
+SWEEP_INTERVAL = 60  # seconds
+
+
+def max_pending():
+    return getattr(settings, "ARTIST_JOB_MAX_PENDING", 32)
+
+
+def pending():
+    return _pending
+
+
+def busy_retries():
+    return getattr(settings, "ARTIST_JOB_BUSY_RETRIES", 3)
+
+
+def submit(uploaded_file):
+    """
+    Create a job for an uploaded image and queue it.
+    Raises ml_gate.Saturated when this process already has too many jobs pending.
+    """
+    global _pending
+
+    _maybe_sweep()
+
+    content_hash = prediction_cache.hash_upload(uploaded_file)
+    image_url = upload_store.save_preview(uploaded_file, content_hash) if upload_store.is_enabled() else ""
+
+    # answered before: no need to queue anything
+    if prediction_cache.is_enabled():
+        version = prediction_cache.model_version()
+        cached = prediction_cache.get(content_hash, version) if version else None
+        if cached is not None:
+            now = timezone.now()
+            return IdentificationJob.objects.create(
+                status="done",
+                content_hash=content_hash,
+                result=cached,
+                image_url=image_url,
+                started_at=now,
+                finished_at=now,
+            )
+
+    with _lock:
+        if _pending >= max_pending():
+            raise ml_gate.Saturated("job queue full", retry_after=max(2, _pending))
+        _pending += 1
+
+    try:
+        uploaded_file.seek(0)
+        data = uploaded_file.read()
+        job = IdentificationJob.objects.create(content_hash=content_hash, image_url=image_url)
+    except Exception:
+        _done()
+        raise
+
+    transaction.on_commit(lambda: _executor.submit(_run, job.id, content_hash, data))
+    return job
+
+
+def get(job_id):
+    return IdentificationJob.objects.filter(id=job_id).first()
+
+
+def as_dict(job):
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "result": job.result,
+        "error": job.error or None,
+        "image_url": job.image_url or None,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def expire_stale(now=None):
+    """Mark abandoned jobs expired and delete old ones. Returns (expired, deleted)."""
+    now = now or timezone.now()
+    stale_after = getattr(settings, "ARTIST_JOB_STALE_AFTER", 300)
+    ttl = getattr(settings, "ARTIST_JOB_TTL", 3600)
+
+    expired = (
+        IdentificationJob.objects
+        .filter(status__in=["queued", "running"], created_at__lt=now - timedelta(seconds=stale_after))
+        .update(status="expired", error="The job did not finish in time.", finished_at=now)
+    )
+    deleted, _ = IdentificationJob.objects.filter(created_at__lt=now - timedelta(seconds=ttl)).delete()
+    if expired or deleted:
+        logger.info("Identification jobs: %d expired, %d deleted", expired, deleted)
+    return expired, deleted
+
+
+# ---------- worker ----------
+
+def _done():
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _maybe_sweep():
+    global _last_sweep
+    now = time.monotonic()
+    with _lock:
+        if now - _last_sweep < SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+    try:
+        expire_stale()
+    except Exception:
+        logger.exception("Identification job sweep failed")
+
+
+def _run(job_id, content_hash, data):
+    try:
+        # claim it; an expired (or already claimed) job is skipped
+        claimed = (
+            IdentificationJob.objects
+            .filter(id=job_id, status="queued")
+            .update(status="running", started_at=timezone.now())
+        )
+        if not claimed:
+            return
+
+        result = _predict(job_id, data)
+        if result is None:
+            return
+        _finish(job_id, status="done", result=result)
+
+        if prediction_cache.is_enabled():
+            version = prediction_cache.model_version()
+            if version:
+                prediction_cache.put(content_hash, version, result)
+    except Exception:
+        logger.exception("Identification job %s crashed", job_id)
+    finally:
+        _done()
+        close_old_connections()
+
+
+def _predict(job_id, data):
+    """predict_image inside a gate slot, retried while the model is busy; None if the job was finished with an error."""
+    from .inference_client import InferenceUnavailable
+    from .ml_model import ImageTooLarge, predict_image
+
+    for attempt in range(busy_retries() + 1):
+        try:
+            with ml_gate.slot():
+                return predict_image(io.BytesIO(data))
+        except (ml_gate.Saturated, InferenceUnavailable) as e:
+            if attempt == busy_retries():
+                logger.warning("Identification job %s gave up, model busy: %s", job_id, e)
+                _finish(job_id, status="busy", error="The model is busy right now, please try again in a few seconds.")
+                return None
+            time.sleep(min(getattr(e, "retry_after", 1), 30))
+        except ImageTooLarge as e:
+            _finish(job_id, status="error", error=str(e))
+            return None
+        except Exception as e:
+            logger.exception("Identification job %s failed", job_id)
+            _finish(job_id, status="error", error=f"Prediction failed: {e}")
+            return None
+
+
+def _finish(job_id, **fields):
+    (
+        IdentificationJob.objects
+        .filter(id=job_id, status="running")
+        .update(finished_at=timezone.now(), **fields)
+    )
@@ -0,0 +1,85 @@
+"""
+Fast preprocessing for the artist classifier.
+
+Same result as ml_model.PREPROCESS (Resize 256x256 -> CenterCrop 224 ->
+ToTensor -> Normalize) but:
+
+- the pixel count is checked from the header, before anything is decoded
+  (decompression-bomb guard, ARTIST_MAX_IMAGE_PIXELS)
+- JPEGs are decoded at reduced resolution (PIL draft mode: the DCT scales
+  by 1/2, 1/4 or 1/8 while staying >= 256 px per side), so a 40 MP photo
+  never exists in memory at full size
+- scale + normalize + HWC->CHW happen in one lookup-table pass per channel,
+  written straight into a preallocated float32 tensor
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+RESIZE = 256
+CROP = 224
+MEAN = (0.485, 0.456, 0.406)
+STD = (0.229, 0.224, 0.225)
+
+# LUT[c][v] == (v / 255 - MEAN[c]) / STD[c], exactly what ToTensor + Normalize compute
+_LUT = (
+    (np.arange(256, dtype=np.float32)[None, :] / np.float32(255.0) - np.array(MEAN, dtype=np.float32)[:, None])
+    / np.array(STD, dtype=np.float32)[:, None]
+).astype(np.float32)
+
+_CROP_OFFSET = int(round((RESIZE - CROP) / 2.0))  # same as torchvision CenterCrop
+_CROP_BOX = (_CROP_OFFSET, _CROP_OFFSET, _CROP_OFFSET + CROP, _CROP_OFFSET + CROP)
+
+
+class ImageTooLarge(ValueError):
+    """The image has more pixels than ARTIST_MAX_IMAGE_PIXELS allows."""
+
+
+def open_bounded(src, max_pixels=None, reduce=True):
+    """
+    Open an image lazily (header only), enforce the pixel cap and, for JPEG,
+    switch to reduced-resolution decoding.
+    src: path, bytes, or file-like
+    """
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    elif hasattr(src, "seek"):
+        src.seek(0)
+
+    img = Image.open(src)
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        img.close()
+        raise ImageTooLarge(
+            f"Image is {width}x{height} ({width * height / 1e6:.1f} MP); "
+            f"the limit is {max_pixels / 1e6:.1f} MP."
+        )
+
+    if reduce and img.format == "JPEG":
+        img.draft("RGB", (RESIZE, RESIZE))
+    return img
+
+
+def to_tensor(img, out=None):
+    """
+    PIL image -> normalized (3, 224, 224) float32 tensor.
+    out: optional preallocated tensor (e.g. a slot of a batch) to write into
+    """
+    img = img.convert("RGB").resize((RESIZE, RESIZE), Image.BILINEAR).crop(_CROP_BOX)
+    pixels = np.asarray(img)  # (224, 224, 3) uint8
+
+    if out is None:
+        import torch  # here, not at import: main.views loads this module via ml_model
+
+        out = torch.empty((3, CROP, CROP), dtype=torch.float32)
+    dst = out.numpy()
+    for c in range(3):
+        np.take(_LUT[c], pixels[:, :, c], out=dst[c])
+    return out
+
+
+def preprocess(src, max_pixels=None, out=None, reduce=True):
+    """open_bounded + to_tensor"""
+    with open_bounded(src, max_pixels=max_pixels, reduce=reduce) as img:
+        return to_tensor(img, out=out)
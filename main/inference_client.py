@@ -0,0 +1,278 @@
+"""
+Client side of the local inference daemon (`manage.py inference_server`).
+
+When INFERENCE_SOCKET is set, predict_image / predict_price / embeddings
+are sent to the daemon over a Unix domain socket instead of running in
+this process, so a node holds one copy of each model instead of one per
+web worker. If the daemon is down (socket missing, connection refused or
+reset), callers get InferenceUnavailable and run the model in-process, and
+the daemon is skipped for INFERENCE_RETRY_INTERVAL seconds so requests
+don't each wait on a dead socket. A reply that takes longer than
+INFERENCE_TIMEOUT means the daemon is busy, not down: the caller gets
+ml_gate.Saturated (a 503 with Retry-After), the same as a BUSY reply, so a
+slow daemon doesn't make every worker load the models itself.
+
+Wire format (both directions), one frame per message:
+
+    !2sBBI   magic b"AI" | version | op (request) or status (response) | payload length
+    payload  predict_image / embed_image: the raw image bytes
+             predict_price(s): the sample (or list of samples) as UTF-8 JSON
+             responses: UTF-8 JSON, except embed_image (raw float32 vector)
+
+Connections are persistent, one per thread.
+"""
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AI"
+VERSION = 1
+HEADER = struct.Struct("!2sBBI")
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+# ops
+OP_PING = 0
+OP_PREDICT_IMAGE = 1
+OP_PREDICT_PRICE = 2
+OP_EMBED_IMAGE = 3
+OP_STATS = 4
+OP_PREDICT_PRICES = 5
+OP_PRICE_CATEGORIES = 6
+
+# response status
+OK = 0
+ERROR = 1
+BUSY = 2
+TOO_LARGE = 3
+
+
+class InferenceUnavailable(Exception):
+    """The daemon isn't configured or can't be reached; run in-process instead."""
+
+
+class ProtocolError(Exception):
+    pass
+
+
+# ---------- framing (shared with inference_server) ----------
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if not k:
+            raise ConnectionError("connection closed")
+        got += k
+    return bytes(buf)
+
+
+def read_frame(sock):
+    """-> (code, payload); raises ConnectionError on EOF."""
+    magic, version, code, length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ProtocolError(f"bad frame header {magic!r} v{version}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"payload too large ({length} bytes)")
+    return code, _recv_exact(sock, length) if length else b""
+
+
+def write_frame(sock, code, payload=b""):
+    header = HEADER.pack(MAGIC, VERSION, code, len(payload))
+    if len(payload) <= 65536:
+        sock.sendall(header + payload)  # one write for small frames
+    else:
+        sock.sendall(header)
+        sock.sendall(payload)  # don't copy large images just to prepend 8 bytes
+
+
+# ---------- client ----------
+
+_local = threading.local()
+_state_lock = threading.Lock()
+_down_until = 0.0
+_serving = False  # True inside the daemon itself
+
+_calls = 0
+_fallbacks = 0
+_timeouts = 0
+
+# errors that mean nothing is serving the socket
+DOWN_ERRORS = (ConnectionRefusedError, ConnectionResetError, BrokenPipeError, FileNotFoundError)
+
+
+def socket_path():
+    return getattr(settings, "INFERENCE_SOCKET", None) or None
+
+
+def is_enabled():
+    return bool(socket_path()) and not _serving
+
+
+def serve_locally():
+    """Called by the daemon: never forward to ourselves."""
+    global _serving
+    _serving = True
+
+
+def _timeout():
+    return getattr(settings, "INFERENCE_TIMEOUT", 30)
+
+
+def _connect():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(_timeout())
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _drop_connection():
+    sock = getattr(_local, "sock", None)
+    _local.sock = None
+    if sock is not None:
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+
+def call(op, payload=b""):
+    """Send one request; returns (status, payload). Raises InferenceUnavailable, or Saturated on a timeout."""
+    global _down_until, _calls, _fallbacks, _timeouts
+
+    if not is_enabled():
+        raise InferenceUnavailable("no INFERENCE_SOCKET configured")
+    if time.monotonic() < _down_until:
+        with _state_lock:
+            _fallbacks += 1
+        raise InferenceUnavailable("inference daemon marked down")
+
+    # a reused connection may have been closed by a daemon restart: retry once on a fresh one
+    for attempt in range(2):
+        reused = getattr(_local, "sock", None) is not None
+        try:
+            if not reused:
+                _local.sock = _connect()
+            write_frame(_local.sock, op, payload)
+            status, body = read_frame(_local.sock)
+            with _state_lock:
+                _calls += 1
+            return status, body
+        except socket.timeout:
+            _drop_connection()  # the late reply would be read as the next request's
+            with _state_lock:
+                _timeouts += 1
+            from .ml_gate import Saturated
+            logger.warning("Inference daemon did not answer within %ss", _timeout())
+            raise Saturated("inference daemon timed out", getattr(settings, "INFERENCE_RETRY_INTERVAL", 5))
+        except (OSError, ProtocolError) as e:
+            _drop_connection()
+            if reused and attempt == 0:
+                continue
+            with _state_lock:
+                if isinstance(e, DOWN_ERRORS):
+                    _down_until = time.monotonic() + getattr(settings, "INFERENCE_RETRY_INTERVAL", 5)
+                _fallbacks += 1
+            logger.warning("Inference daemon unavailable (%s); running in-process", e)
+            raise InferenceUnavailable(str(e))
+
+
+def _check(status, body):
+    if status == OK:
+        return body
+    message = json.loads(body or b"{}")
+    if status == BUSY:
+        from .ml_gate import Saturated
+        raise Saturated(message.get("reason", "inference daemon busy"), message.get("retry_after", 1))
+    if status == TOO_LARGE:
+        from .image_preprocess import ImageTooLarge
+        raise ImageTooLarge(message.get("error", "Image too large"))
+    raise RuntimeError(f"inference daemon: {message.get('error', 'unknown error')}")
+
+
+def as_bytes(src):
+    """Image source (path, bytes, file-like) -> bytes."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return bytes(src)
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as f:
+            return f.read()
+    if hasattr(src, "seek"):
+        src.seek(0)
+    return src.read()
+
+
+def predict_image(src):
+    return json.loads(_check(*call(OP_PREDICT_IMAGE, as_bytes(src))))
+
+
+def embed_image(src):
+    import numpy as np
+    return np.frombuffer(_check(*call(OP_EMBED_IMAGE, as_bytes(src))), dtype=np.float32).copy()
+
+
+def predict_price(sample):
+    return predict_price_versioned(sample)[0]
+
+
+def predict_price_versioned(sample):
+    """-> (price, sha256 of the daemon's price artifact)"""
+    payload = json.dumps(sample, default=str).encode()
+    data = json.loads(_check(*call(OP_PREDICT_PRICE, payload)))
+    return data["price"], data.get("version")
+
+
+def predict_prices(samples):
+    return predict_prices_versioned(samples)[0]
+
+
+def predict_prices_versioned(samples):
+    """-> (prices, sha256 of the daemon's price artifact)"""
+    payload = json.dumps(samples, default=str).encode()
+    data = json.loads(_check(*call(OP_PREDICT_PRICES, payload)))
+    return data["prices"], data.get("version")
+
+
+def price_categories():
+    """-> ({sample key: known values}, sha256) of the daemon's price artifact"""
+    data = json.loads(_check(*call(OP_PRICE_CATEGORIES)))
+    return data["categories"], data.get("version")
+
+
+def ping():
+    return json.loads(_check(*call(OP_PING)))
+
+
+def server_stats():
+    return json.loads(_check(*call(OP_STATS)))
+
+
+def status():
+    """For ml/status: configuration, client counters and (if reachable) the daemon's own stats."""
+    info = {
+        "socket": socket_path(),
+        "calls": _calls,
+        "fallbacks": _fallbacks,
+        "timeouts": _timeouts,
+        "marked_down": time.monotonic() < _down_until,
+    }
+    if is_enabled():
+        from .ml_gate import Saturated
+        try:
+            info["server"] = server_stats()
+        except (InferenceUnavailable, Saturated, RuntimeError) as e:
+            info["server"] = {"error": str(e)}
+    return info
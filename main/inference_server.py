@@ -0,0 +1,169 @@
+"""
+Local inference daemon: hosts the artist model and the price pipeline once
+per node and serves every web worker over a Unix domain socket.
+Started with `manage.py inference_server`; the wire format is documented
+in inference_client.
+
+Requests are handled on one thread per connection and go through this
+process's ml_gate, so a saturated daemon answers BUSY (-> 503 upstream)
+instead of queueing without bound.
+"""
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+from . import inference_client as proto
+from . import ml_gate
+
+logger = logging.getLogger(__name__)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                op, payload = proto.read_frame(sock)
+            except (ConnectionError, OSError):
+                return  # client went away
+            except proto.ProtocolError as e:
+                logger.warning("Dropping connection: %s", e)
+                return
+
+            status, body = self.server.dispatch(op, payload)
+            try:
+                proto.write_frame(sock, status, body)
+            except OSError:
+                return
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+
+        self.path = path
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.counts = {
+            "ping": 0, "stats": 0, "predict_image": 0, "predict_price": 0, "predict_prices": 0,
+            "price_categories": 0, "embed_image": 0, "errors": 0, "busy": 0,
+        }
+
+    def dispatch(self, op, payload):
+        handlers = {
+            proto.OP_PING: ("ping", self._ping),
+            proto.OP_STATS: ("stats", self._stats),
+            proto.OP_PREDICT_IMAGE: ("predict_image", self._predict_image),
+            proto.OP_PREDICT_PRICE: ("predict_price", self._predict_price),
+            proto.OP_PREDICT_PRICES: ("predict_prices", self._predict_prices),
+            proto.OP_PRICE_CATEGORIES: ("price_categories", self._price_categories),
+            proto.OP_EMBED_IMAGE: ("embed_image", self._embed_image),
+        }
+        if op not in handlers:
+            return proto.ERROR, _json({"error": f"unknown op {op}"})
+
+        name, handler = handlers[op]
+        self._count(name)
+        try:
+            if op in (proto.OP_PING, proto.OP_STATS):
+                return proto.OK, handler(payload)
+            with ml_gate.slot():
+                return proto.OK, handler(payload)
+        except ml_gate.Saturated as e:
+            self._count("busy")
+            return proto.BUSY, _json({"reason": e.reason, "retry_after": e.retry_after})
+        except Exception as e:
+            from .image_preprocess import ImageTooLarge
+
+            if isinstance(e, ImageTooLarge):
+                return proto.TOO_LARGE, _json({"error": str(e)})
+            self._count("errors")
+            logger.exception("%s failed", name)
+            return proto.ERROR, _json({"error": str(e)})
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    # ---------- ops ----------
+
+    def _ping(self, payload):
+        return b'{"ok": true}'
+
+    def _stats(self, payload):
+        from .benchmarking import current_rss_mb, peak_rss_mb
+        from .ml_model import manager
+        from .price_ml import status as price_status
+
+        return _json({
+            "pid": os.getpid(),
+            "uptime_s": round(time.monotonic() - self.started, 1),
+            "rss_mb": current_rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+            "requests": dict(self.counts),
+            "ml_gate": ml_gate.gate.stats(),
+            "artist_model": manager.status(),
+            "price_model": price_status(),
+        })
+
+    def _predict_image(self, payload):
+        from .ml_model import predict_image
+        return _json(predict_image(payload))
+
+    def _embed_image(self, payload):
+        from .ml_model import embed_image
+        return embed_image(payload).tobytes()
+
+    def _predict_price(self, payload):
+        from .price_ml import predict_price_versioned_local
+        price, version = predict_price_versioned_local(json.loads(payload))
+        return _json({"price": price, "version": version})
+
+    def _predict_prices(self, payload):
+        from .price_ml import predict_prices_versioned_local
+        prices, version = predict_prices_versioned_local(json.loads(payload))
+        return _json({"prices": prices, "version": version})
+
+
+    def _price_categories(self, payload):
+        from .price_ml import known_categories_local
+        categories, version = known_categories_local()
+        return _json({"categories": categories, "version": version})
+
+
+def _json(obj):
+    return json.dumps(obj).encode()
+
+
+def serve(path, preload=True):
+    proto.serve_locally()
+
+    if preload:
+        from . import ml_model, price_ml
+
+        for name, load in (("artist model", ml_model.warm_up), ("price pipeline", price_ml.load)):
+            t0 = time.perf_counter()
+            try:
+                load()
+                logger.info("%s loaded in %.1fs", name, time.perf_counter() - t0)
+            except Exception:
+                # keep serving what we can; requests for this model will report the error
+                logger.exception("Could not preload the %s", name)
+
+    server = InferenceServer(path)
+    logger.info("Inference daemon listening on %s (pid %d)", path, os.getpid())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,83 @@
+"""
+Cross-process locks for jobs that must run once at a time (weather prefetch,
+catalog re-price) and for writers that must take turns (model registry).
+
+A lock is an flock on LOCK_DIR/<name>.lock, so it is shared by every worker
+and management command on this host, and released by the OS when its holder
+exits, so a crashed job never leaves it stuck. Acquiring doesn't block by
+default:
+
+    with locks.held("prefetch_weather") as acquired:
+        if not acquired:
+            return  # someone else is running it
+        ...
+
+With blocking=True the caller waits for its turn instead. held_file() takes
+the same lock on an explicit path (e.g. next to the file it protects).
+"""
+import contextlib
+import os
+import re
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def lock_dir():
+    return str(getattr(settings, "LOCK_DIR", settings.BASE_DIR / "var" / "locks"))
+
+
+def path_for(name):
+    return os.path.join(lock_dir(), re.sub(r"[^\w.-]", "_", name) + ".lock")
+
+
+def _acquire(f, blocking=False):
+    if fcntl:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            if blocking:
+                raise
+            return False
+        return True
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            # LK_LOCK gives up after ~10 s: keep waiting
+
+
+def _release(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def held(name, blocking=False):
+    """Try to take lock `name`; yields True if this caller holds it (always, with blocking=True)."""
+    return held_file(path_for(name), blocking=blocking)
+
+
+@contextlib.contextmanager
+def held_file(path, blocking=False):
+    """held() on an explicit lock file path."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        f.seek(0)
+        if not _acquire(f, blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _release(f)
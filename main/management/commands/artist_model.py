@@ -0,0 +1,321 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# one fresh interpreter per run: load the URLconf like a web worker does, then
+# either pay the old import-time cost right away (torch, torchvision, checkpoint:
+# "eager", the baseline) or note what's loaded and defer the model to the first
+# request ("lazy", what workers do now)
+STARTUP_SNIPPET = """
+import json, sys, time, django
+django.setup()
+t0 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t1 = time.perf_counter()
+out = {"urlconf_seconds": round(t1 - t0, 3), "torch_imported": "torch" in sys.modules}
+import main.ml_model as m
+if sys.argv[1] == "eager":
+    import torch, torchvision
+    m.legacy_preprocess()
+    m.manager.get()
+    out["ready_seconds"] = round(time.perf_counter() - t0, 3)
+else:
+    out["ready_seconds"] = out["urlconf_seconds"]
+    t2 = time.perf_counter()
+    m.manager.get()
+    out["first_load_seconds"] = round(time.perf_counter() - t2, 3)
+print(json.dumps(out))
+"""
+
+
+# peak RSS of decoding one image with either preprocessing path, in a clean process
+PREPROCESS_RSS_SNIPPET = """
+import sys, django
+django.setup()
+from PIL import Image
+from main import ml_model, image_preprocess
+from main.benchmarking import current_rss_mb, peak_rss_mb
+before = current_rss_mb()
+if sys.argv[2] == "fast":
+    image_preprocess.preprocess(sys.argv[1])
+else:
+    ml_model.PREPROCESS(Image.open(sys.argv[1]).convert("RGB"))
+print(before, peak_rss_mb())
+"""
+
+
+class Command(BaseCommand):
+    help = "Inspect, warm up or time the artist-identification model."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            choices=[
+                "status", "warmup", "cache-stats", "cache-clear", "cache-evict", "expire-jobs", "trim-previews",
+                "startup-bench", "throughput-bench", "upload-bench", "preprocess-bench",
+            ],
+            help=(
+                "status: show load state | warmup: load now | "
+                "cache-stats / cache-clear / cache-evict: prediction cache counters / reset / LRU trim | "
+                "expire-jobs: expire abandoned / delete old identification jobs | "
+                "trim-previews: delete least-recently-used upload previews beyond the limit | "
+                "startup-bench: worker startup with the old eager import vs. the lazy one | "
+                "throughput-bench: batch-of-one vs. micro-batched predictions | "
+                "upload-bench: predictions with vs. without the disk round-trip | "
+                "preprocess-bench: PREPROCESS vs. reduced-decode fast path on large images"
+            ),
+        )
+        parser.add_argument(
+            "--with-imagenet",
+            action="store_true",
+            help="startup-bench: also time the old resnet50(weights=IMAGENET1K_V2) build (needs network or a cached download)",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="startup-bench: fresh interpreters per path; medians are reported (default: 3)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[1, 4, 16],
+            help="throughput-bench: concurrent callers to test (default: 1 4 16)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=64,
+            help="throughput-bench: predictions per concurrency level (default: 64)",
+        )
+
+    def handle(self, *args, **opts):
+        from main import ml_model
+
+        action = opts["action"]
+
+        if action == "status":
+            self.stdout.write(json.dumps(ml_model.manager.status(), indent=2))
+            return
+
+        if action in ("cache-stats", "cache-clear", "cache-evict"):
+            from main import prediction_cache
+
+            if action == "cache-clear":
+                prediction_cache.clear()
+                self.stdout.write(self.style.SUCCESS("Prediction cache cleared"))
+            elif action == "cache-evict":
+                evicted = prediction_cache.evict()
+                self.stdout.write(self.style.SUCCESS(f"{evicted} prediction(s) evicted"))
+            self.stdout.write(json.dumps(prediction_cache.stats(), indent=2))
+            return
+
+        if action == "expire-jobs":
+            from main import identify_jobs
+
+            expired, deleted = identify_jobs.expire_stale()
+            self.stdout.write(self.style.SUCCESS(f"{expired} job(s) expired, {deleted} deleted"))
+            return
+
+        if action == "trim-previews":
+            from main import upload_store
+
+            removed = upload_store.cleanup()
+            self.stdout.write(self.style.SUCCESS(f"{removed} upload preview(s) removed"))
+            return
+
+        if action == "warmup":
+            try:
+                status = ml_model.warm_up()
+            except Exception as e:
+                raise CommandError(f"Warm-up failed: {e}")
+            self.stdout.write(self.style.SUCCESS(
+                f"Artist model ready in {status['load_seconds']}s ({status['classes']} classes)"
+            ))
+            return
+
+        if action == "startup-bench":
+            self._startup_bench(ml_model, opts["with_imagenet"], opts["runs"])
+        elif action == "throughput-bench":
+            self._throughput_bench(ml_model, opts["concurrency"], opts["requests"])
+        elif action == "upload-bench":
+            self._upload_bench(ml_model, opts["concurrency"], opts["requests"])
+        else:
+            self._preprocess_bench(ml_model)
+
+    def _startup_bench(self, ml_model, with_imagenet, runs):
+        from statistics import median
+
+        from torchvision import models
+
+        report = {"runs": runs}
+
+        # 1) fresh interpreters: old eager import (baseline) vs. lazy import + first load
+        for mode in ("eager", "lazy"):
+            samples = []
+            for _ in range(max(1, runs)):
+                proc = subprocess.run(
+                    [sys.executable, "-c", STARTUP_SNIPPET, mode],
+                    capture_output=True,
+                    text=True,
+                    cwd=str(settings.BASE_DIR),
+                )
+                if proc.returncode != 0:
+                    report[f"{mode}_error"] = proc.stderr.strip().splitlines()[-1:]
+                    break
+                samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            if samples:
+                report[mode] = {
+                    key: median(s[key] for s in samples) if key != "torch_imported" else samples[0][key]
+                    for key in samples[0]
+                }
+        if "eager" in report and "lazy" in report:
+            report["ready_speedup"] = round(report["eager"]["ready_seconds"] / max(report["lazy"]["ready_seconds"], 1e-3), 1)
+
+        # 2) building the skeleton: no weights vs. downloading ImageNet weights
+        t0 = time.perf_counter()
+        ml_model.build_model(10)
+        report["build_no_weights_seconds"] = round(time.perf_counter() - t0, 3)
+
+        if with_imagenet:
+            t0 = time.perf_counter()
+            try:
+                models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V2)
+                report["build_imagenet_seconds"] = round(time.perf_counter() - t0, 3)
+            except Exception as e:
+                report["build_imagenet_error"] = str(e)
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _throughput_bench(self, ml_model, levels, total):
+        import tempfile
+
+        from main.benchmarking import run_concurrent, write_synthetic_images
+        from main.ml_batching import MicroBatcher
+
+        ml_model.warm_up()
+
+        paths = write_synthetic_images(
+            os.path.join(tempfile.gettempdir(), "artist_bench"),
+            sizes=[(800, 600), (1024, 1024)],
+        )
+
+        batcher = MicroBatcher(
+            ml_model.predict_batch,
+            max_batch_size=getattr(settings, "ARTIST_BATCH_MAX_SIZE", 8),
+            max_wait_ms=getattr(settings, "ARTIST_BATCH_MAX_WAIT_MS", 5),
+            name="bench-batcher",
+        )
+
+        def single(path):
+            return ml_model.predict_batch([ml_model.load_image_tensor(path)])[0]
+
+        def batched(path):
+            return batcher.submit(ml_model.load_image_tensor(path))
+
+        report = {"batcher": None, "results": []}
+        for level in levels:
+            report["results"].append({"path": "batch_of_one", **run_concurrent(single, paths, level, total)})
+            report["results"].append({"path": "micro_batched", **run_concurrent(batched, paths, level, total)})
+        report["batcher"] = batcher.stats()
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _upload_bench(self, ml_model, levels, total):
+        import io
+        import tempfile
+        import uuid
+
+        from main.benchmarking import run_concurrent, synthetic_image
+
+        ml_model.warm_up()
+
+        uploads = [synthetic_image(w, h, seed=i) for i, (w, h) in enumerate([(1600, 1200), (3000, 2000), (800, 600)])]
+        spool_dir = tempfile.mkdtemp(prefix="upload_bench_")
+
+        def via_disk(data):
+            # the old view: write the upload to MEDIA_ROOT, then reopen it by path
+            path = os.path.join(spool_dir, f"{uuid.uuid4().hex}.jpg")
+            with open(path, "wb") as f:
+                f.write(data)
+            try:
+                return ml_model.predict_image(path)
+            finally:
+                os.remove(path)
+
+        def in_memory(data):
+            return ml_model.predict_image(io.BytesIO(data))
+
+        report = {"results": []}
+        for level in levels:
+            report["results"].append({"path": "disk_round_trip", **run_concurrent(via_disk, uploads, level, total)})
+            report["results"].append({"path": "in_memory", **run_concurrent(in_memory, uploads, level, total)})
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _preprocess_bench(self, ml_model):
+        import tempfile
+
+        import torch
+        from PIL import Image
+
+        from main import image_preprocess
+        from main.benchmarking import percentiles, write_synthetic_images
+
+        paths = write_synthetic_images(
+            os.path.join(tempfile.gettempdir(), "artist_bench_large"),
+            sizes=[(1600, 1200), (4000, 3000), (7300, 5500)],
+            per_size=2,
+        )
+
+        try:
+            ml_model.warm_up()
+            model_ready = True
+        except Exception:
+            model_ready = False  # still report latency / RSS
+
+        report = {"images": []}
+        for path in paths:
+            legacy_ms, fast_ms = [], []
+            for _ in range(3):
+                t0 = time.perf_counter()
+                legacy = ml_model.PREPROCESS(Image.open(path).convert("RGB"))
+                legacy_ms.append((time.perf_counter() - t0) * 1000.0)
+
+                t0 = time.perf_counter()
+                fast = image_preprocess.preprocess(path)
+                fast_ms.append((time.perf_counter() - t0) * 1000.0)
+
+            entry = {
+                "image": os.path.basename(path),
+                "legacy": percentiles(legacy_ms),
+                "fast": percentiles(fast_ms),
+                "mean_abs_diff": round((legacy - fast).abs().mean().item(), 5),
+            }
+
+            if model_ready:
+                model, _ = ml_model.manager.get()
+                with torch.no_grad():
+                    logits = model(torch.stack([legacy, fast]).to(ml_model.manager.input_device))
+                entry["top1_match"] = bool(logits[0].argmax() == logits[1].argmax())
+
+            for mode in ("legacy", "fast"):
+                proc = subprocess.run(
+                    [sys.executable, "-c", PREPROCESS_RSS_SNIPPET, path, mode],
+                    capture_output=True, text=True, cwd=str(settings.BASE_DIR),
+                )
+                if proc.returncode == 0:
+                    before, after = (float(v) for v in proc.stdout.split()[-2:])
+                    entry[f"{mode}_peak_rss_delta_mb"] = round(max(0.0, after - before), 1)
+
+            report["images"].append(entry)
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,130 @@
+import json
+import os
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    """Answers every GET with a small JSON body, like the weather/profanity APIs."""
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    delay_s = 0.0
+    body = json.dumps({"current": {"temperature_2m": 21.3, "relative_humidity_2m": 60}}).encode()
+
+    def do_GET(self):
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of outbound GETs through main.http_client (pooled keep-alive sessions) "
+        "vs. a plain requests.get per call, against a local stand-in server (or --url). "
+        "Use --certfile/--keyfile to serve TLS, where connection reuse matters most."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per measurement")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="Client threads")
+        parser.add_argument("--delay-ms", type=float, default=0.0, help="Server-side delay per request")
+        parser.add_argument("--certfile", help="Serve HTTPS with this certificate (self-signed is fine)")
+        parser.add_argument("--keyfile", help="Private key for --certfile")
+        parser.add_argument("--url", help="Benchmark this URL instead of starting a stand-in server")
+        parser.add_argument(
+            "--output",
+            help="Report path (default: var/benchmarks/http_client_<timestamp>_<commit>.json)",
+        )
+
+    def handle(self, *args, **opts):
+        import requests
+        import urllib3
+
+        from main import http_client
+        from main.benchmarking import git_commit, run_concurrent
+
+        server = None
+        url = opts["url"]
+        verify = True
+        if not url:
+            server, url = self._serve(opts)
+            verify = not opts["certfile"]  # our own self-signed certificate
+            if not verify:
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        timeout = settings.OPENMETEO_TIMEOUT
+        fetchers = {
+            "unpooled": lambda _: requests.get(url, timeout=timeout, verify=verify).raise_for_status(),
+            "pooled": lambda _: http_client.get(url, timeout=timeout, verify=verify).raise_for_status(),
+        }
+
+        commit = git_commit(str(settings.BASE_DIR))
+        report = {
+            "meta": {
+                "commit": commit,
+                "created_at": timezone.now().isoformat(),
+                "url": url,
+                "tls": url.startswith("https"),
+                "pool_maxsize": http_client.pool_size(),
+                "params": {k: opts[k] for k in ("requests", "concurrency", "delay_ms")},
+            },
+            "results": [],
+        }
+        try:
+            for concurrency in opts["concurrency"]:
+                row = {"concurrency": concurrency}
+                for name, fetch in fetchers.items():
+                    http_client.close_all()
+                    fetch(None)  # warm-up (and fail early if the URL is wrong)
+                    row[name] = run_concurrent(fetch, [None], concurrency, opts["requests"])
+                row["p50_speedup"] = round(row["unpooled"]["p50_ms"] / row["pooled"]["p50_ms"], 2)
+                report["results"].append(row)
+                self.stdout.write(
+                    f"concurrency {concurrency:>3}: unpooled p50 {row['unpooled']['p50_ms']} ms "
+                    f"p95 {row['unpooled']['p95_ms']} ms, {row['unpooled']['throughput_per_s']}/s | "
+                    f"pooled p50 {row['pooled']['p50_ms']} ms p95 {row['pooled']['p95_ms']} ms, "
+                    f"{row['pooled']['throughput_per_s']}/s ({row['p50_speedup']}x)"
+                )
+        except requests.RequestException as e:
+            raise CommandError(f"Request to {url} failed: {e}")
+        finally:
+            http_client.close_all()
+            if server:
+                server.shutdown()
+                server.server_close()
+
+        path = opts["output"] or os.path.join(
+            str(settings.BASE_DIR), "var", "benchmarks",
+            f"http_client_{timezone.now():%Y%m%dT%H%M%S}_{commit or 'nogit'}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {path}"))
+
+    def _serve(self, opts):
+        handler = type("StandIn", (_StandIn,), {"delay_s": opts["delay_ms"] / 1000.0})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        scheme = "http"
+        if opts["certfile"]:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(opts["certfile"], opts["keyfile"])
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+            scheme = "https"
+        threading.Thread(target=server.serve_forever, name="http-stand-in", daemon=True).start()
+        host, port = server.server_address
+        return server, f"{scheme}://{host}:{port}/v1/forecast"
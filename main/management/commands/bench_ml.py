@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+TARGETS = ("predict_image", "predict_price")
+
+
+def _size(value):
+    try:
+        w, h = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return w, h
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproducible benchmark of the in-process ML models (predict_image, predict_price): "
+        "cold start, p50/p95/p99 latency, throughput per concurrency level and peak RSS. "
+        "Each model runs in its own clean process; the report is written as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", nargs="+", choices=TARGETS, default=list(TARGETS))
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            nargs="+",
+            default=[1, 4, 16],
+            help="Concurrent callers to test (default: 1 4 16)",
+        )
+        parser.add_argument("--requests", type=int, default=64, help="Calls per concurrency level (default: 64)")
+        parser.add_argument(
+            "--image-sizes",
+            type=_size,
+            nargs="+",
+            default=[(640, 480), (1600, 1200), (4000, 3000)],
+            metavar="WxH",
+            help="Synthetic JPEG sizes for predict_image (default: 640x480 1600x1200 4000x3000)",
+        )
+        parser.add_argument("--rows", type=int, default=200, help="Synthetic PriceForm rows for predict_price")
+        parser.add_argument(
+            "--output",
+            help="Report path (default: var/benchmarks/ml_<timestamp>_<commit>.json)",
+        )
+        parser.add_argument("--compare", help="Earlier report to print deltas against")
+        parser.add_argument(
+            "--via-server",
+            metavar="SOCKET",
+            help="Also run each target through the inference daemon listening on SOCKET "
+                 "(added IPC latency, per-node RSS with vs. without the daemon)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "ML_WEB_WORKERS", 1),
+            help="Web workers per node, for the --via-server RSS estimate (default: ML_WEB_WORKERS)",
+        )
+        # internal: benchmark one target in a clean process
+        parser.add_argument("--run-one", choices=TARGETS, help=argparse.SUPPRESS)
+        parser.add_argument("--run-socket", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **opts):
+        if opts["run_one"]:
+            self.stdout.write(json.dumps(self._run_one(opts["run_one"], opts)))
+            return
+
+        report = {"meta": self._meta(opts), "results": {}}
+        for target in opts["target"]:
+            self.stderr.write(f"benchmarking {target} ...")
+            report["results"][target] = self._spawn(target, opts)
+
+        if opts["via_server"]:
+            report["inference_server"] = self._via_server(opts, report["results"])
+
+        path = opts["output"] or os.path.join(
+            str(settings.BASE_DIR), "var", "benchmarks",
+            f"ml_{timezone.now():%Y%m%dT%H%M%S}_{report['meta']['commit'] or 'nogit'}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Report written to {path}"))
+
+        if opts["compare"]:
+            self._compare(opts["compare"], report)
+
+    # ---------------------- parent ----------------------
+
+    def _spawn(self, target, opts, socket_path=None):
+        cmd = [
+            sys.executable, os.path.join(str(settings.BASE_DIR), "manage.py"),
+            "bench_ml", "--run-one", target, "--skip-checks",
+            "--requests", str(opts["requests"]),
+            "--rows", str(opts["rows"]),
+            "--concurrency", *map(str, opts["concurrency"]),
+            "--image-sizes", *(f"{w}x{h}" for w, h in opts["image_sizes"]),
+        ]
+        if socket_path:
+            cmd += ["--run-socket", socket_path]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def _via_server(self, opts, in_process):
+        from main import inference_client
+
+        settings.INFERENCE_SOCKET = opts["via_server"]
+        try:
+            inference_client.ping()
+        except Exception as e:
+            return {"error": f"inference daemon not reachable on {opts['via_server']}: {e}"}
+
+        section = {"socket": opts["via_server"], "workers": opts["workers"], "results": {}, "comparison": {}}
+        for target in opts["target"]:
+            self.stderr.write(f"benchmarking {target} via the inference daemon ...")
+            section["results"][target] = self._spawn(target, opts, socket_path=opts["via_server"])
+
+        daemon = inference_client.server_stats()
+        section["daemon"] = {k: daemon[k] for k in ("pid", "rss_mb", "peak_rss_mb", "requests")}
+
+        for target, remote in section["results"].items():
+            local = in_process.get(target, {})
+            if "error" in remote or "error" in local:
+                continue
+            section["comparison"][target] = {
+                "added_p50_ms": round(remote["sequential"]["p50_ms"] - local["sequential"]["p50_ms"], 3),
+                "added_p99_ms": round(remote["sequential"]["p99_ms"] - local["sequential"]["p99_ms"], 3),
+                "ipc_round_trip_p50_ms": remote["ipc_ping"]["p50_ms"],
+                "worker_peak_rss_mb": {"in_process": local["peak_rss_mb"], "via_server": remote["peak_rss_mb"]},
+                # N workers each holding the model vs. N thin clients + one daemon
+                "node_rss_mb": {
+                    "in_process": round(opts["workers"] * local["peak_rss_mb"], 1),
+                    "via_server": round(opts["workers"] * remote["peak_rss_mb"] + daemon["rss_mb"], 1),
+                },
+            }
+        return section
+
+    def _meta(self, opts):
+        from main.benchmarking import git_commit
+
+        commit = git_commit(str(settings.BASE_DIR))
+
+        versions = {"python": platform.python_version()}
+        for name in ("torch", "numpy", "sklearn", "pandas"):
+            try:
+                versions[name] = __import__(name).__version__
+            except Exception:
+                versions[name] = None
+
+        return {
+            "commit": commit,
+            "created_at": timezone.now().isoformat(),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": versions,
+            "settings": {
+                name: getattr(settings, name, None)
+                for name in (
+                    "ARTIST_MODEL_BACKEND", "ARTIST_BATCHING_ENABLED",
+                    "ARTIST_PREDICTION_CACHE_ENABLED", "ARTIST_FAST_PREPROCESS",
+                )
+            },
+            "params": {
+                "concurrency": opts["concurrency"],
+                "requests": opts["requests"],
+                "image_sizes": [f"{w}x{h}" for w, h in opts["image_sizes"]],
+                "rows": opts["rows"],
+            },
+        }
+
+    def _compare(self, baseline_path, report):
+        try:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read {baseline_path}: {e}")
+
+        self.stdout.write(f"\nvs. {baseline_path} (commit {baseline.get('meta', {}).get('commit')})")
+        for target, current in report["results"].items():
+            before = baseline.get("results", {}).get(target)
+            if not before or "error" in before or "error" in current:
+                continue
+            self.stdout.write(f"{target}:")
+            pairs = [("cold_start", "first_call_seconds"), ("sequential", "p50_ms"), ("sequential", "p99_ms")]
+            for section, key in pairs:
+                self._delta(f"  {section}.{key}", before[section].get(key), current[section].get(key))
+            old_levels = {r["concurrency"]: r for r in before["concurrent"]}
+            for level in current["concurrent"]:
+                old = old_levels.get(level["concurrency"])
+                if old:
+                    self._delta(
+                        f"  c={level['concurrency']} throughput_per_s",
+                        old["throughput_per_s"], level["throughput_per_s"],
+                    )
+            self._delta("  peak_rss_mb", before.get("peak_rss_mb"), current.get("peak_rss_mb"))
+
+    def _delta(self, label, old, new):
+        if old is None or new is None:
+            return
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        self.stdout.write(f"{label}: {old} -> {new} ({change})")
+
+    # ---------------------- child ----------------------
+
+    def _run_one(self, target, opts):
+        from main.benchmarking import current_rss_mb
+
+        if opts["run_socket"]:
+            settings.INFERENCE_SOCKET = opts["run_socket"]
+
+        rss_start = current_rss_mb()
+        if target == "predict_image":
+            fn, inputs, cold = self._image_target(opts)
+        else:
+            fn, inputs, cold = self._price_target(opts)
+        result = self._measure(fn, inputs, cold, rss_start, opts)
+
+        if opts["run_socket"]:
+            result.update(self._ipc_stats())
+        return result
+
+    def _ipc_stats(self):
+        from main import inference_client
+        from main.benchmarking import percentiles
+
+        latencies = []
+        for _ in range(200):
+            t0 = time.perf_counter()
+            inference_client.call(inference_client.OP_PING)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        return {
+            "ipc_ping": percentiles(latencies),
+            # anything here means some calls silently ran in-process
+            "fallbacks": inference_client.status()["fallbacks"],
+        }
+
+    def _image_target(self, opts):
+        import io
+
+        from main.benchmarking import synthetic_image
+
+        uploads = [
+            synthetic_image(w, h, seed=i)
+            for i, (w, h) in enumerate(opts["image_sizes"])
+        ]
+
+        t0 = time.perf_counter()
+        from main import ml_model
+        import_s = time.perf_counter() - t0
+
+        def fn(data):
+            return ml_model.predict_image(io.BytesIO(data))
+
+        return fn, uploads, {"import_seconds": round(import_s, 3)}
+
+    def _price_target(self, opts):
+        from main.benchmarking import synthetic_price_rows
+        from main.forms import PriceForm
+
+        rows = []
+        for raw in synthetic_price_rows(opts["rows"]):
+            form = PriceForm(raw)
+            if form.is_valid():
+                rows.append(form.cleaned_data)
+        if not rows:
+            raise CommandError("No synthetic PriceForm row validated")
+
+        # the pipeline loads on the first call, so first_call_seconds includes it
+        t0 = time.perf_counter()
+        from main.price_ml import predict_price
+        import_s = time.perf_counter() - t0
+
+        return predict_price, rows, {"import_seconds": round(import_s, 3)}
+
+    def _measure(self, fn, inputs, cold, rss_start, opts):
+        from main.benchmarking import current_rss_mb, peak_rss_mb, percentiles, run_concurrent
+
+        t0 = time.perf_counter()
+        fn(inputs[0])
+        cold["first_call_seconds"] = round(time.perf_counter() - t0, 3)
+        rss_loaded = current_rss_mb()
+
+        latencies = []
+        for i in range(max(opts["requests"], len(inputs))):
+            t0 = time.perf_counter()
+            fn(inputs[i % len(inputs)])
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+        return {
+            "inputs": len(inputs),
+            "cold_start": cold,
+            "sequential": percentiles(latencies),
+            "concurrent": [
+                run_concurrent(fn, inputs, level, opts["requests"])
+                for level in opts["concurrency"]
+            ],
+            "rss_after_load_mb": round(rss_loaded - rss_start, 1),
+            "peak_rss_mb": peak_rss_mb(),
+        }
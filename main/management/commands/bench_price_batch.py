@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Rows/sec of the price model called once per row (predict_price, as the form "
+        "does) vs. once per batch (predict_prices, as the CSV/XLSX upload does), plus "
+        "the full upload path, on synthetic PriceForm rows. Also checks both give the "
+        "same prices. Runs in-process; the report is written as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[100, 1000, 10000],
+            help="Batch sizes to test (default: 100 1000 10000)",
+        )
+        parser.add_argument(
+            "--loop-limit",
+            type=int,
+            default=2000,
+            help="Time the per-row loop on at most this many rows (it's slow); rows/s is per row anyway",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N runs per measurement")
+        parser.add_argument(
+            "--output",
+            help="Report path (default: var/benchmarks/price_batch_<timestamp>_<commit>.json)",
+        )
+
+    def handle(self, *args, **opts):
+        from main import price_batch, price_ml
+        from main.benchmarking import git_commit, peak_rss_mb
+        from main.forms import PriceForm
+
+        try:
+            price_ml.load()
+        except Exception as e:
+            raise CommandError(f"Can't load the price pipeline: {e}")
+
+        rows = self._rows(max(opts["rows"]), PriceForm)
+        commit = git_commit(str(settings.BASE_DIR))
+        report = {
+            "meta": {
+                "commit": commit,
+                "created_at": timezone.now().isoformat(),
+                "cpu_count": os.cpu_count(),
+                "params": {k: opts[k] for k in ("rows", "loop_limit", "repeat")},
+            },
+            "results": [],
+        }
+
+        for n in opts["rows"]:
+            batch = rows[:n]
+            looped = batch[:opts["loop_limit"]]
+
+            loop_s, loop_prices = self._best(opts["repeat"], lambda: [price_ml.predict_price_local(r) for r in looped])
+            batch_s, batch_prices = self._best(opts["repeat"], lambda: price_ml.predict_prices_local(batch))
+            upload_s, _ = self._best(opts["repeat"], lambda: self._upload(batch, price_batch))
+
+            diffs = [abs(a - b) for a, b in zip(loop_prices, batch_prices)]
+            result = {
+                "rows": n,
+                "loop": {"rows": len(looped), "seconds": round(loop_s, 4), "rows_per_s": round(len(looped) / loop_s, 1)},
+                "batch": {"rows": n, "seconds": round(batch_s, 4), "rows_per_s": round(n / batch_s, 1)},
+                "csv_upload": {"rows": n, "seconds": round(upload_s, 4), "rows_per_s": round(n / upload_s, 1)},
+                "speedup": round((n / batch_s) / (len(looped) / loop_s), 1),
+                "max_abs_diff": max(diffs) if diffs else None,
+            }
+            report["results"].append(result)
+            self.stdout.write(
+                f"{n:>7} rows: loop {result['loop']['rows_per_s']:>9} rows/s, "
+                f"batch {result['batch']['rows_per_s']:>10} rows/s ({result['speedup']}x), "
+                f"CSV upload {result['csv_upload']['rows_per_s']:>10} rows/s, "
+                f"max |diff| {result['max_abs_diff']}"
+            )
+
+        report["peak_rss_mb"] = peak_rss_mb()
+
+        path = opts["output"] or os.path.join(
+            str(settings.BASE_DIR), "var", "benchmarks",
+            f"price_batch_{timezone.now():%Y%m%dT%H%M%S}_{commit or 'nogit'}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {path}"))
+
+        worst = max((r["max_abs_diff"] or 0) for r in report["results"])
+        if worst > 1e-6:
+            raise CommandError(f"Batched prices differ from per-row prices (max |diff| {worst})")
+
+    def _rows(self, n, form_class):
+        from main.benchmarking import synthetic_price_rows
+
+        rows = []
+        for raw in synthetic_price_rows(n):
+            form = form_class(raw)
+            if form.is_valid():
+                rows.append(form.cleaned_data)
+        if not rows:
+            raise CommandError("No synthetic PriceForm row validated")
+        while len(rows) < n:
+            rows += rows[:n - len(rows)]
+        return rows
+
+    def _upload(self, rows, price_batch):
+        # the CSV a user would upload, parsed and priced the way the view does it
+        header = list(rows[0])
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(header)
+        writer.writerows([row[k] for k in header] for row in rows)
+        text.seek(0)
+        reader = csv.reader(text)
+        next(reader)
+        priced = list(price_batch.priced_rows(reader, price_batch.column_map(header)))
+        for _ in price_batch.csv_chunks(header, priced):
+            pass
+
+    def _best(self, repeat, fn):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
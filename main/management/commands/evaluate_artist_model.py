@@ -0,0 +1,251 @@
+import csv
+import json
+import os
+import time
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from torch.utils.data import DataLoader, Dataset
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class LabelledImages(Dataset):
+    """
+    (path, label) pairs; images are decoded one at a time in the loader
+    workers, so only the file list is held in memory.
+    """
+
+    def __init__(self, samples, fast=False):
+        self.samples = samples
+        self.fast = fast
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        from main import image_preprocess, ml_model
+
+        path, label = self.samples[i]
+        try:
+            if self.fast:
+                tensor = image_preprocess.preprocess(path)
+            else:
+                with image_preprocess.open_bounded(path, reduce=False) as img:
+                    tensor = ml_model.PREPROCESS(img.convert("RGB"))
+        except Exception:
+            return None, label, i  # unreadable: counted, not fatal
+        return tensor, label, i
+
+
+def collate(items):
+    ok = [(t, label, i) for t, label, i in items if t is not None]
+    failed = [i for t, _, i in items if t is None]
+    if not ok:
+        return None, None, None, failed
+    tensors, labels, idx = zip(*ok)
+    return torch.stack(tensors), torch.tensor(labels), list(idx), failed
+
+
+def _worker_init(_):
+    # each loader worker decodes one image at a time; don't let them fight over cores
+    torch.set_num_threads(1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Evaluate artist_model.pth on a labelled image tree (one folder per artist "
+        "in CLASS_NAMES): top-1/top-3 accuracy, per-class recall, confusion matrix "
+        "and images/sec. CPU only; images are streamed, so the dataset can exceed RAM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Root folder: <directory>/<artist name>/<image>")
+        parser.add_argument("--checkpoint", help="Checkpoint to evaluate (default: the active artist model)")
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=min(4, os.cpu_count() or 1),
+            help="DataLoader worker processes decoding images (0 = decode in this process)",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=None,
+            help="torch threads for the forward pass (default: cores not used by loader workers)",
+        )
+        parser.add_argument(
+            "--fast-preprocess",
+            action="store_true",
+            help="Evaluate the reduced-decode fast path instead of PREPROCESS",
+        )
+        parser.add_argument("--limit", type=int, default=0, help="Evaluate at most N images (0 = all)")
+        parser.add_argument("--predictions", help="Write one CSV row per image (path, true, predicted, confidence)")
+        parser.add_argument("--output", help="Also write the report as JSON")
+
+    def handle(self, *args, **opts):
+        from main import ml_model
+
+        root = opts["directory"]
+        if not os.path.isdir(root):
+            raise CommandError(f"Not a directory: {root}")
+
+        checkpoint = opts["checkpoint"] or ml_model.manager.path
+        if not os.path.exists(checkpoint):
+            raise CommandError(f"Checkpoint not found: {checkpoint}")
+
+        cores = os.cpu_count() or 1
+        torch.set_num_threads(opts["threads"] or max(1, cores - opts["workers"]))
+
+        model, class_names = ml_model.load_checkpoint(checkpoint, torch.device("cpu"))
+        samples, unknown_dirs = self._scan(root, class_names, opts["limit"])
+        if not samples:
+            raise CommandError(f"No images under {root} in folders named after {class_names}")
+        if unknown_dirs:
+            self.stderr.write(self.style.WARNING(
+                f"Skipped folders that aren't classes of this model: {', '.join(sorted(unknown_dirs))}"
+            ))
+
+        loader = DataLoader(
+            LabelledImages(samples, fast=opts["fast_preprocess"]),
+            batch_size=opts["batch_size"],
+            num_workers=opts["workers"],
+            collate_fn=collate,
+            worker_init_fn=_worker_init if opts["workers"] else None,
+            prefetch_factor=2 if opts["workers"] else None,
+        )
+
+        n = len(class_names)
+        confusion = torch.zeros((n, n), dtype=torch.int64)
+        top3_hits = 0
+        evaluated = 0
+        batches = 0
+        unreadable = []
+
+        pred_file = open(opts["predictions"], "w", newline="") if opts["predictions"] else None
+        writer = csv.writer(pred_file) if pred_file else None
+        if writer:
+            writer.writerow(["path", "true", "predicted", "confidence", "top3"])
+
+        started = time.perf_counter()
+        forward_s = 0.0
+        try:
+            with torch.no_grad():
+                for batch, labels, idx, failed in loader:
+                    unreadable.extend(samples[i][0] for i in failed)
+                    if batch is None:
+                        continue
+
+                    t0 = time.perf_counter()
+                    probs = torch.softmax(model(batch), dim=1)
+                    forward_s += time.perf_counter() - t0
+
+                    conf, top3 = probs.topk(min(3, n), dim=1)
+                    top1 = top3[:, 0]
+                    confusion.index_put_((labels, top1), torch.ones_like(labels), accumulate=True)
+                    top3_hits += int((top3 == labels[:, None]).any(dim=1).sum())
+                    evaluated += len(labels)
+
+                    if writer:
+                        for row, i in enumerate(idx):
+                            writer.writerow([
+                                samples[i][0],
+                                class_names[labels[row]],
+                                class_names[top1[row]],
+                                round(float(conf[row, 0]), 4),
+                                "|".join(class_names[c] for c in top3[row].tolist()),
+                            ])
+
+                    batches += 1
+                    if batches % 20 == 0:
+                        self.stderr.write(f"  {evaluated}/{len(samples)} images")
+        finally:
+            if pred_file:
+                pred_file.close()
+
+        elapsed = time.perf_counter() - started
+        report = self._report(class_names, confusion, top3_hits, evaluated, unreadable, elapsed, forward_s, opts)
+        self._print(report)
+
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {opts['output']}"))
+
+    def _scan(self, root, class_names, limit):
+        by_name = {name.lower(): i for i, name in enumerate(class_names)}
+        samples, unknown = [], set()
+
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+            label = by_name.get(entry.name.lower())
+            if label is None:
+                unknown.add(entry.name)
+                continue
+            for dirpath, _, files in os.walk(entry.path):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTS):
+                        samples.append((os.path.join(dirpath, name), label))
+
+        if limit:
+            # keep every class represented: take a stride through the list
+            step = max(1, len(samples) // limit)
+            samples = samples[::step][:limit]
+        return samples, unknown
+
+    def _report(self, class_names, confusion, top3_hits, evaluated, unreadable, elapsed, forward_s, opts):
+        support = confusion.sum(dim=1)
+        predicted = confusion.sum(dim=0)
+        correct = confusion.diag()
+
+        per_class = {}
+        for i, name in enumerate(class_names):
+            per_class[name] = {
+                "support": int(support[i]),
+                "recall": round(float(correct[i]) / int(support[i]), 4) if support[i] else None,
+                "precision": round(float(correct[i]) / int(predicted[i]), 4) if predicted[i] else None,
+            }
+
+        return {
+            "directory": os.path.abspath(opts["directory"]),
+            "preprocess": "fast" if opts["fast_preprocess"] else "PREPROCESS",
+            "images": evaluated,
+            "unreadable": len(unreadable),
+            "unreadable_examples": unreadable[:10],
+            "top1_accuracy": round(float(correct.sum()) / evaluated, 4) if evaluated else None,
+            "top3_accuracy": round(top3_hits / evaluated, 4) if evaluated else None,
+            "per_class": per_class,
+            "confusion_matrix": {
+                "labels": class_names,  # rows: true artist, columns: predicted
+                "matrix": confusion.tolist(),
+            },
+            "seconds": round(elapsed, 2),
+            "images_per_s": round(evaluated / elapsed, 2) if elapsed else None,
+            "forward_images_per_s": round(evaluated / forward_s, 2) if forward_s else None,
+            "batch_size": opts["batch_size"],
+            "loader_workers": opts["workers"],
+            "torch_threads": torch.get_num_threads(),
+        }
+
+    def _print(self, report):
+        out = self.stdout.write
+        out(f"Images: {report['images']} ({report['unreadable']} unreadable)")
+        out(f"Top-1 accuracy: {report['top1_accuracy']}   Top-3 accuracy: {report['top3_accuracy']}")
+        out(
+            f"Throughput: {report['images_per_s']} images/s end to end, "
+            f"{report['forward_images_per_s']} images/s forward only"
+        )
+
+        out("\nPer class:")
+        width = max(len(name) for name in report["per_class"])
+        for name, stats in report["per_class"].items():
+            out(f"  {name:<{width}}  recall {stats['recall']!s:<7} precision {stats['precision']!s:<7} n={stats['support']}")
+
+        labels = report["confusion_matrix"]["labels"]
+        cell = max(5, max(len(str(v)) for row in report["confusion_matrix"]["matrix"] for v in row) + 1)
+        out("\nConfusion matrix (rows: true, columns: predicted):")
+        out(" " * (width + 2) + "".join(f"{i:>{cell}}" for i in range(len(labels))))
+        for i, row in enumerate(report["confusion_matrix"]["matrix"]):
+            out(f"  {labels[i]:<{width}}" + "".join(f"{v:>{cell}}" for v in row) + f"   [{i}]")
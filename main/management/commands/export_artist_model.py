@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class Command(BaseCommand):
+    help = (
+        "Export artist_model.pth to TorchScript / int8 / ONNX backends, "
+        "check top-1/top-3 parity against eager and benchmark each backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            nargs="+",
+            choices=["torchscript", "quantized", "onnx"],
+            default=["torchscript", "quantized", "onnx"],
+            help="Backends to export/check (default: all)",
+        )
+        parser.add_argument("--skip-export", action="store_true", help="Reuse existing artifacts")
+        parser.add_argument("--parity", action="store_true", help="Compare predictions with the eager model")
+        parser.add_argument("--bench", action="store_true", help="Latency / throughput / RSS per backend")
+        parser.add_argument(
+            "--images",
+            help="Directory of images for --parity/--bench (default: synthetic images)",
+        )
+        parser.add_argument("--samples", type=int, default=32, help="Images used for --parity/--bench")
+        # internal: run the benchmark for one backend in a clean process
+        parser.add_argument("--bench-one", choices=["eager", "torchscript", "quantized", "onnx"], help=argparse.SUPPRESS)
+
+    def handle(self, *args, **opts):
+        from main import ml_backends, ml_model
+        from main.prediction_cache import model_version
+
+        paths = self._images(opts["images"], opts["samples"])
+
+        if opts["bench_one"]:
+            self.stdout.write(json.dumps(self._bench_one(opts["bench_one"], paths)))
+            return
+
+        checkpoint = ml_model.manager.path
+        if not os.path.exists(checkpoint):
+            raise CommandError(f"Checkpoint not found: {checkpoint}")
+
+        eager, class_names = ml_model.load_checkpoint(checkpoint, torch.device("cpu"))
+
+        if not opts["skip_export"]:
+            version = model_version(checkpoint)
+            for backend in opts["backend"]:
+                t0 = time.perf_counter()
+                try:
+                    path = ml_backends.export(backend, eager, class_names, checkpoint, source_version=version)
+                except Exception as e:
+                    self.stderr.write(self.style.ERROR(f"{backend}: export failed: {e}"))
+                    continue
+                size_mb = os.path.getsize(path) / (1024 * 1024)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{backend}: {path} ({size_mb:.1f} MB, {time.perf_counter() - t0:.1f}s)"
+                ))
+
+        if opts["parity"]:
+            self._parity(ml_backends, ml_model, eager, checkpoint, opts["backend"], paths)
+
+        if opts["bench"]:
+            self._bench_all(["eager", *opts["backend"]], opts)
+
+    # ---------------------- parity ----------------------
+
+    def _parity(self, ml_backends, ml_model, eager, checkpoint, backends, paths):
+        batch = torch.stack([ml_model.PREPROCESS(Image.open(p).convert("RGB")) for p in paths])
+
+        with torch.no_grad():
+            ref_probs = torch.softmax(eager(batch), dim=1)
+        ref_top1 = ref_probs.argmax(dim=1)
+        ref_top3 = ref_probs.topk(3, dim=1).indices
+
+        report = {}
+        for backend in backends:
+            try:
+                runner, _ = ml_backends.load_runner(backend, checkpoint)
+            except ml_backends.BackendUnavailable as e:
+                report[backend] = {"error": str(e)}
+                continue
+
+            with torch.no_grad():
+                probs = torch.softmax(runner(batch), dim=1)
+            top1 = probs.argmax(dim=1)
+            top3 = probs.topk(3, dim=1).indices
+
+            same_top3 = [
+                set(a.tolist()) == set(b.tolist()) for a, b in zip(top3, ref_top3)
+            ]
+            report[backend] = {
+                "images": len(paths),
+                "top1_agreement": round((top1 == ref_top1).float().mean().item(), 4),
+                "top3_set_agreement": round(sum(same_top3) / len(same_top3), 4),
+                "max_abs_prob_diff": round((probs - ref_probs).abs().max().item(), 6),
+            }
+
+        self.stdout.write(json.dumps({"parity": report}, indent=2))
+
+    # ---------------------- bench ----------------------
+
+    def _bench_all(self, backends, opts):
+        report = {}
+        for backend in backends:
+            cmd = [
+                sys.executable, os.path.join(str(settings.BASE_DIR), "manage.py"),
+                "export_artist_model", "--bench-one", backend, "--samples", str(opts["samples"]),
+            ]
+            if opts["images"]:
+                cmd += ["--images", opts["images"]]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                report[backend] = {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+                continue
+            report[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(json.dumps({"bench": report}, indent=2))
+
+    def _bench_one(self, backend, paths):
+        from main import ml_model
+        from main.benchmarking import current_rss_mb, peak_rss_mb, percentiles
+
+        rss_before = current_rss_mb()
+        manager = ml_model.ArtistModelManager(ml_model.manager.path, torch.device("cpu"), backend=backend)
+        status = manager.warm_up()
+        runner, _ = manager.get()
+
+        tensors = [ml_model.PREPROCESS(Image.open(p).convert("RGB")) for p in paths]
+
+        with torch.no_grad():
+            runner(tensors[0].unsqueeze(0))  # warm-up pass
+
+            latencies = []
+            for t in tensors:
+                t0 = time.perf_counter()
+                runner(t.unsqueeze(0))
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+
+            batch = torch.stack(tensors[:8])
+            t0 = time.perf_counter()
+            rounds = max(1, len(tensors) // len(batch))
+            for _ in range(rounds):
+                runner(batch)
+            batch_elapsed = time.perf_counter() - t0
+
+        return {
+            "active_backend": status["active_backend"],
+            "load_seconds": status["load_seconds"],
+            "batch1": percentiles(latencies),
+            "batch8_images_per_s": round(rounds * len(batch) / batch_elapsed, 2),
+            "rss_model_mb": round(current_rss_mb() - rss_before, 1),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    # ---------------------- inputs ----------------------
+
+    def _images(self, directory, samples):
+        if directory:
+            found = []
+            for root, _, files in os.walk(directory):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTS):
+                        found.append(os.path.join(root, name))
+            if not found:
+                raise CommandError(f"No images found under {directory}")
+            return found[:samples]
+
+        from main.benchmarking import write_synthetic_images
+
+        per_size = max(1, samples // 2)
+        return write_synthetic_images(
+            os.path.join(tempfile.gettempdir(), "artist_bench"),
+            sizes=[(800, 600), (1024, 1024)],
+            per_size=per_size,
+        )[:samples]
@@ -0,0 +1,293 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import torch.nn as nn
+from django.core.management.base import BaseCommand, CommandError
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class Command(BaseCommand):
+    help = (
+        "Retrain only the classifier head (fc) of the artist model on CPU: frozen "
+        "backbone features are extracted once into a memory-mapped cache (only new "
+        "or changed images on later runs), then fc is trained from the cache. "
+        "Writes a checkpoint in the usual {class_names, model_state_dict} format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", help="Labelled folder tree: <dir>/<artist name>/<image>")
+        parser.add_argument(
+            "--catalog",
+            action="store_true",
+            help="Also use catalog artworks that have an image and an artist",
+        )
+        parser.add_argument("--checkpoint", help="Starting checkpoint (default: the active artist model)")
+        parser.add_argument(
+            "--output",
+            help="Where to write the new checkpoint (default: artist_model.finetuned.pth next to the original)",
+        )
+        parser.add_argument(
+            "--install",
+            action="store_true",
+            help="Replace the starting checkpoint (a .bak copy is kept), or publish a new "
+                 "active version if it comes from the model registry",
+        )
+        parser.add_argument("--min-images", type=int, default=5, help="Ignore new artists with fewer images")
+        parser.add_argument("--epochs", type=int, default=40)
+        parser.add_argument("--lr", type=float, default=1e-3)
+        parser.add_argument("--weight-decay", type=float, default=1e-4)
+        parser.add_argument("--batch-size", type=int, default=256, help="Training batch (cached features)")
+        parser.add_argument("--val", type=float, default=0.15, help="Held-out fraction for validation")
+        parser.add_argument("--extract-batch-size", type=int, default=32)
+        parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Image decode threads")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        from main import feature_cache, ml_model, model_registry
+
+        if not opts["images"] and not opts["catalog"]:
+            raise CommandError("Give --images DIR and/or --catalog")
+
+        checkpoint = opts["checkpoint"] or ml_model.manager.path
+        if not os.path.exists(checkpoint):
+            raise CommandError(f"Checkpoint not found: {checkpoint}")
+
+        model, old_classes = ml_model.load_checkpoint(checkpoint, torch.device("cpu"))
+
+        samples = []  # (key, label name, source)
+        if opts["images"]:
+            samples += self._folder_samples(opts["images"])
+        if opts["catalog"]:
+            samples += self._catalog_samples()
+        if not samples:
+            raise CommandError("No labelled images found")
+
+        # 1) features: only images not in the cache yet
+        cache = feature_cache.FeatureCache(feature_cache.backbone_fingerprint(model))
+        self._extract(model, cache, samples, opts)
+
+        # 2) classes: the old ones (kept even without new data) + new artists with enough images
+        counts = {}
+        for _, label, _ in samples:
+            counts[label] = counts.get(label, 0) + 1
+        new = sorted(
+            label for label, n in counts.items()
+            if label not in old_classes and n >= opts["min_images"]
+        )
+        skipped = sorted(label for label, n in counts.items() if label not in old_classes and n < opts["min_images"])
+        if skipped:
+            self.stderr.write(self.style.WARNING(
+                f"Not enough images (< {opts['min_images']}) for: {', '.join(skipped)}"
+            ))
+        class_names = old_classes + new
+        class_index = {name: i for i, name in enumerate(class_names)}
+
+        keys = [key for key, label, _ in samples if label in class_index and key in cache]
+        labels = np.array([class_index[label] for key, label, _ in samples if label in class_index and key in cache])
+        rows = cache.rows_for(keys)
+        self.stdout.write(
+            f"{len(rows)} images, {len(class_names)} classes "
+            f"({len(new)} new: {', '.join(new) or '-'}), feature cache {cache.dir}"
+        )
+
+        # 3) train fc from the memory-mapped features
+        fc, stats = self._train(model.fc, cache.vectors(), rows, labels, old_classes, class_names, opts)
+
+        # 4) same checkpoint format as before, only fc differs
+        state = model.state_dict()
+        state["fc.weight"] = fc.weight.detach().clone()
+        state["fc.bias"] = fc.bias.detach().clone()
+        out = self._output_path(checkpoint, opts)
+        if out is None:
+            # registry versions are immutable: --install publishes a new active version
+            fd, tmp = tempfile.mkstemp(suffix=".pth")
+            os.close(fd)
+            try:
+                torch.save({"class_names": class_names, "model_state_dict": state}, tmp)
+                artifact = model_registry.publish("artist", tmp, activate=True, note="finetune_artist_head")
+            finally:
+                os.remove(tmp)
+            out = f"{artifact.path} (model registry version {artifact.version}, now active)"
+        else:
+            tmp = out + ".tmp"
+            torch.save({"class_names": class_names, "model_state_dict": state}, tmp)
+            os.replace(tmp, out)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Head trained in {stats['train_seconds']}s: val top-1 {stats['val_top1']} "
+            f"(before: {stats['val_top1_before']}), checkpoint written to {out}"
+        ))
+
+    # ---------------------- inputs ----------------------
+
+    def _folder_samples(self, root):
+        if not os.path.isdir(root):
+            raise CommandError(f"Not a directory: {root}")
+        samples = []
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+            for dirpath, _, files in os.walk(entry.path):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTS):
+                        path = os.path.join(dirpath, name)
+                        st = os.stat(path)
+                        key = f"file:{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+                        samples.append((key, entry.name, path))
+        return samples
+
+    def _catalog_samples(self):
+        from gallery.models import Artwork
+
+        samples = []
+        qs = (
+            Artwork.objects
+            .exclude(image="").exclude(image__isnull=True)
+            .exclude(artist="")
+            .only("id", "image", "artist")
+            .order_by("id")
+        )
+        for art in qs.iterator(chunk_size=2000):
+            try:
+                size = art.image.size
+            except (OSError, ValueError):
+                continue  # file missing from storage
+            samples.append((f"media:{art.image.name}|{size}", art.artist.strip(), art.image))
+        return samples
+
+    # ---------------------- features ----------------------
+
+    def _extract(self, model, cache, samples, opts):
+        from main import ml_model
+
+        todo = [(key, source) for key, _, source in samples if key not in cache]
+        if not todo:
+            self.stdout.write(f"All {len(samples)} images already in the feature cache")
+            return
+
+        def load(item):
+            key, source = item
+            try:
+                if isinstance(source, str):
+                    return key, ml_model.load_image_tensor(source)
+                with source.open("rb") as f:
+                    return key, ml_model.load_image_tensor(f)
+            except Exception as e:
+                self.stderr.write(f"  skipping {key}: {e}")
+                return key, None
+
+        started = time.perf_counter()
+        done = 0
+        step = opts["extract_batch_size"]
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool, torch.no_grad():
+            for i in range(0, len(todo), step):
+                loaded = [(k, t) for k, t in pool.map(load, todo[i:i + step]) if t is not None]
+                if not loaded:
+                    continue
+                feats = ml_model._backbone_features(model, torch.stack([t for _, t in loaded]))
+                cache.add([k for k, _ in loaded], feats.numpy())
+                done += len(loaded)
+                if (i // step) % 10 == 0:
+                    self.stdout.write(f"  extracted {done}/{len(todo)}")
+
+        self.stdout.write(f"Extracted features for {done} new images in {time.perf_counter() - started:.1f}s")
+
+    # ---------------------- training ----------------------
+
+    def _train(self, old_fc, vectors, rows, labels, old_classes, class_names, opts):
+        rng = np.random.default_rng(opts["seed"])
+        torch.manual_seed(opts["seed"])
+
+        order = rng.permutation(len(rows))
+        n_val = int(len(rows) * opts["val"]) if len(rows) >= 20 else 0
+        val_idx, train_idx = order[:n_val], order[n_val:]
+
+        # warm start: existing artists keep their weights, new rows start small
+        fc = nn.Linear(old_fc.in_features, len(class_names))
+        with torch.no_grad():
+            fc.weight.mul_(0.01)
+            fc.bias.zero_()
+            fc.weight[:len(old_classes)] = old_fc.weight
+            fc.bias[:len(old_classes)] = old_fc.bias
+
+        # old artists with no images this run are kept as they are
+        present = set(labels.tolist())
+        frozen = torch.tensor([i for i in range(len(old_classes)) if i not in present], dtype=torch.long)
+
+        def batch(idx):
+            # gather rows from the memmap in file order (sequential reads)
+            r = rows[idx]
+            sort = np.argsort(r)
+            x = torch.from_numpy(np.asarray(vectors[r[sort]]))
+            y = torch.from_numpy(labels[idx][sort])
+            return x, y
+
+        def accuracy(layer, idx):
+            if not len(idx):
+                return None
+            correct = 0
+            with torch.no_grad():
+                for i in range(0, len(idx), 4096):
+                    x, y = batch(idx[i:i + 4096])
+                    correct += int((layer(x).argmax(dim=1) == y).sum())
+            return round(correct / len(idx), 4)
+
+        added = len(class_names) > len(old_classes)
+        before = None if added else accuracy(old_fc, val_idx)
+
+        optimizer = torch.optim.AdamW(fc.parameters(), lr=opts["lr"], weight_decay=opts["weight_decay"])
+        loss_fn = nn.CrossEntropyLoss(label_smoothing=0.05)
+
+        best_state, best_acc = None, -1.0
+        started = time.perf_counter()
+        for epoch in range(opts["epochs"]):
+            perm = rng.permutation(train_idx)
+            for i in range(0, len(perm), opts["batch_size"]):
+                x, y = batch(perm[i:i + opts["batch_size"]])
+                optimizer.zero_grad()
+                loss = loss_fn(fc(x), y)
+                loss.backward()
+                if len(frozen):
+                    fc.weight.grad[frozen] = 0
+                    fc.bias.grad[frozen] = 0
+                optimizer.step()
+
+            acc = accuracy(fc, val_idx) if n_val else None
+            if acc is None or acc >= best_acc:  # no validation split: keep the last epoch
+                best_acc = acc if acc is not None else best_acc
+                best_state = {k: v.clone() for k, v in fc.state_dict().items()}
+            if epoch % 10 == 0 or epoch == opts["epochs"] - 1:
+                self.stdout.write(f"  epoch {epoch + 1}: loss {loss.item():.4f}, val top-1 {acc}")
+
+        fc.load_state_dict(best_state)
+        if len(frozen):
+            # AdamW's weight decay still shrank them; put the originals back
+            with torch.no_grad():
+                fc.weight[frozen] = old_fc.weight[frozen]
+                fc.bias[frozen] = old_fc.bias[frozen]
+
+        return fc, {
+            "train_seconds": round(time.perf_counter() - started, 2),
+            "val_images": int(n_val),
+            "val_top1": accuracy(fc, val_idx),
+            "val_top1_before": "n/a (new classes)" if added else before,
+        }
+
+    def _output_path(self, checkpoint, opts):
+        from main import model_registry
+
+        if opts["install"]:
+            if model_registry.is_managed(checkpoint):
+                return None  # published as a new version instead (the old one stays for rollback)
+            shutil.copy2(checkpoint, checkpoint + ".bak")
+            return checkpoint
+        if opts["output"]:
+            return opts["output"]
+        root, ext = os.path.splitext(checkpoint)
+        return f"{root}.finetuned{ext}"
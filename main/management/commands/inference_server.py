@@ -0,0 +1,54 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the local inference daemon: one copy of the artist model and the "
+        "price pipeline per node, served to all web workers over a Unix socket "
+        "(point them at it with INFERENCE_SOCKET)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=None,
+            help="Socket path (default: INFERENCE_SOCKET, else var/run/inference.sock)",
+        )
+        parser.add_argument(
+            "--max-concurrent",
+            type=int,
+            default=None,
+            help="Model executions at once (default: ML_GATE_MAX_CONCURRENT)",
+        )
+        parser.add_argument("--no-preload", action="store_true", help="Load the models on first request")
+
+    def handle(self, *args, **opts):
+        path = opts["socket"] or getattr(settings, "INFERENCE_SOCKET", None) or str(
+            settings.BASE_DIR / "var" / "run" / "inference.sock"
+        )
+
+        # this process is the only model host on the node: all cores are its budget
+        settings.ML_WEB_WORKERS = 1
+        if opts["max_concurrent"]:
+            settings.ML_GATE_MAX_CONCURRENT = opts["max_concurrent"]
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+        from main import inference_server, ml_gate
+
+        ml_gate.gate.max_concurrent = max(1, getattr(settings, "ML_GATE_MAX_CONCURRENT", 2))
+        threads = ml_gate.configure_torch_threads()
+        self.stdout.write(
+            f"Inference daemon: socket {path}, {ml_gate.gate.max_concurrent} concurrent "
+            f"execution(s) x {threads} torch thread(s)"
+        )
+
+        try:
+            inference_server.serve(path, preload=not opts["no_preload"])
+        except OSError as e:
+            raise CommandError(f"Can't listen on {path}: {e}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped")
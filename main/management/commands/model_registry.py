@@ -0,0 +1,92 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage versioned model artifacts (MODEL_REGISTRY_DIR): publish a new artist "
+        "checkpoint or price pipeline, switch the active version, list or verify them. "
+        "Running workers pick up a new active version without a restart."
+    )
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action", required=True)
+
+        sub.add_parser("list", help="Versions of each model; * marks the active one")
+
+        publish = sub.add_parser("publish", help="Copy a file in as a new version")
+        publish.add_argument("model", choices=["artist", "price"])
+        publish.add_argument("file", nargs="?", help="Default: the file at the model's old path next to manage.py")
+        # (--version is taken by Django itself)
+        publish.add_argument("--tag", help="Version name (default: a timestamp)")
+        publish.add_argument("--activate", action="store_true", help="Make it the active version")
+        publish.add_argument("--note", default="")
+
+        activate = sub.add_parser("activate", help="Make a published version the active one (rollback too)")
+        activate.add_argument("model", choices=["artist", "price"])
+        activate.add_argument("version")
+
+        verify = sub.add_parser("verify", help="Check every published file against its manifest checksum")
+        verify.add_argument("model", nargs="?", choices=["artist", "price"])
+
+    def handle(self, *args, **opts):
+        from main import model_registry
+
+        try:
+            getattr(self, "_" + opts["action"])(model_registry, opts)
+        except model_registry.RegistryError as e:
+            raise CommandError(str(e))
+
+    def _list(self, registry, opts):
+        manifest = registry.read_manifest()
+        self.stdout.write(f"Registry: {registry.root()}")
+        for name in registry.ARTIFACT_FILES:
+            entry = manifest["artifacts"].get(name)
+            if not entry or not entry["versions"]:
+                self.stdout.write(f"{name}: not managed (loads {registry.legacy_path(name)})")
+                continue
+            self.stdout.write(f"{name}:")
+            for version, info in sorted(entry["versions"].items()):
+                mark = "*" if version == entry["active"] else " "
+                self.stdout.write(
+                    f"  {mark} {version}  {info['size'] / 1e6:.1f} MB  sha256 {info['sha256'][:16]}  "
+                    f"{info['published_at']}  {info.get('note', '')}"
+                )
+
+    def _publish(self, registry, opts):
+        src = opts["file"] or registry.legacy_path(opts["model"])
+        if not os.path.exists(src):
+            raise CommandError(f"Not found: {src}")
+        artifact = registry.publish(
+            opts["model"], src, version=opts["tag"], activate=opts["activate"], note=opts["note"],
+        )
+        active = registry.resolve(opts["model"], registry.read_manifest())
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {artifact.name} {artifact.version} ({artifact.sha256[:16]}) -> {artifact.path}"
+            + (" [active]" if active and active.version == artifact.version else "")
+        ))
+
+    def _activate(self, registry, opts):
+        artifact = registry.activate(opts["model"], opts["version"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{artifact.name} now serves {artifact.version}; workers switch within "
+            f"MODEL_REGISTRY_POLL_INTERVAL seconds of their next prediction"
+        ))
+
+    def _verify(self, registry, opts):
+        manifest = registry.read_manifest()
+        bad = 0
+        for name, entry in manifest["artifacts"].items():
+            if opts["model"] and name != opts["model"]:
+                continue
+            for version, info in sorted(entry["versions"].items()):
+                artifact = registry.Artifact(name, version, os.path.join(registry.root(), info["file"]), info["sha256"])
+                try:
+                    registry.verify(artifact)
+                    self.stdout.write(f"ok    {name} {version}")
+                except registry.RegistryError as e:
+                    bad += 1
+                    self.stdout.write(self.style.ERROR(f"FAIL  {e}"))
+        if bad:
+            raise CommandError(f"{bad} artifact(s) failed verification")
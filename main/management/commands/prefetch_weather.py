@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch the current weather of every upcoming event / workshop place into "
+        "the weather cache, several locations per Open-Meteo request. Run it from "
+        "cron more often than WEATHER_CACHE_TTL so the weather endpoints only read "
+        "the cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Refetch locations that are still fresh")
+        parser.add_argument("--batch-size", type=int, help="Locations per request (default WEATHER_PREFETCH_BATCH_SIZE)")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be fetched")
+
+    def handle(self, *args, **opts):
+        from main import weather_cache, weather_prefetch
+
+        if not weather_cache.is_shared() and not opts["dry_run"]:
+            raise CommandError(
+                'CACHES["shared"] is a per-process backend, so web workers would never see the '
+                "prefetched weather. Configure a file or redis backend for it (see core/settings.py)."
+            )
+
+        summary = weather_prefetch.prefetch(
+            force=opts["force"],
+            size=opts["batch_size"],
+            dry_run=opts["dry_run"],
+            progress=lambda done, total: self.stdout.write(f"  {done}/{total} locations"),
+        )
+        if summary["locked"]:
+            self.stdout.write(self.style.WARNING("Another prefetch_weather run is in progress; skipped"))
+            return
+
+        line = (
+            f"{summary['places']} places, {summary['locations']} locations "
+            f"({summary['fresh']} still fresh), {summary['requests']} requests"
+        )
+        if opts["dry_run"]:
+            self.stdout.write(f"Dry run: {line}")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{line}: fetched {summary['fetched']}, failed {summary['failed']}, "
+            f"geocoded {summary['geocoded']} places in {summary['seconds']}s"
+        ))
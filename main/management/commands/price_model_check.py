@@ -0,0 +1,73 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the compiled single-row price predictor against the sklearn pipeline on "
+        "random rows and report single-row latency of both (p50/p99, speedup)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="Random rows for the equivalence check")
+        parser.add_argument("--timed", type=int, default=300, help="Rows timed one by one on each path")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report as JSON")
+
+    def handle(self, *args, **opts):
+        import pandas as pd
+
+        from main import price_compiled, price_ml
+        from main.benchmarking import percentiles
+
+        try:
+            pipe = price_ml.load()
+        except Exception as e:
+            raise CommandError(f"Can't load the price pipeline: {e}")
+
+        try:
+            compiled = price_compiled.compile_pipeline(pipe)
+        except price_compiled.Unsupported as e:
+            raise CommandError(f"This pipeline can't be compiled: {e}")
+
+        max_diff = price_compiled.self_check(pipe, compiled, n=opts["rows"], seed=opts["seed"])
+
+        columns = list(getattr(pipe.steps[0][1], "feature_names_in_", []))
+        rows = price_compiled.random_rows(compiled, opts["timed"], seed=opts["seed"] + 1)
+        pipeline_ms, compiled_ms, fallbacks = [], [], 0
+        for row in rows:
+            t0 = time.perf_counter()
+            pipe.predict(pd.DataFrame([row], columns=columns or None))
+            pipeline_ms.append((time.perf_counter() - t0) * 1000.0)
+            t0 = time.perf_counter()
+            try:
+                compiled.predict_one(row)
+            except price_compiled.Fallback:
+                fallbacks += 1
+                continue
+            compiled_ms.append((time.perf_counter() - t0) * 1000.0)
+
+        report = {
+            "rows_checked": opts["rows"],
+            "max_rel_diff": max_diff,
+            "equivalent": max_diff <= 1e-9,
+            "pipeline": percentiles(pipeline_ms),
+            "compiled": percentiles(compiled_ms) if compiled_ms else None,
+            "fallback_rows": fallbacks,
+            "in_use": price_ml.status()["compiled"],
+        }
+        if compiled_ms:
+            report["speedup_p50"] = round(report["pipeline"]["p50_ms"] / report["compiled"]["p50_ms"], 1)
+
+        self.stdout.write(json.dumps(report, indent=2))
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                json.dump(report, f, indent=2)
+        if not report["equivalent"]:
+            raise CommandError(f"Compiled predictor differs from the pipeline (max rel diff {max_diff})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Equivalent on {opts['rows']} rows; single-row p50 "
+            f"{report['pipeline']['p50_ms']} ms -> {report['compiled']['p50_ms']} ms"
+        ))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.25 on 2026-10-18 12:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('model_version', models.CharField(max_length=64)),
+                ('result', models.JSONField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='main_artist_last_us_b7ac8d_idx'), models.Index(fields=['model_version'], name='main_artist_model_v_49aeb1_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='artistprediction',
+            constraint=models.UniqueConstraint(fields=('content_hash', 'model_version'), name='uniq_artist_prediction'),
+        ),
+    ]
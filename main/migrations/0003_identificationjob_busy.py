@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_identificationjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='identificationjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('error', 'Error'), ('busy', 'Busy (retry later)'), ('expired', 'Expired')], default='queued', max_length=10),
+        ),
+    ]
@@ -0,0 +1,162 @@
+"""
+CPU inference backends for the artist classifier.
+
+Every backend is exported from the same artist_model.pth and ends up as a
+"runner": a callable taking a (N, 3, 224, 224) float tensor and returning
+(N, num_classes) logits as a torch tensor.
+
+- eager:       the nn.Module built from the checkpoint (default)
+- torchscript: traced + frozen TorchScript module
+- quantized:   dynamic int8 quantization of the Linear layers, then traced.
+               For ResNet50 that is only the fc head; the convolutions stay
+               fp32, so expect a smaller gain than on transformer models.
+- onnx:        ONNX Runtime session (needs the optional `onnxruntime` package)
+
+Exports write a sidecar `<artifact>.json` with the class names and the sha256
+of the checkpoint they came from, so non-eager backends never have to unpickle
+the checkpoint itself. An export whose sha256 doesn't match the current
+checkpoint (retrained head, registry publish) is stale: loading it raises
+BackendUnavailable and the eager backend is used until it is re-exported.
+"""
+import json
+import logging
+import os
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "quantized", "onnx")
+
+_SUFFIXES = {
+    "torchscript": ".ts.pt",
+    "quantized": ".int8.pt",
+    "onnx": ".onnx",
+}
+
+INPUT_SHAPE = (1, 3, 224, 224)
+
+
+class BackendUnavailable(Exception):
+    """The backend's artifact or runtime is missing."""
+
+
+def artifact_path(backend, checkpoint_path):
+    if backend == "eager":
+        return checkpoint_path
+    root, _ = os.path.splitext(checkpoint_path)
+    return root + _SUFFIXES[backend]
+
+
+def sidecar_path(path):
+    return path + ".json"
+
+
+def read_sidecar(path):
+    try:
+        with open(sidecar_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise BackendUnavailable(f"Missing or unreadable {sidecar_path(path)}")
+
+
+# ---------------------- export ----------------------
+
+def export(backend, model, class_names, checkpoint_path, source_version=None):
+    """
+    Export an eval-mode CPU model to `backend`; returns the artifact path.
+    """
+    if backend == "eager":
+        return checkpoint_path
+
+    path = artifact_path(backend, checkpoint_path)
+    model = model.to("cpu").eval()
+    example = torch.randn(*INPUT_SHAPE)
+
+    with torch.no_grad():
+        if backend == "torchscript":
+            traced = torch.jit.trace(model, example)
+            torch.jit.save(torch.jit.freeze(traced), path)
+
+        elif backend == "quantized":
+            qmodel = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+            traced = torch.jit.trace(qmodel, example)
+            torch.jit.save(traced, path)
+
+        elif backend == "onnx":
+            torch.onnx.export(
+                model,
+                example,
+                path,
+                input_names=["input"],
+                output_names=["logits"],
+                dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+                opset_version=17,
+            )
+        else:
+            raise ValueError(f"Unknown backend {backend!r}")
+
+    with open(sidecar_path(path), "w") as f:
+        json.dump({
+            "backend": backend,
+            "class_names": list(class_names),
+            "source_version": source_version,
+        }, f, indent=2)
+
+    logger.info("Exported %s artist model to %s", backend, path)
+    return path
+
+
+# ---------------------- load ----------------------
+
+def load_runner(backend, checkpoint_path, threads=None):
+    """
+    Load an exported artifact; returns (runner, class_names).
+    Raises BackendUnavailable if it hasn't been exported (or onnxruntime is missing).
+    """
+    path = artifact_path(backend, checkpoint_path)
+    if not os.path.exists(path):
+        raise BackendUnavailable(f"{backend} artifact not found: {path}")
+    meta = read_sidecar(path)
+    _check_source(path, meta, checkpoint_path)
+
+    if backend in ("torchscript", "quantized"):
+        module = torch.jit.load(path, map_location="cpu")
+        module.eval()
+        return module, meta["class_names"]
+
+    if backend == "onnx":
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise BackendUnavailable("onnxruntime is not installed")
+
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+
+        def run_onnx(batch):
+            logits = session.run(None, {input_name: batch.cpu().numpy()})[0]
+            return torch.from_numpy(logits)
+
+        return run_onnx, meta["class_names"]
+
+    raise ValueError(f"Unknown backend {backend!r}")
+
+
+def _check_source(path, meta, checkpoint_path):
+    """Refuse an export made from another checkpoint: it would serve old weights and class names."""
+    from .prediction_cache import model_version
+
+    current = model_version(checkpoint_path)
+    if current is None:
+        return  # no checkpoint to compare with; the export is all there is
+    exported = meta.get("source_version")
+    if exported != current:
+        raise BackendUnavailable(
+            f"{path} was exported from checkpoint {(exported or 'unknown')[:12]}, "
+            f"current is {current[:12]}; re-export with `manage.py export_artist_model`"
+        )
@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of a model.
+
+    Callers submit one item and block on its result. A single worker thread
+    takes the first waiting item, keeps collecting for up to `max_wait_ms`
+    (or until `max_batch_size` items are queued), runs `run_batch(items)`
+    once and hands each caller its own entry of the returned list. A batch
+    whose result count doesn't match its items fails every caller in it, and
+    a caller waits at most `timeout` seconds (TimeoutError), so nobody hangs
+    on a future the worker never resolves.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=5.0, name="micro-batcher", timeout=60.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # counters (read by stats())
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+
+    def submit(self, item, timeout=None):
+        """Queue one item and wait for its result (re-raises batch errors, TimeoutError after `timeout`)."""
+        fut = self.submit_async(item)
+        try:
+            return fut.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            fut.cancel()  # still queued: the worker skips it
+            raise
+
+    def submit_async(self, item):
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else None,
+            "largest_batch": self._largest,
+            "queued": self._queue.qsize(),
+        }
+
+    # --- worker ---
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        # block for the first item, then fill the batch until the window closes
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._run(batch)
+            except Exception as e:  # never let the worker die with callers waiting
+                logger.exception("%s: batch of %d crashed", self.name, len(batch))
+                for _, fut in batch:
+                    _resolve(fut, exception=e)
+
+    def _run(self, batch):
+        batch = [(item, fut) for item, fut in batch if not fut.cancelled()]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        futures = [fut for _, fut in batch]
+
+        try:
+            results = list(self.run_batch(items))
+            if len(results) != len(futures):
+                raise RuntimeError(f"run_batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            logger.exception("%s: batch of %d failed", self.name, len(items))
+            for fut in futures:
+                _resolve(fut, exception=e)
+            return
+
+        self._batches += 1
+        self._items += len(items)
+        self._largest = max(self._largest, len(items))
+
+        for fut, result in zip(futures, results):
+            _resolve(fut, result=result)
+
+
+def _resolve(fut, result=None, exception=None):
+    # a caller that timed out may have cancelled its future meanwhile
+    try:
+        if exception is not None:
+            fut.set_exception(exception)
+        else:
+            fut.set_result(result)
+    except InvalidStateError:
+        pass
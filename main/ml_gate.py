@@ -0,0 +1,196 @@
+"""
+Per-process admission control for CPU-heavy model calls.
+
+At most ML_GATE_MAX_CONCURRENT model executions run at once in a worker
+process. Up to ML_GATE_MAX_QUEUE further callers wait for a slot, each for
+at most ML_GATE_QUEUE_TIMEOUT seconds. Anyone beyond that, or anyone whose
+wait times out, gets `Saturated` straight away, and the view answers
+503 + Retry-After instead of piling another forward pass onto busy cores.
+
+    with ml_gate.gate.slot():
+        result = predict_image(upload)
+
+configure_torch_threads() splits ML_CPU_BUDGET cores between the web workers
+(ML_WEB_WORKERS) and their concurrent executions, so that
+workers x slots x intra-op threads never exceeds the core count.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+class Saturated(Exception):
+    """No execution slot is available (queue full, or the wait timed out)."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Model is busy ({reason}); retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class InferenceGate:
+    """
+    Counting semaphore with a bounded, deadline-limited wait queue.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=8, queue_timeout=10.0, min_retry_after=1, name="ml"):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = max(0.0, float(queue_timeout))
+        self.min_retry_after = max(1, int(min_retry_after))
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+
+        # counters (read by stats())
+        self._admitted = 0
+        self._queued = 0
+        self._rejected_full = 0
+        self._rejected_timeout = 0
+        self._peak_waiting = 0
+        self._service_ewma = None  # seconds per execution
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def acquire(self):
+        with self._cond:
+            if self._in_flight < self.max_concurrent and not self._waiting:
+                self._in_flight += 1
+                self._admitted += 1
+                return
+
+            if self._waiting >= self.max_queue:
+                self._rejected_full += 1
+                raise Saturated("queue full", self._retry_after())
+
+            self._waiting += 1
+            self._queued += 1
+            self._peak_waiting = max(self._peak_waiting, self._waiting)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected_timeout += 1
+                        raise Saturated("queue timeout", self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            self._in_flight += 1
+            self._admitted += 1
+
+    def release(self, elapsed=None):
+        with self._cond:
+            self._in_flight -= 1
+            if elapsed is not None:
+                prev = self._service_ewma
+                self._service_ewma = elapsed if prev is None else 0.8 * prev + 0.2 * elapsed
+            self._cond.notify()
+
+    def _retry_after(self):
+        # rough time for the current backlog to drain
+        if not self._service_ewma:
+            return self.min_retry_after
+        backlog = self._in_flight + self._waiting + 1
+        estimate = math.ceil(self._service_ewma * backlog / self.max_concurrent)
+        return max(self.min_retry_after, estimate)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout_s": self.queue_timeout,
+                "in_flight": self._in_flight,
+                "queue_depth": self._waiting,
+                "peak_queue_depth": self._peak_waiting,
+                "admitted": self._admitted,
+                "queued": self._queued,
+                "rejected_queue_full": self._rejected_full,
+                "rejected_timeout": self._rejected_timeout,
+                "avg_service_ms": round(self._service_ewma * 1000.0, 1) if self._service_ewma else None,
+            }
+
+
+def is_enabled():
+    return getattr(settings, "ML_GATE_ENABLED", True)
+
+
+gate = InferenceGate(
+    max_concurrent=getattr(settings, "ML_GATE_MAX_CONCURRENT", 2),
+    max_queue=getattr(settings, "ML_GATE_MAX_QUEUE", 8),
+    queue_timeout=getattr(settings, "ML_GATE_QUEUE_TIMEOUT", 10.0),
+    min_retry_after=getattr(settings, "ML_GATE_RETRY_AFTER", 1),
+)
+
+
+@contextmanager
+def slot():
+    """gate.slot(), or a no-op when ML_GATE_ENABLED is off."""
+    if not is_enabled():
+        yield
+        return
+    with gate.slot():
+        yield
+
+
+def busy_response(exc, json=False):
+    """Fast 503 for a request that didn't get a slot."""
+    message = "The model is busy right now, please try again in a few seconds."
+    if json:
+        response = JsonResponse({"error": message, "retry_after": exc.retry_after}, status=503)
+    else:
+        response = HttpResponse(message, status=503, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+# ---------- torch thread budget ----------
+
+def thread_budget():
+    """Intra-op threads per model execution (>= 1)."""
+    cores = getattr(settings, "ML_CPU_BUDGET", None) or os.cpu_count() or 1
+    workers = max(1, getattr(settings, "ML_WEB_WORKERS", 1))
+    slots = gate.max_concurrent if is_enabled() else 1
+    return max(1, cores // (workers * slots))
+
+
+_threads_configured = False
+
+
+def configure_torch_threads():
+    """Apply thread_budget() to torch once per process; returns the thread count."""
+    global _threads_configured
+    import torch
+
+    threads = thread_budget()
+    if _threads_configured:
+        return threads
+    _threads_configured = True
+
+    torch.set_num_threads(threads)
+    try:
+        # requests already run concurrently; one inter-op thread avoids a second pool
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # can only be set before the first parallel op
+    logger.info("torch: %d intra-op thread(s) per execution", threads)
+    return threads
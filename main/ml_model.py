@@ -1,72 +1,512 @@
-import torch
-import torch.nn as nn
-from torchvision import models, transforms
-from PIL import Image
+"""
+Artist classifier: ResNet50 checkpoint behind a lazily loading manager.
+
+torch and torchvision are imported on first use, not at module import, so
+loading the URLconf (main.views imports this module) doesn't pay their
+multi-second import. DEVICE, TORCH_THREADS and PREPROCESS are still
+module attributes, resolved when first asked for.
+"""
+import gc
+import logging
 import os
+import threading
+import time
+
+from django.conf import settings
+
+from . import image_preprocess, inference_client, ml_gate, model_registry
+from .image_preprocess import ImageTooLarge  # noqa: F401  (re-exported for callers)
+
+logger = logging.getLogger(__name__)
 
-# Path to model checkpoint (adjust if needed)
+# Path to model checkpoint (adjust if needed); a version published to the
+# model registry takes precedence (see manager.path)
 MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artist_model.pth")
 
-# Pick device (MPS for Apple Silicon, CUDA if GPU, else CPU)
-if torch.backends.mps.is_available():
-    DEVICE = torch.device("mps")
-elif torch.cuda.is_available():
-    DEVICE = torch.device("cuda")
-else:
-    DEVICE = torch.device("cpu")
-
-# Preprocessing (must match your validation transforms!)
-PREPROCESS = transforms.Compose([
-    transforms.Resize((256, 256)),
-    transforms.CenterCrop(224),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406],
-                         [0.229, 0.224, 0.225])
-])
-
-# Load model once (at import time)
-print("Loading artist model...")
-
-_checkpoint = torch.load(MODEL_PATH, map_location=DEVICE)
-CLASS_NAMES = _checkpoint["class_names"]
-NUM_CLASSES = len(CLASS_NAMES)
-
-_model = models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V2)
-in_features = _model.fc.in_features
-_model.fc = nn.Linear(in_features, NUM_CLASSES)
-_model.load_state_dict(_checkpoint["model_state_dict"])
-_model.to(DEVICE)
-_model.eval()
-
-print("Model ready. Classes:", CLASS_NAMES)
+_device = None
+_preprocess = None
 
-def predict_image(img_path):
+
+def default_device():
+    """MPS for Apple Silicon, CUDA if there is a GPU, else CPU (picked on first use)."""
+    global _device
+    if _device is None:
+        import torch
+
+        if torch.backends.mps.is_available():
+            _device = torch.device("mps")
+        elif torch.cuda.is_available():
+            _device = torch.device("cuda")
+        else:
+            _device = torch.device("cpu")
+    return _device
+
+
+def legacy_preprocess():
+    """torchvision PREPROCESS (must match your validation transforms!); the fast path is image_preprocess."""
+    global _preprocess
+    if _preprocess is None:
+        from torchvision import transforms
+
+        _preprocess = transforms.Compose([
+            transforms.Resize((256, 256)),
+            transforms.CenterCrop(224),
+            transforms.ToTensor(),
+            transforms.Normalize([0.485, 0.456, 0.406],
+                                 [0.229, 0.224, 0.225])
+        ])
+    return _preprocess
+
+
+def build_model(num_classes):
     """
-    img_path: absolute path to an image file on disk
-    returns: dict with top guess and top3 guesses
+    ResNet50 skeleton with our classifier head.
+    No pretrained weights: the checkpoint overwrites every parameter anyway,
+    so there is nothing to download (works offline).
     """
-    img = Image.open(img_path).convert("RGB")
-    tensor = PREPROCESS(img).unsqueeze(0).to(DEVICE)
+    import torch.nn as nn
+    from torchvision import models
+
+    model = models.resnet50(weights=None)
+    model.fc = nn.Linear(model.fc.in_features, num_classes)
+    return model
+
+
+def load_checkpoint(path, device, mmap=False):
+    """
+    returns: (eval-mode eager model on `device`, class_names)
+
+    mmap=True (CPU only) maps the checkpoint and uses its tensors as the
+    parameters, so processes loading the same file share its pages. Only
+    for files that are never rewritten in place (model registry versions).
+    """
+    import torch
+
+    mmap = mmap and device.type == "cpu"
+    try:
+        checkpoint = torch.load(path, map_location=device, mmap=mmap)
+    except RuntimeError:
+        if not mmap:
+            raise
+        mmap = False  # legacy (non-zip) checkpoint format can't be mapped
+        checkpoint = torch.load(path, map_location=device)
+    class_names = list(checkpoint["class_names"])
+
+    model = build_model(len(class_names))
+    model.load_state_dict(checkpoint["model_state_dict"], assign=mmap)
+    model.to(device)
+    model.eval()
+    return model, class_names
+
+
+class ArtistModelManager:
+    """
+    Owns the artist classifier for this process.
+
+    - nothing is loaded at import time
+    - the checkpoint is loaded on first use (get) or explicitly (warm_up)
+    - after `idle_timeout` seconds without a prediction, a watchdog thread
+      drops the model again so the worker gets its memory back (0 = never)
+    - reload() swaps in another checkpoint without blocking predictions
+      (model registry hot reload)
+    """
+
+    def __init__(self, path, device=None, idle_timeout=0, backend="eager", version=None):
+        self.path = path
+        self.device = device  # None: default_device() at load time
+        self.idle_timeout = idle_timeout
+        self.backend = backend
+
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._model = None
+        self._class_names = None
+        self._current = None  # (model, class_names), replaced in one assignment
+        self._version = version
+        self._reload_count = 0
+        self._active_backend = None
+        self._input_device = device
+        self._last_used = 0.0
+        self._loaded_at = None
+        self._load_seconds = None
+        self._load_count = 0
+        self._unload_count = 0
+        self._error = None
+        self._watchdog = None
+
+    @property
+    def is_ready(self):
+        return self._model is not None
+
+    @property
+    def input_device(self):
+        """Where input batches must live for the loaded backend."""
+        return self._input_device
+
+    def get(self):
+        """
+        returns: (model, class_names), loading the checkpoint if needed
+        """
+        model_registry.poll()
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._load()
+                current = self._current
+        self._last_used = time.monotonic()
+        return current
+
+    def warm_up(self):
+        """Load now instead of on the first request. Returns status()."""
+        self.get()
+        return self.status()
+
+    def unload(self):
+        with self._lock:
+            self._unload()
+
+    def reload(self, path, version=None):
+        """
+        Switch to another checkpoint. The new model is loaded while the old one
+        keeps serving, then swapped in; calls already running finish on the old one.
+        """
+        with self._reload_lock:
+            if self._current is None:
+                self.path, self._version = path, version  # not loaded: next get() loads it
+                return self.status()
+
+            started = time.perf_counter()
+            model, class_names, backend, input_device = self._load_backend(path)
+            with self._lock:
+                self.path, self._version = path, version
+                self._model, self._class_names = model, class_names
+                self._active_backend = backend
+                self._input_device = input_device
+                self._current = (model, class_names)
+                self._error = None
+                self._load_seconds = round(time.perf_counter() - started, 3)
+                self._loaded_at = time.time()
+                self._reload_count += 1
+            logger.info("Artist model switched to %s (%s) in %.2fs", path, backend, self._load_seconds)
+            return self.status()
+
+    def status(self):
+        idle_for = None
+        if self._model is not None:
+            idle_for = round(time.monotonic() - self._last_used, 1)
+        return {
+            "ready": self.is_ready,
+            "path": self.path,
+            "version": self._version,
+            "backend": self.backend,
+            "active_backend": self._active_backend,
+            "device": str(self._input_device) if self._input_device is not None else None,
+            "classes": len(self._class_names) if self._class_names else None,
+            "loaded_at": self._loaded_at,
+            "load_seconds": self._load_seconds,
+            "load_count": self._load_count,
+            "unload_count": self._unload_count,
+            "reload_count": self._reload_count,
+            "idle_timeout": self.idle_timeout,
+            "idle_for": idle_for,
+            "error": self._error,
+        }
+
+    # --- internals (call with self._lock held) ---
+
+    def _load(self):
+        logger.info("Loading artist model from %s", self.path)
+        started = time.perf_counter()
+        try:
+            model, class_names, backend, input_device = self._load_backend(self.path)
+        except Exception as e:
+            self._error = str(e)
+            logger.exception("Could not load artist model: %s", e)
+            raise
+
+        self._model = model
+        self._class_names = class_names
+        self._current = (model, class_names)
+        self._active_backend = backend
+        self._input_device = input_device
+        self._error = None
+        self._load_seconds = round(time.perf_counter() - started, 3)
+        self._loaded_at = time.time()
+        self._load_count += 1
+        self._last_used = time.monotonic()
+        logger.info("Artist model (%s) ready in %.2fs. Classes: %s", backend, self._load_seconds, class_names)
+
+        self._start_watchdog()
+
+    def _load_backend(self, path):
+        import torch
+
+        # intra-op threads from the per-worker core budget (see ml_gate), before any torch work
+        threads = ml_gate.configure_torch_threads()
+        device = self.device or default_device()
+
+        # exported backends are CPU-only; fall back to eager if not exported yet
+        if self.backend != "eager":
+            from .ml_backends import BackendUnavailable, load_runner
+            try:
+                runner, class_names = load_runner(self.backend, path, threads=threads)
+                return runner, list(class_names), self.backend, torch.device("cpu")
+            except BackendUnavailable as e:
+                logger.warning("Artist model backend %r unavailable (%s), using eager", self.backend, e)
+
+        managed = model_registry.is_managed(path)
+        if managed:
+            model_registry.verify_path(path)
+        mmap = managed and getattr(settings, "MODEL_MMAP", True)
+        model, class_names = load_checkpoint(path, device, mmap=mmap)
+        return model, class_names, "eager", device
+
+    def _unload(self):
+        if self._model is None:
+            return
+        self._model = None
+        self._class_names = None
+        self._current = None
+        self._active_backend = None
+        self._input_device = self.device
+        self._loaded_at = None
+        self._unload_count += 1
+        gc.collect()
+        logger.info("Artist model unloaded")
+
+    def _start_watchdog(self):
+        if self.idle_timeout <= 0:
+            return
+        if self._watchdog is not None and self._watchdog.is_alive():
+            return
+        self._watchdog = threading.Thread(
+            target=self._watch_idle, name="artist-model-idle", daemon=True
+        )
+        self._watchdog.start()
+
+    def _watch_idle(self):
+        # check a few times per timeout window, stop once the model is gone
+        interval = max(1.0, min(self.idle_timeout / 4.0, 60.0))
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if self._model is None:
+                    return
+                if time.monotonic() - self._last_used >= self.idle_timeout:
+                    self._unload()
+                    return
+
+
+def _active_checkpoint():
+    try:
+        artifact = model_registry.resolve("artist")
+    except model_registry.RegistryError as e:
+        logger.error("Model registry: %s; using %s", e, MODEL_PATH)
+        artifact = None
+    return (artifact.path, artifact.version) if artifact else (MODEL_PATH, None)
+
+
+_path, _version = _active_checkpoint()
+manager = ArtistModelManager(
+    _path,
+    idle_timeout=getattr(settings, "ARTIST_MODEL_IDLE_TIMEOUT", 0),
+    backend=getattr(settings, "ARTIST_MODEL_BACKEND", "eager"),
+    version=_version,
+)
+
+
+def _on_registry_change(artifact):
+    path, version = (artifact.path, artifact.version) if artifact else (MODEL_PATH, None)
+    manager.reload(path, version)
+    if _embedding_manager is not None:
+        _embedding_manager.reload(path, version)
+
+
+model_registry.watch("artist", _on_registry_change)
+
+
+def warm_up():
+    """Explicit warm-up hook (AppConfig.ready / gunicorn post_fork)."""
+    return manager.warm_up()
+
+
+def __getattr__(name):
+    # CLASS_NAMES / NUM_CLASSES (and DEVICE, TORCH_THREADS, PREPROCESS) used to
+    # be module globals filled at import; keep them importable, but only load
+    # the checkpoint (or torch) when asked for.
+    if name == "CLASS_NAMES":
+        return manager.get()[1]
+    if name == "NUM_CLASSES":
+        return len(manager.get()[1])
+    if name == "DEVICE":
+        return default_device()
+    if name == "TORCH_THREADS":
+        return ml_gate.configure_torch_threads()
+    if name == "PREPROCESS":
+        return legacy_preprocess()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def predict_batch(tensors):
+    """
+    tensors: list of preprocessed (3, 224, 224) tensors
+    returns: one result dict per tensor (same shape as predict_image)
+    """
+    import torch
+
+    model, class_names = manager.get()
+    batch = torch.stack(tensors).to(manager.input_device)
 
     with torch.no_grad():
-        outputs = _model(tensor)
-        probs = torch.softmax(outputs, dim=1)[0]
-        top_prob, top_idx = torch.max(probs, dim=0)
-
-    top_artist = CLASS_NAMES[top_idx.item()]
-    confidence = float(top_prob.item())
-
-    # also make top3 list
-    top3_prob, top3_idx = torch.topk(probs, k=3)
-    top3 = []
-    for p, idx in zip(top3_prob, top3_idx):
-        top3.append({
-            "artist": CLASS_NAMES[idx.item()],
-            "confidence": float(p.item())
+        outputs = model(batch)
+        probs = torch.softmax(outputs, dim=1)
+        top3_prob, top3_idx = torch.topk(probs, k=3, dim=1)
+
+    top3_prob = top3_prob.cpu().tolist()
+    top3_idx = top3_idx.cpu().tolist()
+
+    results = []
+    for row_probs, row_idx in zip(top3_prob, top3_idx):
+        top3 = [
+            {"artist": class_names[idx], "confidence": float(p)}
+            for p, idx in zip(row_probs, row_idx)
+        ]
+        results.append({
+            "artist": top3[0]["artist"],
+            "confidence": top3[0]["confidence"],
+            "top3": top3,
         })
+    return results
+
+
+# ---------------------- embeddings ----------------------
+
+EMBEDDING_DIM = 2048  # ResNet50 penultimate layer
+
+_embedding_manager = None
+_embedding_lock = threading.Lock()
+
+
+def _backbone_features(model, batch):
+    # torchvision ResNet.forward up to (and including) the pooled features, without fc
+    import torch
+
+    x = model.conv1(batch)
+    x = model.bn1(x)
+    x = model.relu(x)
+    x = model.maxpool(x)
+    x = model.layer1(x)
+    x = model.layer2(x)
+    x = model.layer3(x)
+    x = model.layer4(x)
+    x = model.avgpool(x)
+    return torch.flatten(x, 1)
+
+
+def _eager_model():
+    """
+    The eager nn.Module. Exported backends only expose logits, so when one of
+    them is active a second (eager) manager is kept just for embeddings.
+    """
+    global _embedding_manager
+    from torchvision import models
+
+    model, _ = manager.get()
+    if isinstance(model, models.ResNet):
+        return model
+
+    if _embedding_manager is None:
+        with _embedding_lock:
+            if _embedding_manager is None:
+                _embedding_manager = ArtistModelManager(
+                    manager.path, manager.device, idle_timeout=manager.idle_timeout, backend="eager",
+                    version=manager.status()["version"],
+                )
+    return _embedding_manager.get()[0]
+
+
+def embed_batch(tensors):
+    """
+    tensors: list of preprocessed (3, 224, 224) tensors
+    returns: (N, 2048) float32 numpy array of penultimate ResNet50 features
+    """
+    import torch
+
+    model = _eager_model()
+    batch = torch.stack(tensors).to(next(model.parameters()).device)
+
+    with torch.no_grad():
+        feats = _backbone_features(model, batch)
+    return feats.cpu().numpy().astype("float32", copy=False)
+
+
+# Micro-batching: concurrent callers share one forward pass
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Process-wide MicroBatcher, or None when ARTIST_BATCHING_ENABLED is off."""
+    global _batcher
+    if not getattr(settings, "ARTIST_BATCHING_ENABLED", False):
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from .ml_batching import MicroBatcher
+                _batcher = MicroBatcher(
+                    predict_batch,
+                    max_batch_size=getattr(settings, "ARTIST_BATCH_MAX_SIZE", 8),
+                    max_wait_ms=getattr(settings, "ARTIST_BATCH_MAX_WAIT_MS", 5),
+                    name="artist-batcher",
+                    timeout=getattr(settings, "ARTIST_BATCH_TIMEOUT", 60),
+                )
+    return _batcher
+
+
+def load_image_tensor(src, out=None):
+    """
+    Decode + preprocess one image -> (3, 224, 224) tensor (not yet on the device).
+    src: path, raw bytes, or a file-like object (e.g. a Django UploadedFile)
+    out: optional preallocated tensor to write into (fast path only)
+    Raises ImageTooLarge above ARTIST_MAX_IMAGE_PIXELS, before decoding.
+    """
+    max_pixels = getattr(settings, "ARTIST_MAX_IMAGE_PIXELS", None)
+
+    if getattr(settings, "ARTIST_FAST_PREPROCESS", True):
+        return image_preprocess.preprocess(src, max_pixels=max_pixels, out=out)
+
+    with image_preprocess.open_bounded(src, max_pixels=max_pixels, reduce=False) as img:
+        return legacy_preprocess()(img.convert("RGB"))
+
+
+def embed_image(src):
+    """Embedding of one image (path, bytes or file-like); via the inference daemon when configured."""
+    if inference_client.is_enabled():
+        try:
+            return inference_client.embed_image(src)
+        except inference_client.InferenceUnavailable:
+            pass  # daemon down: run it here
+    return embed_batch([load_image_tensor(src)])[0]
+
+
+def predict_image(img_path):
+    """
+    img_path: absolute path to an image file on disk, raw bytes, or a
+              file-like object (uploads are decoded straight from memory)
+    returns: dict with top guess and top3 guesses
+    Goes through the inference daemon when INFERENCE_SOCKET is set and it's up.
+    """
+    if inference_client.is_enabled():
+        try:
+            return inference_client.predict_image(img_path)
+        except inference_client.InferenceUnavailable:
+            pass  # daemon down: run it here
+
+    tensor = load_image_tensor(img_path)
 
-    return {
-        "artist": top_artist,
-        "confidence": confidence,
-        "top3": top3
-    }
+    batcher = get_batcher()
+    if batcher is not None:
+        return batcher.submit(tensor)
+    return predict_batch([tensor])[0]
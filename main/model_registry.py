@@ -0,0 +1,349 @@
+"""
+Versioned model artifacts with an "active" pointer per model.
+
+    <MODEL_REGISTRY_DIR>/
+        manifest.json
+        artist/<version>/artist_model.pth
+        price/<version>/art_price_ecom_pipeline.joblib
+
+    manifest.json:
+        {"artifacts": {"price": {
+            "active": "20261018T120000",
+            "versions": {"20261018T120000": {"file": "price/20261018T120000/...joblib",
+                                             "sha256": "...", "size": 123,
+                                             "published_at": "...", "note": ""}}}}}
+
+`manage.py model_registry publish|activate|list|verify` maintains it. A
+model without a manifest entry keeps loading from its old path next to
+manage.py, so nothing changes until a version is published.
+
+Published files are never written again (a new version is a new file), so
+workers can memory-map them: joblib's mmap_mode="r" and torch's mmap=True
+leave the weights in the page cache, shared by every process on the node.
+The old paths are not mapped, since copying a new file over one would pull
+the pages out from under running workers.
+
+Hot reload: poll() is called on the prediction path and re-reads the
+manifest at most every MODEL_REGISTRY_POLL_INTERVAL seconds (or right away
+after MODEL_RELOAD_SIGNAL). When a watched model's active version changes,
+its callback runs in a background thread: the new version is loaded next
+to the old one and swapped in with a single assignment, so requests
+already running finish on the model they started with. A version counts as
+loaded only once every callback succeeded; a failed reload (bad checksum,
+file still being copied, out of memory) is retried with backoff, up to
+MODEL_REGISTRY_RETRY_MAX seconds apart.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import signal
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import locks
+
+logger = logging.getLogger(__name__)
+
+# model name -> file name inside a version directory (and the old path's name)
+ARTIFACT_FILES = {
+    "artist": "artist_model.pth",
+    "price": "art_price_ecom_pipeline.joblib",
+}
+
+Artifact = namedtuple("Artifact", "name version path sha256")
+
+
+class RegistryError(Exception):
+    pass
+
+
+def root():
+    return str(getattr(settings, "MODEL_REGISTRY_DIR", settings.BASE_DIR / "var" / "models"))
+
+
+def manifest_path():
+    return os.path.join(root(), "manifest.json")
+
+
+def legacy_path(name):
+    return os.path.join(str(settings.BASE_DIR), ARTIFACT_FILES[name])
+
+
+# ---------------------- manifest ----------------------
+
+def read_manifest():
+    try:
+        with open(manifest_path()) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {"artifacts": {}}
+    except ValueError as e:
+        raise RegistryError(f"Unreadable manifest {manifest_path()}: {e}")
+    data.setdefault("artifacts", {})
+    return data
+
+
+def _write_manifest(data):
+    path = manifest_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)  # readers see the old or the new manifest, never half of one
+
+
+@contextlib.contextmanager
+def _locked():
+    """Serialize manifest writers (publish / activate) across processes."""
+    with locks.held_file(os.path.join(root(), ".lock"), blocking=True):
+        yield
+
+
+def sha256_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def resolve(name, manifest=None):
+    """The active Artifact of `name`, or None if the registry doesn't manage it."""
+    entry = (manifest or _cached_manifest())["artifacts"].get(name)
+    if not entry or not entry.get("active"):
+        return None
+    version = entry["active"]
+    info = entry["versions"].get(version)
+    if info is None:
+        raise RegistryError(f"{name}: active version {version!r} is not in the manifest")
+    return Artifact(name, version, os.path.join(root(), info["file"]), info["sha256"])
+
+
+def active_path(name):
+    """Path to load `name` from: the active registry version, else the old location."""
+    try:
+        artifact = resolve(name)
+    except RegistryError as e:
+        logger.error("Model registry: %s; loading %s from its default path", e, name)
+        artifact = None
+    return artifact.path if artifact else legacy_path(name)
+
+
+def verify(artifact):
+    """Raise RegistryError unless the file matches the manifest checksum."""
+    if not os.path.exists(artifact.path):
+        raise RegistryError(f"{artifact.name} {artifact.version}: {artifact.path} is missing")
+    if getattr(settings, "MODEL_REGISTRY_VERIFY", True) and sha256_file(artifact.path) != artifact.sha256:
+        raise RegistryError(f"{artifact.name} {artifact.version}: checksum mismatch for {artifact.path}")
+
+
+def verify_path(path):
+    """verify() for whichever manifest version `path` belongs to."""
+    target = os.path.abspath(path)
+    for name, entry in read_manifest()["artifacts"].items():
+        for version, info in entry["versions"].items():
+            if os.path.abspath(os.path.join(root(), info["file"])) == target:
+                return verify(Artifact(name, version, target, info["sha256"]))
+    raise RegistryError(f"{path} is not in the manifest")
+
+
+def is_managed(path):
+    """True for files inside the registry (immutable, safe to memory-map)."""
+    return os.path.abspath(path).startswith(os.path.abspath(root()) + os.sep)
+
+
+def publish(name, src, version=None, activate=False, note=""):
+    """Copy `src` in as a new version of `name`; returns its Artifact."""
+    if name not in ARTIFACT_FILES:
+        raise RegistryError(f"Unknown model {name!r} (expected one of {', '.join(ARTIFACT_FILES)})")
+    if not os.path.isfile(src):
+        raise RegistryError(f"Not a file: {src}")
+
+    version = version or timezone.now().strftime("%Y%m%dT%H%M%S")
+    relative = os.path.join(name, version, ARTIFACT_FILES[name])
+    dest = os.path.join(root(), relative)
+
+    with _locked():
+        manifest = read_manifest()
+        entry = manifest["artifacts"].setdefault(name, {"active": None, "versions": {}})
+        if version in entry["versions"] or os.path.exists(dest):
+            raise RegistryError(f"{name} version {version!r} already exists")
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = dest + ".tmp"
+        shutil.copyfile(src, tmp)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        digest = sha256_file(tmp)
+        os.replace(tmp, dest)
+        os.chmod(dest, 0o444)  # versions are immutable
+
+        entry["versions"][version] = {
+            "file": relative,
+            "sha256": digest,
+            "size": os.path.getsize(dest),
+            "published_at": timezone.now().isoformat(),
+            "note": note,
+        }
+        if activate or not entry["active"]:
+            entry["active"] = version
+        _write_manifest(manifest)
+
+    return Artifact(name, version, dest, digest)
+
+
+def activate(name, version):
+    with _locked():
+        manifest = read_manifest()
+        entry = manifest["artifacts"].get(name)
+        if not entry or version not in entry["versions"]:
+            raise RegistryError(f"{name} has no version {version!r}")
+        info = entry["versions"][version]
+        verify(Artifact(name, version, os.path.join(root(), info["file"]), info["sha256"]))
+        entry["active"] = version
+        _write_manifest(manifest)
+    return resolve(name, manifest)
+
+
+# ---------------------- hot reload ----------------------
+
+_state_lock = threading.Lock()
+_manifest_cache = None     # (mtime_ns, manifest)
+_next_check = 0.0
+_force_check = False
+_watchers = {}             # name -> [callback(Artifact or None), ...]
+_seen = {}                 # name -> active version this process has loaded
+_reloading = set()
+_failures = {}             # name -> (consecutive failed reloads, monotonic time of the next try)
+
+
+def _cached_manifest():
+    global _manifest_cache
+    try:
+        mtime = os.stat(manifest_path()).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    cached = _manifest_cache
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    manifest = read_manifest() if mtime is not None else {"artifacts": {}}
+    _manifest_cache = (mtime, manifest)
+    return manifest
+
+
+def watch(name, callback):
+    """
+    Call `callback(artifact)` (in a background thread) when `name`'s active
+    version changes. Callbacks of one model run in registration order.
+    """
+    try:
+        artifact = resolve(name)
+    except RegistryError:
+        artifact = None
+    with _state_lock:
+        if name not in _watchers:
+            _seen[name] = artifact.version if artifact else None
+        _watchers.setdefault(name, []).append(callback)
+
+
+def request_reload(*_):
+    """Signal-safe: make the next poll() re-read the manifest."""
+    global _force_check
+    _force_check = True
+
+
+def poll():
+    """Cheap; call on the prediction path. Starts reloads for changed active versions."""
+    global _next_check, _force_check
+    now = time.monotonic()
+    if now < _next_check and not _force_check:
+        return
+    with _state_lock:
+        if now < _next_check and not _force_check:
+            return
+        _next_check = now + getattr(settings, "MODEL_REGISTRY_POLL_INTERVAL", 5)
+        _force_check = False
+        try:
+            manifest = _cached_manifest()
+        except RegistryError as e:
+            logger.warning("Model registry: %s", e)
+            return
+
+        for name, callbacks in _watchers.items():
+            artifact = resolve(name, manifest)
+            version = artifact.version if artifact else None
+            if version == _seen.get(name) or name in _reloading:
+                continue
+            if now < _failures.get(name, (0, 0.0))[1]:
+                continue  # last attempt failed; wait out the backoff
+            _reloading.add(name)
+            threading.Thread(
+                target=_run_reload, args=(name, list(callbacks), artifact),
+                name=f"model-reload-{name}", daemon=True,
+            ).start()
+
+
+def _run_reload(name, callbacks, artifact):
+    version = artifact.version if artifact else None
+    ok = False
+    try:
+        logger.info("Model registry: switching %s to %s", name, version or "the default path")
+        for callback in callbacks:
+            try:
+                callback(artifact)
+            except Exception:
+                logger.exception("Model registry: %s callback %s failed", name, getattr(callback, "__qualname__", callback))
+                break
+        else:
+            ok = True
+    finally:
+        with _state_lock:
+            _reloading.discard(name)
+            if ok:
+                _seen[name] = version
+                _failures.pop(name, None)
+            else:
+                count = _failures.get(name, (0, 0.0))[0] + 1
+                delay = min(
+                    getattr(settings, "MODEL_REGISTRY_POLL_INTERVAL", 5) * 2 ** (count - 1),
+                    getattr(settings, "MODEL_REGISTRY_RETRY_MAX", 300),
+                )
+                _failures[name] = (count, time.monotonic() + delay)
+                logger.warning("Model registry: %s stays on %s; retrying in %gs", name, _seen.get(name), delay)
+
+
+def install_signal_handler():
+    """Re-read the manifest on MODEL_RELOAD_SIGNAL (e.g. "SIGHUP"); main thread only."""
+    name = getattr(settings, "MODEL_RELOAD_SIGNAL", None)
+    if not name:
+        return False
+    try:
+        signal.signal(getattr(signal, name), request_reload)
+    except (AttributeError, ValueError) as e:
+        logger.warning("Model registry: can't install %s handler (%s)", name, e)
+        return False
+    return True
+
+
+def status():
+    manifest = _cached_manifest()
+    return {
+        "root": root(),
+        "models": {
+            name: {
+                "active": (manifest["artifacts"].get(name) or {}).get("active"),
+                "loaded": _seen.get(name),
+                "reloading": name in _reloading,
+                "failed_reloads": _failures.get(name, (0, 0.0))[0],
+            }
+            for name in ARTIFACT_FILES
+        },
+    }
@@ -1,3 +1,67 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+
+class ArtistPrediction(models.Model):
+    """
+    Cached artist-identification result for one uploaded image.
+    Keyed by the sha256 of the uploaded bytes + the checkpoint's sha256,
+    so a new artist_model.pth never serves old answers.
+    """
+    content_hash = models.CharField(max_length=64)
+    model_version = models.CharField(max_length=64)
+    result = models.JSONField()  # same dict predict_image returns
+
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now)  # LRU eviction order
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} → {self.result.get('artist', '?')}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'model_version'], name='uniq_artist_prediction'),
+        ]
+        indexes = [
+            models.Index(fields=['last_used_at']),
+            models.Index(fields=['model_version']),
+        ]
+
+
+class IdentificationJob(models.Model):
+    """
+    One asynchronous artist identification (upload -> job id -> poll).
+    Lives in the database so any web worker can answer the status request,
+    whichever process runs the model.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('error', 'Error'),
+        ('busy', 'Busy (retry later)'),
+        ('expired', 'Expired'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    content_hash = models.CharField(max_length=64)
+    result = models.JSONField(null=True, blank=True)  # same dict predict_image returns
+    error = models.TextField(blank=True)
+    image_url = models.CharField(max_length=255, blank=True)  # preview copy, if kept
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
 
-# Create your models here.
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
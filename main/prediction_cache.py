@@ -0,0 +1,195 @@
+"""
+Persistent content-hash cache for artist predictions.
+
+- key: sha256(uploaded bytes) + sha256(artist_model.pth)
+- a hit returns the stored result without decoding the image or touching torch
+- size-bounded: least-recently-used rows are evicted past the max entry
+  count. The check costs a COUNT(*), so put() runs it only every
+  ARTIST_PREDICTION_CACHE_EVICT_EVERY stores per process (the table can run
+  over by up to that many rows per worker), or on demand with
+  `manage.py artist_model cache-evict`
+- a changed checkpoint gets a new version, and rows of old versions are purged
+- hit/miss/eviction counters live in CACHES["shared"], so every worker and
+  `artist_model cache-stats` see the same numbers. They are exact on redis;
+  on the file-based fallback incr() is a read-modify-write, so concurrent
+  increments can be lost and the numbers are approximate
+"""
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+
+from .models import ArtistPrediction
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEYS = ("hits", "misses", "stores", "evictions", "invalidations")
+_COUNTER_PREFIX = "artist_prediction_cache:"
+
+cache = ConnectionProxy(caches, "shared")  # counters only; the entries are ArtistPrediction rows
+
+_stores_lock = threading.Lock()
+_stores_since_evict = 0
+
+_version_lock = threading.Lock()
+_version_memo = {}  # path -> ((mtime, size), sha256)
+_current_version = None
+
+
+def is_enabled():
+    return getattr(settings, "ARTIST_PREDICTION_CACHE_ENABLED", True)
+
+
+def max_entries():
+    return getattr(settings, "ARTIST_PREDICTION_CACHE_MAX_ENTRIES", 5000)
+
+
+def evict_every():
+    return max(1, getattr(settings, "ARTIST_PREDICTION_CACHE_EVICT_EVERY", 100))
+
+
+def hash_upload(uploaded_file):
+    """sha256 of a Django UploadedFile, read chunk by chunk."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def hash_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_version(path=None, purge=True):
+    """
+    sha256 of the checkpoint, recomputed only when its mtime/size changes.
+    Returns None if the checkpoint is missing. A changed checkpoint purges
+    the predictions cached for other versions, unless purge=False.
+    """
+    global _current_version
+    if path is None:
+        from .ml_model import manager
+        path = manager.path
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _version_lock:
+        memo = _version_memo.get(path)
+        if memo and memo[0] == stamp:
+            return memo[1]
+
+        version = hash_file(path)
+        if not purge:
+            return version  # not memoized, so the next purging call still sees the change
+        _version_memo[path] = (stamp, version)
+        changed = _current_version is not None and _current_version != version
+        _current_version = version
+
+    if changed:
+        logger.info("Artist model checkpoint changed, purging cached predictions")
+        purge_other_versions(version)
+    return version
+
+
+def get(content_hash, version):
+    """Cached result dict or None. Refreshes the row's LRU timestamp."""
+    row = (
+        ArtistPrediction.objects
+        .filter(content_hash=content_hash, model_version=version)
+        .only("id", "result")
+        .first()
+    )
+    if row is None:
+        _incr("misses")
+        return None
+
+    ArtistPrediction.objects.filter(id=row.id).update(
+        hits=F("hits") + 1,
+        last_used_at=timezone.now(),
+    )
+    _incr("hits")
+    return row.result
+
+
+def put(content_hash, version, result):
+    ArtistPrediction.objects.update_or_create(
+        content_hash=content_hash,
+        model_version=version,
+        defaults={"result": result, "last_used_at": timezone.now()},
+    )
+    _incr("stores")
+    if _evict_due():
+        evict()
+
+
+def _evict_due():
+    global _stores_since_evict
+    with _stores_lock:
+        _stores_since_evict += 1
+        if _stores_since_evict < evict_every():
+            return False
+        _stores_since_evict = 0
+        return True
+
+
+def evict():
+    """Drop least-recently-used rows beyond the configured max."""
+    limit = max_entries()
+    if ArtistPrediction.objects.count() <= limit:
+        return 0
+    stale_ids = list(
+        ArtistPrediction.objects
+        .order_by("-last_used_at")
+        .values_list("id", flat=True)[limit:]
+    )
+    deleted, _ = ArtistPrediction.objects.filter(id__in=stale_ids).delete()
+    _incr("evictions", deleted)
+    return deleted
+
+
+def purge_other_versions(version):
+    deleted, _ = ArtistPrediction.objects.exclude(model_version=version).delete()
+    if deleted:
+        _incr("invalidations", deleted)
+    return deleted
+
+
+def clear():
+    ArtistPrediction.objects.all().delete()
+    cache.delete_many([_COUNTER_PREFIX + k for k in COUNTER_KEYS])
+
+
+def stats():
+    counters = cache.get_many([_COUNTER_PREFIX + k for k in COUNTER_KEYS])
+    out = {k: counters.get(_COUNTER_PREFIX + k, 0) for k in COUNTER_KEYS}
+    lookups = out["hits"] + out["misses"]
+    out["hit_ratio"] = round(out["hits"] / lookups, 3) if lookups else None
+    out["entries"] = ArtistPrediction.objects.count()
+    out["max_entries"] = max_entries()
+    out["enabled"] = is_enabled()
+    return out
+
+
+def _incr(name, amount=1):
+    key = _COUNTER_PREFIX + name
+    # add() is a no-op when the key exists, so first use can't race a reset
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
@@ -0,0 +1,195 @@
+"""
+Price a whole sheet of artworks: a CSV or XLSX upload comes back as the same
+sheet with a "Predicted price" column appended.
+
+Rows are priced CHUNK_ROWS at a time with price_ml.predict_prices (one
+DataFrame, one pipeline call per chunk instead of one per row). The view
+prices the whole sheet inside its ml_gate slot and only then writes the
+output, so a slow download never holds a model slot. If a chunk fails
+(e.g. a category the encoder rejects), its rows are priced one by one and
+the failing rows get a message in the "Price error" column instead of
+breaking the file. XLSX is written with openpyxl's write-only workbook,
+which keeps no cell objects.
+
+Headers are matched case-insensitively against the PriceForm field names
+("artist", "delivery_days", ...) or the training-data column names ("Name
+of Painter", "Delivery (days)", ...). As on the form, a row without a size
+gets one from height / width / unit.
+"""
+import codecs
+import csv
+import io
+
+from django.conf import settings
+
+from .price_ml import COLUMNS, predict_prices
+
+CHUNK_ROWS = 1000
+PRICE_COLUMN = "Predicted price"
+ERROR_COLUMN = "Price error"
+
+NUMERIC_KEYS = {"delivery_days", "height", "width", "height_cm", "width_cm"}
+
+# lower-cased header -> sample key
+HEADER_KEYS = {name.lower(): key for name, key in COLUMNS.items()}
+HEADER_KEYS.update({key: key for key in COLUMNS.values()})
+HEADER_KEYS.update({
+    "delivery (days)": "delivery_days", "delivery_days": "delivery_days",
+    "size": "size", "unit": "unit", "height": "height", "width": "width",
+    "height_cm": "height_cm", "width_cm": "width_cm",
+})
+
+
+class SheetError(ValueError):
+    """The upload can't be priced (shown to the user as-is)."""
+
+
+def max_rows():
+    return getattr(settings, "PRICE_BATCH_MAX_ROWS", 50000)
+
+
+def open_sheet(uploaded):
+    """-> (kind, header, rows): rows is an iterator of cell lists after the header."""
+    name = uploaded.name.lower()
+    if name.endswith(".csv"):
+        kind, rows, n_rows = "csv", _csv_rows(uploaded), _count_csv_rows(uploaded)
+    elif name.endswith(".xlsx"):
+        kind, rows, n_rows = "xlsx", *_xlsx_rows(uploaded)
+    else:
+        raise SheetError("Upload a .csv or .xlsx file.")
+
+    header = next(rows, None)
+    if not header:
+        raise SheetError("The file is empty.")
+    if n_rows - 1 > max_rows():
+        raise SheetError(f"Too many rows ({n_rows - 1}); the limit is {max_rows()} per file.")
+    return kind, ["" if h is None else str(h).strip() for h in header], rows
+
+
+def _csv_rows(uploaded):
+    uploaded.seek(0)
+    return csv.reader(codecs.iterdecode(uploaded, "utf-8-sig"))
+
+
+def _count_csv_rows(uploaded):
+    try:
+        n = sum(1 for _ in _csv_rows(uploaded))
+    except UnicodeDecodeError:
+        raise SheetError("The CSV file must be UTF-8 encoded.")
+    uploaded.seek(0)
+    return n
+
+
+def _xlsx_rows(uploaded):
+    import openpyxl
+
+    try:
+        wb = openpyxl.load_workbook(uploaded, read_only=True, data_only=True)
+    except Exception:
+        raise SheetError("That doesn't look like a valid .xlsx file.")
+    ws = wb.active
+    n_rows = ws.max_row if ws.max_row is not None else sum(1 for _ in ws.iter_rows(values_only=True))
+    return ws.iter_rows(values_only=True), n_rows
+
+
+def column_map(header):
+    """-> [(cell index, sample key)]; the artist column is required, like on the form."""
+    mapping = []
+    for i, name in enumerate(header):
+        key = HEADER_KEYS.get(name.lower())
+        if key and key not in {k for _, k in mapping}:
+            mapping.append((i, key))
+    if "artist" not in {k for _, k in mapping}:
+        raise SheetError('No artist column: expected "artist" or "Name of Painter".')
+    return mapping
+
+
+def _number(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def sample_from_cells(cells, mapping):
+    sample = {}
+    for i, key in mapping:
+        value = cells[i] if i < len(cells) else None
+        if key in NUMERIC_KEYS:
+            sample[key] = _number(value)
+        else:
+            sample[key] = "" if value is None else str(value).strip()
+
+    if sample.get("height_cm") is None or sample.get("width_cm") is None:
+        sample.pop("height_cm", None)
+        sample.pop("width_cm", None)
+    if not sample.get("size") and sample.get("height") and sample.get("width"):
+        sample["size"] = f"{sample['height']:g}x{sample['width']:g}{sample.get('unit') or 'cm'}"
+    return sample
+
+
+def priced_rows(rows, mapping):
+    """Yield (cells, price, error) per input row, pricing CHUNK_ROWS rows per model call."""
+    chunk = []
+    for cells in rows:
+        chunk.append(list(cells))
+        if len(chunk) == CHUNK_ROWS:
+            yield from _price_chunk(chunk, mapping)
+            chunk = []
+    if chunk:
+        yield from _price_chunk(chunk, mapping)
+
+
+def _price_chunk(chunk, mapping):
+    blank = [not any(c not in (None, "") for c in cells) for cells in chunk]
+    samples = [sample_from_cells(cells, mapping) for cells, skip in zip(chunk, blank) if not skip]
+    results = iter(_predict(samples))
+    for cells, skip in zip(chunk, blank):
+        yield (cells, None, "") if skip else (cells, *next(results))
+
+
+def _predict(samples):
+    """-> [(price, error)]: one call for the chunk, or one per row if the chunk fails."""
+    try:
+        return [(round(price, 2), "") for price in predict_prices(samples)]
+    except Exception:
+        pass
+
+    results = []
+    for sample in samples:
+        try:
+            results.append((round(predict_prices([sample])[0], 2), ""))
+        except Exception as e:
+            results.append((None, str(e)[:200] or type(e).__name__))
+    return results
+
+
+# ---------------------- output ----------------------
+
+def csv_chunks(header, priced):
+    """CSV text for `priced` (priced_rows' output), one string per CHUNK_ROWS rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header + [PRICE_COLUMN, ERROR_COLUMN])
+    for n, (cells, price, error) in enumerate(priced, 1):
+        writer.writerow(cells + ["" if price is None else price, error])
+        if n % CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def xlsx_bytes(header, priced):
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Prices")
+    ws.append(header + [PRICE_COLUMN, ERROR_COLUMN])
+    for cells, price, error in priced:
+        ws.append(cells + [price, error or None])
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
@@ -0,0 +1,158 @@
+"""
+Memoized price predictions.
+
+The price page is resubmitted with one field changed at a time, and common
+combinations come up again and again, so results are cached on the
+normalized pipeline row (after the colour-wheel palette and size parsing;
+see price_ml._row), not on the raw form input: "20x30in" and
+"20 x 30 inches" share an entry.
+
+- key: sha256(price artifact) + sha256(normalized row); a new artifact
+  changes every key, so old predictions are simply never read again
+- tier 1: per-process LRU with a TTL (PRICE_CACHE_MAX_ENTRIES)
+- tier 2: CACHES["shared"] (PRICE_CACHE_TTL), so a price scored by one
+  worker is a hit in every other worker on the host (or, on redis, the fleet)
+- hit/miss counters live in CACHES["shared"] as well, so /ml/status/ shows
+  the totals of all workers rather than of the one that answered; exact on
+  redis, approximate on the file-based fallback (incr() isn't atomic there)
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from .prediction_cache import hash_file
+
+COUNTER_KEYS = ("local_hits", "shared_hits", "misses", "stores")
+_COUNTER_PREFIX = "price_cache:"
+_KEY_PREFIX = "price:"
+
+cache = ConnectionProxy(caches, "shared")
+
+_lock = threading.Lock()
+_local = OrderedDict()  # key -> (expires_at, price)
+_version = None         # ((mtime, size), sha256) of the artifact
+
+
+def is_enabled():
+    return getattr(settings, "PRICE_CACHE_ENABLED", True)
+
+
+def max_entries():
+    return getattr(settings, "PRICE_CACHE_MAX_ENTRIES", 2048)
+
+
+def ttl():
+    return getattr(settings, "PRICE_CACHE_TTL", 3600)
+
+
+def artifact_version(path):
+    """sha256 of the price artifact, recomputed only when its mtime/size changes."""
+    global _version
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    memo = _version
+    if memo and memo[0] == stamp:
+        return memo[1]
+
+    version = hash_file(path)
+    with _lock:
+        if _version is not None and _version[1] != version:
+            _local.clear()  # entries of the old model can never be hit again
+        _version = (stamp, version)
+    return version
+
+
+def _normalize(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        value = float(value)
+        return None if math.isnan(value) else round(value, 6)
+    return str(value)
+
+
+def key_for(row, version):
+    """Cache key of a pipeline row (price_ml._row) under one artifact version."""
+    normalized = json.dumps([[col, _normalize(row[col])] for col in sorted(row)], separators=(",", ":"))
+    return f"{_KEY_PREFIX}{version[:16]}:{hashlib.sha256(normalized.encode()).hexdigest()}"
+
+
+def get(key):
+    now = time.monotonic()
+    with _lock:
+        entry = _local.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _local.move_to_end(key)
+                hit = entry[1]
+            else:
+                del _local[key]
+                hit = None
+        else:
+            hit = None
+    if hit is not None:
+        _incr("local_hits")
+        return hit
+
+    price = cache.get(key)
+    if price is None:
+        _incr("misses")
+        return None
+    _remember(key, price)
+    _incr("shared_hits")
+    return price
+
+
+def put(key, price):
+    _remember(key, price)
+    cache.set(key, price, timeout=ttl())
+    _incr("stores")
+
+
+def _remember(key, price):
+    with _lock:
+        _local[key] = (time.monotonic() + ttl(), price)
+        _local.move_to_end(key)
+        while len(_local) > max_entries():
+            _local.popitem(last=False)
+
+
+def clear():
+    """Forget this process's entries and the shared counters (shared entries age out via TTL)."""
+    with _lock:
+        _local.clear()
+    cache.delete_many([_COUNTER_PREFIX + k for k in COUNTER_KEYS])
+
+
+def stats():
+    counters = cache.get_many([_COUNTER_PREFIX + k for k in COUNTER_KEYS])
+    out = {k: counters.get(_COUNTER_PREFIX + k, 0) for k in COUNTER_KEYS}
+    hits = out["local_hits"] + out["shared_hits"]
+    lookups = hits + out["misses"]
+    out["hit_ratio"] = round(hits / lookups, 3) if lookups else None
+    out["local_entries"] = len(_local)
+    out["max_entries"] = max_entries()
+    out["ttl_s"] = ttl()
+    out["artifact_version"] = _version[1][:16] if _version else None
+    out["enabled"] = is_enabled()
+    return out
+
+
+def _incr(name, amount=1):
+    key = _COUNTER_PREFIX + name
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
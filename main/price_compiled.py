@@ -0,0 +1,313 @@
+"""
+Single-row fast path for the price pipeline.
+
+Scoring one PriceForm row through the sklearn Pipeline builds a one-row
+DataFrame, aligns columns by name and runs the ColumnTransformer machinery,
+which costs far more than the model itself. compile_pipeline() reads the
+fitted constants out of the pipeline once (one-hot category -> index maps,
+imputation values, scaler mean/scale) and turns a row dict straight into
+the feature vector the final estimator was trained on.
+
+Only the steps below are understood; anything else raises Unsupported and
+price_ml keeps using the pipeline:
+
+    Pipeline(ColumnTransformer(...), [SimpleImputer | StandardScaler ...], estimator)
+    ColumnTransformer blocks: OneHotEncoder, SimpleImputer, StandardScaler,
+                              "passthrough", "drop", or a Pipeline of those
+
+Random-forest regressors are scored tree by tree (the same float64 sum
+ForestRegressor.predict does) instead of through its per-call thread pool.
+
+A row the compiled path can't score the same way (e.g. an unseen category
+with handle_unknown="error") raises Fallback, and that row goes through
+the pipeline. self_check() compares both paths on random rows before the
+compiled predictor is used.
+"""
+import math
+import numbers
+
+import numpy as np
+
+
+class Unsupported(Exception):
+    """The pipeline contains a step this module can't compile."""
+
+
+class Fallback(Exception):
+    """This row needs the full pipeline."""
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise Fallback(f"non-numeric value {value!r}")
+
+
+# ---------------------- steps: list of values -> list of values ----------------------
+
+def _is_identity(step):
+    # remainder="passthrough" is stored as FunctionTransformer() once fitted
+    from sklearn.preprocessing import FunctionTransformer
+    return isinstance(step, FunctionTransformer) and step.func is None
+
+def _compile_step(step, width):
+    """-> (fn, output width, {input position: categories} for one-hot encoded inputs)."""
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    if step == "passthrough" or step is None or _is_identity(step):
+        return (lambda values: [_to_float(v) for v in values]), width, {}
+
+    if isinstance(step, Pipeline):
+        fns, categories, aligned = [], {}, True
+        for _, sub in step.steps:
+            fn, out_width, cats = _compile_step(sub, width)
+            if cats and aligned and not categories:
+                categories = cats  # positions still line up with the block's input columns
+            aligned = aligned and out_width == width
+            width = out_width
+            fns.append(fn)
+
+        def chain(values):
+            for fn in fns:
+                values = fn(values)
+            return values
+        return chain, width, categories
+
+    if isinstance(step, SimpleImputer):
+        return _compile_imputer(step)
+
+    if isinstance(step, StandardScaler):
+        mean = step.mean_ if step.with_mean else None
+        scale = step.scale_ if step.with_std else None
+        n = len(step.mean_ if step.mean_ is not None else step.scale_)
+
+        def scale_fn(values):
+            x = np.array([_to_float(v) for v in values], dtype=float)
+            if mean is not None:
+                x = x - mean
+            if scale is not None:
+                x = x / scale
+            return list(x)
+        return scale_fn, n, {}
+
+    if isinstance(step, OneHotEncoder):
+        return _compile_onehot(step)
+
+    raise Unsupported(f"can't compile {type(step).__name__}")
+
+
+def _compile_imputer(imp):
+    if getattr(imp, "indicator_", None) is not None:
+        raise Unsupported("SimpleImputer(add_indicator=True)")
+    stats = imp.statistics_
+    missing = imp.missing_values
+    numeric = stats.dtype.kind in "fiu"
+
+    keep = list(range(len(stats)))
+    if numeric and not imp.keep_empty_features:
+        keep = [i for i in keep if not math.isnan(stats[i])]  # all-empty columns were dropped at fit
+    fill = [stats[i] for i in keep]
+
+    def is_missing(value):
+        if isinstance(missing, float) and math.isnan(missing):
+            return _is_missing(value) if numeric else (isinstance(value, float) and math.isnan(value))
+        return value == missing
+
+    def impute(values):
+        out = []
+        for i, s in zip(keep, fill):
+            v = _to_float(values[i]) if numeric else values[i]
+            out.append(s if is_missing(v) else v)
+        return out
+    return impute, len(keep), {}
+
+
+def _compile_onehot(enc):
+    if enc.drop_idx_ is not None:
+        raise Unsupported("OneHotEncoder(drop=...)")
+    if getattr(enc, "_infrequent_enabled", False):
+        raise Unsupported("OneHotEncoder with infrequent categories")
+    strict = enc.handle_unknown == "error"
+
+    maps, offsets, nan_index = [], [], []
+    offset = 0
+    for cats in enc.categories_:
+        lookup, nan_at = {}, None
+        for j, c in enumerate(cats.tolist()):
+            if _is_missing(c):
+                nan_at = j
+            else:
+                lookup[c] = j
+        maps.append(lookup)
+        nan_index.append(nan_at)
+        offsets.append(offset)
+        offset += len(cats)
+    width = offset
+
+    def encode(values):
+        out = [0.0] * width
+        for k, value in enumerate(values):
+            j = nan_index[k] if _is_missing(value) else maps[k].get(value)
+            if j is None:
+                if strict:
+                    raise Fallback(f"unknown category {value!r}")
+                continue  # handle_unknown="ignore": all zeros
+            out[offsets[k] + j] = 1.0
+        return out
+
+    categories = {k: [c for c in cats.tolist() if not _is_missing(c)] for k, cats in enumerate(enc.categories_)}
+    return encode, width, categories
+
+
+# ---------------------- whole pipeline ----------------------
+
+class CompiledPricePipeline:
+    def __init__(self, blocks, post, estimator, categorical, numeric, strict_columns):
+        self.blocks = blocks            # [(input column names, fn)]
+        self.post = post                # vector -> vector steps after the ColumnTransformer
+        self.estimator = estimator
+        self.estimator_predict = _estimator_predict(estimator)
+        self.categorical = categorical  # column -> known categories (for random_rows)
+        self.numeric = numeric
+        self.strict_columns = strict_columns
+
+    def vector(self, row):
+        x = []
+        for columns, fn in self.blocks:
+            x.extend(fn([row.get(c) for c in columns]))
+        for fn in self.post:
+            x = fn(x)
+        return np.asarray(x, dtype=float).reshape(1, -1)
+
+    def predict_one(self, row):
+        """Raw estimator output for one pipeline row (before any target transform)."""
+        return float(self.estimator_predict(self.vector(row))[0])
+
+
+def _estimator_predict(estimator):
+    """estimator.predict, minus the per-call thread pool for random-forest style regressors."""
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+    if not isinstance(estimator, (RandomForestRegressor, ExtraTreesRegressor)) or estimator.n_outputs_ != 1:
+        return estimator.predict
+    trees = list(estimator.estimators_)
+
+    def predict(X):
+        # same accumulation as ForestRegressor.predict: float64 sum in tree order, then mean
+        X = X.astype(np.float32)
+        y = np.zeros(X.shape[0], dtype=np.float64)
+        for tree in trees:
+            y += tree.predict(X, check_input=False)
+        y /= len(trees)
+        return y
+    return predict
+
+
+def compile_pipeline(pipe):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    if not isinstance(pipe, Pipeline) or len(pipe.steps) < 2:
+        raise Unsupported("expected a Pipeline(preprocessor, ..., estimator)")
+    ct = pipe.steps[0][1]
+    if not isinstance(ct, ColumnTransformer):
+        raise Unsupported(f"first step is {type(ct).__name__}, not a ColumnTransformer")
+    estimator = pipe.steps[-1][1]
+    if hasattr(estimator, "feature_names_in_"):
+        raise Unsupported("estimator was fitted on named (DataFrame) features")
+
+    names = list(getattr(ct, "feature_names_in_", []))
+    blocks, categorical, numeric, strict = [], {}, set(), set()
+    width = 0
+    for _, trans, cols in ct.transformers_:
+        if trans == "drop":
+            continue
+        columns = _resolve_columns(cols, names)
+        if not columns:
+            continue
+        fn, out_width, cats = _compile_step(trans, len(columns))
+        blocks.append((columns, fn))
+        width += out_width
+
+        steps = [sub for _, sub in trans.steps] if isinstance(trans, Pipeline) else [trans]
+        rejects_unknown = any(isinstance(sub, OneHotEncoder) and sub.handle_unknown == "error" for sub in steps)
+        for k, column in enumerate(columns):
+            if k in cats:
+                categorical[column] = cats[k]
+                if rejects_unknown:
+                    strict.add(column)
+            else:
+                numeric.add(column)
+
+    post = []
+    for _, step in pipe.steps[1:-1]:
+        fn, width, _ = _compile_step(step, width)
+        post.append(fn)
+
+    return CompiledPricePipeline(blocks, post, estimator, categorical, sorted(numeric), strict)
+
+
+def _resolve_columns(cols, names):
+    if callable(cols):
+        raise Unsupported("callable column selector")
+    if isinstance(cols, str):
+        return [cols]
+    if isinstance(cols, slice):
+        return names[cols]
+    cols = list(cols)
+    if cols and all(isinstance(c, (bool, np.bool_)) for c in cols):
+        return [n for n, keep in zip(names, cols) if keep]
+    if cols and all(isinstance(c, numbers.Integral) for c in cols):
+        if not names:
+            raise Unsupported("integer column indices without feature names")
+        return [names[c] for c in cols]
+    return [str(c) for c in cols]
+
+
+# ---------------------- equivalence ----------------------
+
+def random_rows(compiled, n, seed=0):
+    """Random pipeline rows: known, unseen and empty categories; numbers with gaps."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        row = {}
+        for column, cats in compiled.categorical.items():
+            r = rng.random()
+            if r < 0.85 and cats:
+                row[column] = cats[int(rng.integers(len(cats)))]
+            elif r < 0.95 and column not in compiled.strict_columns:
+                row[column] = f"unseen-{int(rng.integers(1000))}"
+            else:
+                row[column] = "" if "" in cats or column not in compiled.strict_columns else cats[0]
+        for column in compiled.numeric:
+            row[column] = math.nan if rng.random() < 0.1 else float(rng.lognormal(3, 1.5))
+        rows.append(row)
+    return rows
+
+
+def self_check(pipe, compiled, n=256, seed=0):
+    """Max relative |pipeline - compiled| over `n` random rows (estimator output scale)."""
+    import pandas as pd
+
+    rows = random_rows(compiled, n, seed)
+    columns = list(getattr(pipe.steps[0][1], "feature_names_in_", rows[0].keys()))
+    expected = pipe.predict(pd.DataFrame(rows, columns=columns))
+    worst = 0.0
+    for row, want in zip(rows, expected):
+        try:
+            got = compiled.predict_one(row)
+        except Fallback:
+            continue  # this row would be scored by the pipeline anyway
+        worst = max(worst, abs(got - float(want)) / max(1.0, abs(float(want))))
+    return worst
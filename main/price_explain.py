@@ -0,0 +1,245 @@
+"""
+"Why this price?": per-feature attribution for one price prediction.
+
+Each input of the sample (artist, medium, size, ...) is compared against a
+baseline where that input is left empty, i.e. what the pipeline's imputers
+fill in when the form field is blank. Two methods:
+
+- "occlusion": one row per input with just that input emptied;
+  contribution = price(sample) - price(sample without it). Cheap, but the
+  contributions don't have to add up to price - baseline price.
+- "shapley": `samples` random orderings of the inputs; each ordering fills
+  the inputs in one by one starting from the all-empty row, and an input
+  gets the price change at its step. The average over orderings is a
+  sampled Shapley value, and the contributions add up exactly to
+  price - baseline price.
+
+Rows are built per chunk of orderings (identical rows once) and scored with
+price_ml.predict_prices_versioned, so contributions are in price units.
+PRICE_EXPLAIN_BUDGET_MS is a hard budget: the first chunk is small
+(CALIBRATION_ORDERINGS) unless this process has already measured the
+per-row cost, each later chunk is sized from what the previous one took,
+and the clock is checked between chunks. Once the budget is spent the
+orderings scored so far are returned and the response says so
+("truncated"). Results are cached in CACHES["shared"] on the normalized
+pipeline row, like price_cache's predictions: looked up under
+price_ml.scoring_version() and stored under the sha256 the scoring calls
+report (not cached if a reload happened between chunks).
+"""
+import hashlib
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from . import price_cache, price_ml
+
+METHODS = ("occlusion", "shapley")
+
+# sample keys attributed one by one; "size" stands for size / height_cm / width_cm
+FEATURES = list(price_ml.COLUMNS.values()) + ["size", "delivery_days"]
+SIZE_KEYS = ("size", "height_cm", "width_cm")
+CALIBRATION_ORDERINGS = 2  # first chunk when this process has no per-row timing yet
+
+cache = ConnectionProxy(caches, "shared")
+
+_row_ms = None  # moving average of milliseconds per scored row (this process)
+
+
+class ExplainError(ValueError):
+    """Bad explain request (shown to the caller as-is, with a 400)."""
+
+
+def budget_ms():
+    return getattr(settings, "PRICE_EXPLAIN_BUDGET_MS", 1500)
+
+
+def max_samples():
+    return getattr(settings, "PRICE_EXPLAIN_MAX_SAMPLES", 64)
+
+
+def cache_ttl():
+    return getattr(settings, "PRICE_EXPLAIN_CACHE_TTL", 3600)
+
+
+def _keys(feature):
+    return SIZE_KEYS if feature == "size" else (feature,)
+
+
+def _is_empty(sample, feature):
+    return all(sample.get(key) in (None, "") for key in _keys(feature))
+
+
+def _with(row, feature, source):
+    """Copy of `row` with `feature` taken from `source` (or emptied if source is None)."""
+    out = dict(row)
+    for key in _keys(feature):
+        out.pop(key, None)
+        if source is not None and key in source:
+            out[key] = source[key]
+    return out
+
+
+def _baseline(sample, features):
+    row = dict(sample)
+    for feature in features:
+        row = _with(row, feature, None)
+    return row
+
+
+class _Rows:
+    """Rows to score, each distinct row stored once."""
+
+    def __init__(self):
+        self.rows, self._index = [], {}
+
+    def add(self, row):
+        key = tuple(sorted((k, repr(v)) for k, v in row.items()))
+        if key not in self._index:
+            self._index[key] = len(self.rows)
+            self.rows.append(row)
+        return self._index[key]
+
+
+def _orderings(features, n, seed):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        order = list(features)
+        rng.shuffle(order)
+        out.append(order)
+    return out
+
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000.0
+
+
+def _first_chunk(rows_per_ordering, fixed_rows, requested, started):
+    """Orderings for the first chunk: a small calibration chunk, or what the
+    previous requests' per-row cost says fits in the budget."""
+    if _row_ms is None:
+        return min(requested, CALIBRATION_ORDERINGS)
+    left = budget_ms() - _elapsed_ms(started)
+    fits = int((left / _row_ms - fixed_rows) // max(1, rows_per_ordering))
+    return max(1, min(requested, fits))
+
+
+def _score(table, prices, versions):
+    """Score the rows of `table` not priced yet, appending to `prices` and
+    the sha256 of the model that scored them to `versions`."""
+    global _row_ms
+    rows = table.rows[len(prices):]
+    if not rows:
+        return
+    t0 = time.perf_counter()
+    scored, version = price_ml.predict_prices_versioned(rows)
+    prices.extend(scored)
+    versions.add(version)
+    per_row = _elapsed_ms(t0) / len(rows)
+    _row_ms = per_row if _row_ms is None else 0.8 * _row_ms + 0.2 * per_row
+
+
+def _shapley(sample, features, table, prices, versions, base, samples, seed, started):
+    """-> (steps, orderings used): orderings scored chunk by chunk until done or over budget."""
+    steps = {f: [] for f in features}
+    orderings = _orderings(features, samples, seed)
+    used = 0
+    chunk = _first_chunk(len(features) - 1, 2, samples, started)
+    while chunk > 0:
+        t0 = time.perf_counter()
+        batch = orderings[used:used + chunk]
+        for order in batch:
+            row, before = _baseline(sample, features), base
+            for feature in order:
+                row = _with(row, feature, sample)
+                after = table.add(row)
+                steps[feature].append((after, before))
+                before = after
+        _score(table, prices, versions)
+        used += len(batch)
+
+        left = budget_ms() - _elapsed_ms(started)
+        if used >= samples or left <= 0:
+            break
+        per_ordering = _elapsed_ms(t0) / len(batch)
+        chunk = min(samples - used, int(left // per_ordering) if per_ordering else samples)
+    return steps, used
+
+
+def explain(sample, method="shapley", samples=16):
+    """Attribution of predict_price(sample) -> JSON-ready dict."""
+    if method not in METHODS:
+        raise ExplainError(f"Unknown method {method!r}; use one of {', '.join(METHODS)}.")
+    try:
+        samples = int(samples)
+    except (TypeError, ValueError):
+        raise ExplainError('"samples" must be a whole number.')
+    if not 1 <= samples <= max_samples():
+        raise ExplainError(f'"samples" must be between 1 and {max_samples()}.')
+
+    started = time.perf_counter()
+    caching = bool(cache_ttl())
+    key = _cache_key(sample, method, samples, price_ml.scoring_version()) if caching else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True, elapsed_ms=round(_elapsed_ms(started), 1))
+
+    features = [f for f in FEATURES if not _is_empty(sample, f)]
+    table = _Rows()
+    full = table.add(sample)
+    base = table.add(_baseline(sample, features))
+    prices, versions = [], set()
+    truncated = False
+
+    if method == "occlusion" or not features:
+        steps = {f: [(full, table.add(_with(sample, f, None)))] for f in features}
+        used = None
+        _score(table, prices, versions)
+    else:
+        seed = int(hashlib.sha256(repr(sorted(sample.items())).encode()).hexdigest()[:8], 16)
+        steps, used = _shapley(sample, features, table, prices, versions, base, samples, seed, started)
+        truncated = used < samples
+
+    contributions = [
+        {
+            "feature": f,
+            "value": sample.get(f) if f != "size" else _size_label(sample),
+            "contribution": round(sum(prices[a] - prices[b] for a, b in pairs) / len(pairs), 2),
+        }
+        for f, pairs in steps.items()
+    ]
+    contributions.sort(key=lambda c: -abs(c["contribution"]))
+
+    result = {
+        "price": round(prices[full], 2),
+        "baseline_price": round(prices[base], 2),
+        "method": method,
+        "samples": used,
+        "truncated": truncated,
+        "rows_scored": len(table.rows),
+        "contributions": contributions,
+        "elapsed_ms": round(_elapsed_ms(started), 1),
+    }
+    version = versions.pop() if len(versions) == 1 else None
+    if caching and version and not truncated:
+        cache.set(_cache_key(sample, method, samples, version), result, timeout=cache_ttl())
+    return dict(result, cached=False)
+
+
+def _size_label(sample):
+    if sample.get("size"):
+        return sample["size"]
+    if sample.get("height_cm") is not None and sample.get("width_cm") is not None:
+        return f"{sample['height_cm']:g}x{sample['width_cm']:g}cm"
+    return None
+
+
+def _cache_key(sample, method, samples, version):
+    if not version:
+        return None
+    row_key = price_cache.key_for(price_ml._row(sample), version)
+    return f"explain:{method}:{samples if method == 'shapley' else 0}:{row_key}"
@@ -1,13 +1,173 @@
-import os, joblib, numpy as np, pandas as pd
+import logging, os, threading, time, warnings, numpy as np
+from django.conf import settings
 
+from . import inference_client, model_registry, price_cache, price_compiled
+
+logger = logging.getLogger(__name__)
+
+# default location; a version published to the model registry takes precedence
 ARTIFACT = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "art_price_ecom_pipeline.joblib"
 )
 
-_bundle = joblib.load(ARTIFACT)
-_pipe = _bundle["pipeline"]
-_log_target = _bundle["meta"]["log_target"]
+class PriceModel:
+    """One loaded artifact. Swapped as a whole on reload, never modified."""
+    def __init__(self, pipe, log_target, path, version, compiled=None, compiled_status=None, mmapped=False, sha256=None,
+                 categories=None):
+        self.pipe = pipe
+        self.log_target = log_target
+        self.path = path
+        self.version = version
+        self.sha256 = sha256  # what stored estimates record as their model version
+        # pandas-free single-row predictor (see price_compiled), built and checked at load
+        self.compiled = compiled
+        self.compiled_status = compiled_status or {"enabled": False}
+        self.mmapped = mmapped
+        self.categories = categories or {}  # sample key -> values its encoder was fitted on
+
+# loaded on first use (not at import), so web workers that send predictions
+# to the inference daemon never hold the pipeline
+_current = None
+_load_lock = threading.Lock()
+_daemon_sha = (None, 0.0)  # (sha256 the inference daemon last predicted with, when)
+
+def _model():
+    global _current
+    model_registry.poll()
+    current = _current
+    if current is None:
+        with _load_lock:
+            if _current is None:
+                _current = _load_artifact(_active())
+            current = _current
+    return current
+
+def load():
+    return _model().pipe
+
+def _active():
+    try:
+        return model_registry.resolve("price")
+    except model_registry.RegistryError as e:
+        logger.error("Model registry: %s; using %s", e, ARTIFACT)
+        return None
+
+def _load_artifact(artifact):
+    import joblib
+    path, version = (artifact.path, artifact.version) if artifact else (ARTIFACT, None)
+    if artifact:
+        model_registry.verify(artifact)
+
+    # registry versions are immutable: map their arrays instead of copying them
+    # into every worker (compressed pickles can't be mapped and load normally)
+    mmapped = bool(artifact) and getattr(settings, "MODEL_MMAP", True)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        bundle = joblib.load(path, mmap_mode="r" if mmapped else None)
+
+    pipe = bundle["pipeline"]
+    compiled, compiled_status = _compile(pipe)
+    logger.info("Price pipeline loaded from %s (version %s)", path, version or "default")
+    sha256 = artifact.sha256 if artifact else price_cache.artifact_version(path)
+    return PriceModel(pipe, bundle["meta"]["log_target"], path, version, compiled, compiled_status, mmapped, sha256,
+                      _categories(pipe))
+
+def _reload(artifact):
+    """model_registry callback: load the new version next to the old one, then swap."""
+    global _current
+    if _current is None:
+        return  # not loaded in this process: the next call loads the active version
+    new = _load_artifact(artifact)
+    with _load_lock:
+        _current = new
+
+model_registry.watch("price", _reload)
+
+def _compile(pipe):
+    if not getattr(settings, "PRICE_COMPILED_ENABLED", True):
+        return None, {"enabled": False, "reason": "PRICE_COMPILED_ENABLED is off"}
+    try:
+        compiled = price_compiled.compile_pipeline(pipe)
+        diff = price_compiled.self_check(pipe, compiled)
+    except price_compiled.Unsupported as e:
+        logger.info("Price pipeline not compiled (%s); using the sklearn pipeline", e)
+        return None, {"enabled": False, "reason": f"unsupported pipeline: {e}"}
+    except Exception as e:
+        logger.exception("Compiling the price pipeline failed; using the sklearn pipeline")
+        return None, {"enabled": False, "reason": f"compile failed: {e}"}
+    if diff > 1e-9:
+        logger.warning("Compiled price predictor disagrees with the pipeline (max rel diff %g); not used", diff)
+        return None, {"enabled": False, "reason": "self-check failed", "max_rel_diff": diff}
+    return compiled, {"enabled": True, "max_rel_diff": diff}
+
+def _categories(pipe):
+    """sample key -> sorted known values, for inputs the pipeline one-hot / ordinal encodes."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+
+    out = {}
+    for _, step in (pipe.steps if isinstance(pipe, Pipeline) else [(None, pipe)]):
+        if not isinstance(step, ColumnTransformer):
+            continue
+        names = list(getattr(step, "feature_names_in_", []))
+        for _, transformer, cols in step.transformers_:
+            subs = transformer.steps if isinstance(transformer, Pipeline) else [(None, transformer)]
+            encoder = next((sub for _, sub in subs if isinstance(sub, (OneHotEncoder, OrdinalEncoder))), None)
+            if encoder is None:
+                continue
+            try:
+                columns = price_compiled._resolve_columns(cols, names)
+            except price_compiled.Unsupported:
+                continue
+            for column, cats in zip(columns, encoder.categories_):
+                if column in COLUMNS:
+                    out[COLUMNS[column]] = sorted(str(c) for c in cats.tolist() if isinstance(c, str) or c == c)
+    return out
+
+def known_categories():
+    """-> ({sample key: known values}, sha256) of the model predictions come from."""
+    if inference_client.is_enabled():
+        try:
+            return inference_client.price_categories()
+        except inference_client.InferenceUnavailable:
+            pass  # daemon down: ask the local model
+    return known_categories_local()
+
+def known_categories_local():
+    model = _model()
+    return model.categories, model.sha256
+
+def artifact_id():
+    """sha256 of the artifact predictions come from (for cache keys), None if missing."""
+    artifact = _active()
+    return artifact.sha256 if artifact else price_cache.artifact_version(ARTIFACT)
+
+def scoring_version():
+    """
+    sha256 of the model a prediction made now comes from, for cache lookups;
+    None if unknown. Results are stored under the sha256 the prediction call
+    reports, so a lookup never finds another model's price.
+    """
+    if inference_client.is_enabled():
+        sha, seen = _daemon_sha  # the daemon may have reloaded since: trust it for one poll interval
+        fresh = time.monotonic() - seen < getattr(settings, "MODEL_REGISTRY_POLL_INTERVAL", 5)
+        return sha if fresh else None
+    return _model().sha256
+
+def status():
+    current = _current
+    if current is None:
+        return {"loaded": False, "compiled": {"enabled": False, "reason": "not loaded"}}
+    return {
+        "loaded": True,
+        "path": current.path,
+        "version": current.version,
+        "mmapped": current.mmapped,
+        "log_target": current.log_target,
+        "compiled": dict(current.compiled_status),
+    }
 
 def _from_log(y): return np.expm1(y)
 
@@ -29,24 +189,52 @@ def _parse_size(size):
         return np.nan, np.nan
 
 def predict_price(sample: dict) -> float:
-    row = {
-        "Name of Painter":           sample.get("artist", ""),
-        "Subject of Painting":       sample.get("subject", ""),
-        "Style":                     sample.get("style", ""),
-        "Medium":                    sample.get("medium", ""),
-        "Frame":                     sample.get("frame", ""),
-        "Location":                  sample.get("location", ""),
-        "Shipment":                  sample.get("shipment", ""),
-        "Color Palette":             sample.get("color_palette", ""),
-        "Copy or Original":          sample.get("copy_or_original", ""),
-        "Print or Real":             sample.get("print_or_real", ""),
-        "Recommended Environment":   sample.get("environment", ""),
-        "Mood/Atmosphere":           sample.get("mood", ""),
-        "Theme/Lighting Requirements": sample.get("lighting", ""),
-        "Reproduction Type":         sample.get("reproduction_type", ""),
-        "Target Audience":           sample.get("audience", ""),
-        "Delivery (days)":           sample.get("delivery_days", np.nan),
-    }
+    global _daemon_sha
+    caching = price_cache.is_enabled()
+    row = _row(sample) if caching else None
+    if caching:
+        version = scoring_version()
+        if version:
+            cached = price_cache.get(price_cache.key_for(row, version))
+            if cached is not None:
+                return cached
+
+    price = version = None
+    if inference_client.is_enabled():
+        try:
+            price, version = inference_client.predict_price_versioned(sample)
+            _daemon_sha = (version, time.monotonic())
+        except inference_client.InferenceUnavailable:
+            pass  # daemon down: predict here
+    if price is None:
+        price, version = predict_price_versioned_local(sample)
+
+    if caching and version:
+        price_cache.put(price_cache.key_for(row, version), price)
+    return price
+
+# pipeline column -> sample key
+COLUMNS = {
+    "Name of Painter":           "artist",
+    "Subject of Painting":       "subject",
+    "Style":                     "style",
+    "Medium":                    "medium",
+    "Frame":                     "frame",
+    "Location":                  "location",
+    "Shipment":                  "shipment",
+    "Color Palette":             "color_palette",
+    "Copy or Original":          "copy_or_original",
+    "Print or Real":             "print_or_real",
+    "Recommended Environment":   "environment",
+    "Mood/Atmosphere":           "mood",
+    "Theme/Lighting Requirements": "lighting",
+    "Reproduction Type":         "reproduction_type",
+    "Target Audience":           "audience",
+}
+
+def _row(sample):
+    row = {col: sample.get(key, "") for col, key in COLUMNS.items()}
+    row["Delivery (days)"] = sample.get("delivery_days", np.nan)
     if "height_cm" in sample and "width_cm" in sample:
         h, w = sample["height_cm"], sample["width_cm"]
     else:
@@ -56,7 +244,94 @@ def predict_price(sample: dict) -> float:
     row["area_cm2"] = h * w if (h==h and w==w) else np.nan
     row["aspect_ratio"] = (h / w) if (h==h and w==w and w!=0) else np.nan
     row["artist_popularity"] = np.nan  # unknown at inference time
+    return row
+
+def predict_price_local(sample: dict) -> float:
+    return predict_price_versioned_local(sample)[0]
+
+def predict_price_versioned_local(sample: dict):
+    """predict_price_local, plus the sha256 of the artifact that produced it."""
+    model = _model()  # one consistent version for the whole call, even if a reload swaps it
+    row = _row(sample)
+    pred_log = None
+    if model.compiled is not None:
+        try:
+            pred_log = model.compiled.predict_one(row)
+        except price_compiled.Fallback:
+            pass  # e.g. a category the encoder rejects: let the pipeline raise as before
+    if pred_log is None:
+        import pandas as pd
+        pred_log = model.pipe.predict(pd.DataFrame([row]))[0]
+    return float(_from_log(pred_log) if model.log_target else pred_log), model.sha256
+
+
+# ---------- batches: one DataFrame, one pipeline call ----------
+
+def _parse_sizes(sizes):
+    """_parse_size over a whole column -> (height_cm, width_cm) float arrays."""
+    import pandas as pd
+    s = sizes.fillna("").astype(str).str.lower()
+    is_in = ~s.str.contains("cm", regex=False) & s.str.contains("in", regex=False)
+    for token in ("inches", "inch", "in", "centimeters", "centimeter", "cm", " "):
+        s = s.str.replace(token, "", regex=False)
+    parts = s.str.partition("x")
+    one_x = (s.str.count("x") == 1).to_numpy()
+    h = np.array(pd.to_numeric(parts[0], errors="coerce"), dtype=float)
+    w = np.array(pd.to_numeric(parts[2], errors="coerce"), dtype=float)
+    bad = ~one_x | np.isnan(h) | np.isnan(w)
+    h[bad] = np.nan; w[bad] = np.nan
+    factor = np.where(is_in.to_numpy(), CM_PER_INCH, 1.0)
+    return h * factor, w * factor
+
+def _frame(rows):
+    import pandas as pd
+    def column(key, default=None):
+        return pd.Series([r.get(key, default) for r in rows], dtype=object)
+
+    data = {col: column(key, "").fillna("") for col, key in COLUMNS.items()}
+    data["Delivery (days)"] = pd.to_numeric(column("delivery_days"), errors="coerce")
+
+    h, w = _parse_sizes(column("size"))
+    given = np.array(["height_cm" in r and "width_cm" in r for r in rows], dtype=bool)
+    if given.any():
+        h = np.where(given, pd.to_numeric(column("height_cm"), errors="coerce"), h)
+        w = np.where(given, pd.to_numeric(column("width_cm"), errors="coerce"), w)
+    data["height_cm"] = h
+    data["width_cm"] = w
+    data["area_cm2"] = h * w
+    with np.errstate(divide="ignore", invalid="ignore"):
+        data["aspect_ratio"] = np.where(w != 0, h / w, np.nan)
+    data["artist_popularity"] = np.full(len(rows), np.nan)  # unknown at inference time
+    return pd.DataFrame(data)
+
+def predict_prices(rows) -> list:
+    """predict_price for many samples at once (one DataFrame, one predict call)."""
+    rows = list(rows)
+    if not rows:
+        return []
+    if inference_client.is_enabled():
+        try:
+            return inference_client.predict_prices(rows)
+        except inference_client.InferenceUnavailable:
+            pass  # daemon down: predict here
+    return predict_prices_local(rows)
+
+def predict_prices_local(rows) -> list:
+    return predict_prices_versioned_local(rows)[0]
+
+def predict_prices_versioned(rows):
+    """predict_prices, plus the sha256 of the artifact that actually produced them."""
+    rows = list(rows)
+    if inference_client.is_enabled():
+        try:
+            return inference_client.predict_prices_versioned(rows)
+        except inference_client.InferenceUnavailable:
+            pass  # daemon down: predict here
+    return predict_prices_versioned_local(rows)
 
-    X = pd.DataFrame([row])
-    pred_log = _pipe.predict(X)[0]
-    return float(_from_log(pred_log) if _log_target else pred_log)
+def predict_prices_versioned_local(rows):
+    model = _model()
+    if not rows:
+        return [], model.sha256
+    pred = model.pipe.predict(_frame(rows))
+    return [float(v) for v in (_from_log(pred) if model.log_target else pred)], model.sha256
@@ -0,0 +1,152 @@
+"""
+Price sensitivity sweep: one base artwork, one or two fields varied.
+
+    POST /predict-price/sweep/
+    {"base": {<PriceForm fields>},
+     "vary": [{"field": "medium"},                          # every form choice
+              {"field": "size", "values": ["12x16in", "24x36in"]}]}
+
+grid() validates the request and builds the whole grid (plus the base
+row) as one list of samples; surface() scores it with a single
+price_ml.predict_prices call, i.e. one DataFrame and one pipeline predict,
+instead of one predict_price round trip per cell.
+Grids larger than PRICE_SWEEP_MAX_POINTS are refused, so one request
+can't hold a worker's model slot for long.
+
+Varied fields: any ChoiceField of PriceForm (values default to all of its
+choices), "size" (values default to the base size scaled by SIZE_FACTORS,
+or STANDARD_SIZES without one) and "delivery_days".
+"""
+import itertools
+
+from django import forms as django_forms
+from django.conf import settings
+
+from .forms import PriceForm
+from .price_ml import _parse_size, predict_prices
+from .utils import hex_to_palette
+
+SIZE_FACTORS = (0.5, 0.75, 1.0, 1.5, 2.0, 3.0)
+STANDARD_SIZES = ("8x10in", "11x14in", "16x20in", "18x24in", "24x36in", "30x40in", "36x48in", "48x60in")
+DELIVERY_DAYS = (1, 3, 7, 14, 30, 60)
+MAX_DIMENSIONS = 2
+
+
+class SweepError(ValueError):
+    """Bad sweep request (shown to the caller as-is, with a 400)."""
+
+
+def max_points():
+    return getattr(settings, "PRICE_SWEEP_MAX_POINTS", 400)
+
+
+def sweepable_fields():
+    fields = [name for name, field in PriceForm.base_fields.items()
+              if isinstance(field, django_forms.ChoiceField) and name != "unit"]
+    return fields + ["size", "delivery_days"]
+
+
+def base_sample(data):
+    """Validate the base payload like price_predict_view does -> sample dict."""
+    form = PriceForm(data)
+    if not form.is_valid():
+        raise SweepError({field: [str(e) for e in errors] for field, errors in form.errors.items()})
+    sample = dict(form.cleaned_data)
+    if not sample.get("color_palette") and sample.get("color_hex"):
+        sample["color_palette"] = hex_to_palette(sample["color_hex"])
+    if not sample.get("size") and sample.get("height") and sample.get("width"):
+        sample["size"] = f"{sample['height']:g}x{sample['width']:g}{sample.get('unit') or 'cm'}"
+    return sample
+
+
+def _size_values(base, values):
+    if values is None:
+        h, w = _parse_size(base.get("size"))
+        if h == h and w == w:
+            return [f"{h * f:g}x{w * f:g}cm" for f in SIZE_FACTORS]
+        return list(STANDARD_SIZES)
+    sizes = [str(v).strip() for v in values]
+    bad = [s for s in sizes if _parse_size(s)[0] != _parse_size(s)[0]]
+    if bad:
+        raise SweepError(f"Unreadable size(s) {bad}; use e.g. \"24x36in\" or \"60x90cm\".")
+    return sizes
+
+
+def dimension(spec, base):
+    """-> (field, values) for one "vary" entry."""
+    if isinstance(spec, str):
+        spec = {"field": spec}
+    if not isinstance(spec, dict) or "field" not in spec:
+        raise SweepError('Each "vary" entry needs a "field".')
+    field, values = spec["field"], spec.get("values")
+    if values is not None and (not isinstance(values, list) or not values):
+        raise SweepError(f'"values" for {field} must be a non-empty list.')
+    if values is not None and len(values) > max_points():
+        raise SweepError(f"Too many values for {field} (limit {max_points()} grid points).")
+
+    if field == "size":
+        return field, _size_values(base, values)
+    if field == "delivery_days":
+        try:
+            return field, [int(v) for v in values] if values is not None else list(DELIVERY_DAYS)
+        except (TypeError, ValueError):
+            raise SweepError("delivery_days values must be whole numbers.")
+
+    form_field = PriceForm.base_fields.get(field)
+    if field not in sweepable_fields() or form_field is None:
+        raise SweepError(f"Can't vary {field!r}; choose from {', '.join(sweepable_fields())}.")
+    choices = [value for value, _ in form_field.choices if value != ""]
+    if values is None:
+        return field, choices
+    unknown = [v for v in values if v not in choices]
+    if unknown:
+        raise SweepError(f"Unknown {field} value(s) {unknown}; choose from {choices}.")
+    return field, list(values)
+
+
+def grid(payload):
+    """Validate a request -> (axes, samples): samples[0] is the base, then the grid row-major."""
+    if not isinstance(payload, dict):
+        raise SweepError("Expected a JSON object.")
+    vary = payload.get("vary") or []
+    if not isinstance(vary, list) or not 1 <= len(vary) <= MAX_DIMENSIONS:
+        raise SweepError(f'"vary" must list 1 to {MAX_DIMENSIONS} fields.')
+
+    base = base_sample(payload.get("base") or {})
+    dims = [dimension(spec, base) for spec in vary]
+    fields = [field for field, _ in dims]
+    if len(set(fields)) != len(fields):
+        raise SweepError("Vary two different fields.")
+
+    n_points = 1
+    for _, values in dims:
+        n_points *= len(values)
+    if n_points > max_points():
+        raise SweepError(f"Grid of {n_points} points is over the limit of {max_points()}; send fewer values.")
+
+    samples = [base]
+    for combo in itertools.product(*(values for _, values in dims)):
+        sample = dict(base, **dict(zip(fields, combo)))
+        if "size" in fields:
+            sample.pop("height_cm", None)
+            sample.pop("width_cm", None)
+        samples.append(sample)
+    return dims, samples
+
+
+def surface(dims, samples):
+    """Score the grid in one predict_prices call -> the JSON-ready surface."""
+    prices = [round(p, 2) for p in predict_prices(samples)]
+    base_price, cells = prices[0], prices[1:]
+
+    out = {
+        "base_price": base_price,
+        "axes": [{"field": field, "values": values} for field, values in dims],
+        "points": len(cells),
+    }
+    if len(dims) == 1:
+        out["prices"] = cells
+    else:
+        width = len(dims[1][1])
+        out["prices"] = [cells[i:i + width] for i in range(0, len(cells), width)]  # [x][y]
+    return out
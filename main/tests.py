@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import TimeoutError
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+import torch
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from torch import nn
+
+from events.models import Event, Place
+from workshops.models import Workshop
+
+from . import (
+    benchmarking, feature_cache, http_client, identify_jobs, image_preprocess, inference_client, locks, ml_gate,
+    ml_model, model_registry, prediction_cache, price_cache, price_compiled, price_explain, price_ml, price_sweep,
+    upload_store, utils, weather_cache, weather_prefetch,
+)
+from .forms import PriceForm
+from .management.commands.finetune_artist_head import Command as FinetuneCommand
+from .ml_batching import MicroBatcher
+from .models import ArtistPrediction, IdentificationJob
+
+# both aliases per test process, so nothing leaks into var/cache
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-default"},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-shared"},
+}
+
+SAMPLE = {"artist": "Vincent", "style": "Modern", "medium": "Oil", "size": "50x60cm"}
+SHA = "a" * 64
+
+
+def fake_prices(rows):
+    """Additive stand-in for the price pipeline: 100 + 50 per artist + 10 per medium."""
+    return [100.0 + (50.0 if row.get("artist") else 0.0) + (10.0 if row.get("medium") else 0.0) for row in rows]
+
+
+def fake_prices_versioned(rows):
+    return fake_prices(rows), SHA
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+# ---------------------- ml_gate ----------------------
+
+class InferenceGateTests(SimpleTestCase):
+    def test_full_gate_rejects_with_retry_after(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=0, min_retry_after=3)
+        with gate.slot():
+            with self.assertRaises(ml_gate.Saturated) as caught:
+                gate.acquire()
+        self.assertEqual(caught.exception.retry_after, 3)
+        self.assertEqual(gate.stats()["rejected_queue_full"], 1)
+        self.assertEqual(gate.stats()["in_flight"], 0)
+
+    def test_queued_caller_times_out(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        with gate.slot():
+            with self.assertRaises(ml_gate.Saturated):
+                gate.acquire()
+        self.assertEqual(gate.stats()["rejected_timeout"], 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ML_GATE_ENABLED=True)
+class SaturatedViewTests(TestCase):
+    def test_explain_answers_503_when_the_gate_is_full(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=0, min_retry_after=2)
+        with mock.patch.object(ml_gate, "gate", gate), gate.slot():
+            response = self.client.post(
+                reverse("predict-price-explain"),
+                data=json.dumps({"sample": SAMPLE}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertEqual(response.json()["retry_after"], 2)
+
+    def test_price_page_answers_503_when_the_gate_is_full(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=0)
+        with mock.patch.object(ml_gate, "gate", gate), gate.slot(), \
+                mock.patch("main.views.predict_price") as predict:
+            response = self.client.post(reverse("predict-price"), SAMPLE)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+        predict.assert_not_called()
+
+    def test_slot_is_a_no_op_when_the_gate_is_disabled(self):
+        gate = ml_gate.InferenceGate(max_concurrent=1, max_queue=0)
+        with override_settings(ML_GATE_ENABLED=False), mock.patch.object(ml_gate, "gate", gate), gate.slot():
+            with ml_gate.slot():
+                pass
+
+
+# ---------------------- price_cache ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, PRICE_CACHE_ENABLED=True, INFERENCE_SOCKET=None)
+class PriceCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        price_cache.clear()
+
+    def test_key_ignores_number_spelling_but_not_the_version(self):
+        self.assertEqual(price_cache.key_for({"a": 1, "b": "x"}, "v" * 64), price_cache.key_for({"b": "x", "a": 1.0}, "v" * 64))
+        self.assertEqual(price_cache.key_for({"a": float("nan")}, "v" * 64), price_cache.key_for({"a": None}, "v" * 64))
+        self.assertNotEqual(price_cache.key_for({"a": 1}, "v" * 64), price_cache.key_for({"a": 1}, "w" * 64))
+
+    def test_key_uses_the_normalized_pipeline_row(self):
+        inches = price_ml._row(dict(SAMPLE, size="20x30in"))
+        spelled_out = price_ml._row(dict(SAMPLE, size="20 x 30 inches"))
+        self.assertEqual(price_cache.key_for(inches, "v" * 64), price_cache.key_for(spelled_out, "v" * 64))
+
+    def test_another_workers_entry_is_a_shared_hit(self):
+        key = price_cache.key_for(price_ml._row(SAMPLE), "v" * 64)
+        price_cache.put(key, 321.0)
+        price_cache.clear()  # a fresh process: empty LRU, same shared cache
+
+        self.assertEqual(caches["shared"].get(key), 321.0)
+        self.assertEqual(price_cache.get(key), 321.0)
+        self.assertEqual(price_cache.get(key), 321.0)
+        stats = price_cache.stats()
+        self.assertEqual((stats["shared_hits"], stats["local_hits"]), (1, 1))
+
+    def test_price_is_stored_under_the_model_that_scored_it(self):
+        old, new = "a" * 64, "b" * 64
+        with mock.patch.object(price_ml, "scoring_version", return_value=old), \
+                mock.patch.object(price_ml, "predict_price_versioned_local", return_value=(123.0, new)):
+            self.assertEqual(price_ml.predict_price(SAMPLE), 123.0)
+        row = price_ml._row(SAMPLE)
+        self.assertIsNone(price_cache.get(price_cache.key_for(row, old)))
+        self.assertEqual(price_cache.get(price_cache.key_for(row, new)), 123.0)
+
+        with mock.patch.object(price_ml, "scoring_version", return_value=new), \
+                mock.patch.object(price_ml, "predict_price_versioned_local") as scored:
+            self.assertEqual(price_ml.predict_price(SAMPLE), 123.0)
+        scored.assert_not_called()
+
+    def test_counters_are_kept_in_the_shared_cache(self):
+        price_cache.get(price_cache.key_for({"a": 1}, "v" * 64))
+        self.assertEqual(caches["shared"].get("price_cache:misses"), 1)
+        self.assertIsNone(caches["default"].get("price_cache:misses"))
+
+
+# ---------------------- price_explain ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, ML_GATE_ENABLED=True, INFERENCE_SOCKET=None,
+                   PRICE_EXPLAIN_CACHE_TTL=0, PRICE_EXPLAIN_BUDGET_MS=60000)
+class PriceExplainViewTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+
+    def _post(self, payload):
+        return self.client.post(reverse("predict-price-explain"), data=json.dumps(payload), content_type="application/json")
+
+    def test_shapley_contributions_add_up(self):
+        with mock.patch.object(price_ml, "predict_prices_versioned", side_effect=fake_prices_versioned):
+            response = self._post({"sample": SAMPLE, "method": "shapley", "samples": 8})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result["price"], result["baseline_price"]), (160.0, 100.0))
+        self.assertFalse(result["truncated"])
+        self.assertEqual(result["samples"], 8)
+        contributions = {c["feature"]: c["contribution"] for c in result["contributions"]}
+        self.assertEqual((contributions["artist"], contributions["medium"]), (50.0, 10.0))
+        self.assertAlmostEqual(sum(contributions.values()), result["price"] - result["baseline_price"])
+
+    def test_budget_stops_with_partial_results(self):
+        def slow(rows):
+            time.sleep(0.05)
+            return fake_prices_versioned(rows)
+
+        # no per-row timing from earlier requests: the first chunk is the calibration one
+        with override_settings(PRICE_EXPLAIN_BUDGET_MS=30), \
+                mock.patch.object(price_explain, "_row_ms", None), \
+                mock.patch.object(price_ml, "predict_prices_versioned", side_effect=slow):
+            result = self._post({"sample": SAMPLE, "method": "shapley", "samples": 64}).json()
+        self.assertTrue(result["truncated"])
+        self.assertLess(result["samples"], 64)
+
+    def test_result_is_cached_under_the_model_that_scored_it(self):
+        with override_settings(PRICE_EXPLAIN_CACHE_TTL=60), \
+                mock.patch.object(price_ml, "predict_prices_versioned", side_effect=fake_prices_versioned) as scored:
+            with mock.patch.object(price_ml, "scoring_version", return_value=None):
+                self.assertFalse(price_explain.explain(SAMPLE, "occlusion")["cached"])
+            with mock.patch.object(price_ml, "scoring_version", return_value="b" * 64):
+                self.assertFalse(price_explain.explain(SAMPLE, "occlusion")["cached"])
+            with mock.patch.object(price_ml, "scoring_version", return_value=SHA):
+                self.assertTrue(price_explain.explain(SAMPLE, "occlusion")["cached"])
+        self.assertEqual(scored.call_count, 2)
+
+    def test_result_is_not_cached_when_the_model_changes_between_chunks(self):
+        shas = iter(["b" * 64, SHA] * 64)
+
+        def reloading(rows):
+            return fake_prices(rows), next(shas)
+
+        with override_settings(PRICE_EXPLAIN_CACHE_TTL=60), \
+                mock.patch.object(price_explain, "_row_ms", None), \
+                mock.patch.object(price_ml, "scoring_version", return_value=SHA), \
+                mock.patch.object(price_ml, "predict_prices_versioned", side_effect=reloading):
+            price_explain.explain(SAMPLE, "shapley", samples=8)
+            self.assertFalse(price_explain.explain(SAMPLE, "shapley", samples=8)["cached"])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(reverse("predict-price-explain")).status_code, 405)
+        self.assertEqual(self._post({"sample": SAMPLE, "method": "magic"}).status_code, 400)
+        self.assertEqual(self._post({"sample": SAMPLE, "samples": 0}).status_code, 400)
+
+
+# ---------------------- image search ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, ML_GATE_ENABLED=False)
+class ImageSearchViewTests(TestCase):
+    def test_failure_is_logged_not_shown(self):
+        buf = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buf, "PNG")
+        upload = SimpleUploadedFile("query.png", buf.getvalue(), content_type="image/png")
+        with mock.patch("gallery.similarity.search_by_image", side_effect=RuntimeError("/srv/secret/path")), \
+                self.assertLogs("main.views", "ERROR"):
+            response = self.client.post(reverse("artwork_image_search"), {"image": upload})
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn("secret", response.content.decode())
+
+
+# ---------------------- inference_client ----------------------
+
+class FrameTests(SimpleTestCase):
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+        self.addCleanup(self.a.close)
+        self.addCleanup(self.b.close)
+
+    def test_round_trip(self):
+        for code, payload in [(inference_client.OP_PING, b""), (inference_client.OP_PREDICT_PRICE, b'{"artist": "Ava"}')]:
+            inference_client.write_frame(self.a, code, payload)
+            self.assertEqual(inference_client.read_frame(self.b), (code, payload))
+
+    def test_large_payload_round_trip(self):
+        payload = os.urandom(200 * 1024)  # bigger than the socket buffer: read while it's written
+        writer = threading.Thread(target=inference_client.write_frame, args=(self.a, inference_client.OK, payload))
+        writer.start()
+        self.assertEqual(inference_client.read_frame(self.b), (inference_client.OK, payload))
+        writer.join()
+
+    def test_bad_header_is_a_protocol_error(self):
+        self.a.sendall(b"XX" + bytes(6))
+        with self.assertRaises(inference_client.ProtocolError):
+            inference_client.read_frame(self.b)
+
+    def test_eof_mid_frame_is_a_connection_error(self):
+        self.a.sendall(inference_client.HEADER.pack(inference_client.MAGIC, inference_client.VERSION, 0, 10) + b"abc")
+        self.a.close()
+        with self.assertRaises(ConnectionError):
+            inference_client.read_frame(self.b)
+
+
+class InferenceClientTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.path = os.path.join(self.dir, "inference.sock")
+        self.enterContext(override_settings(INFERENCE_SOCKET=self.path, INFERENCE_TIMEOUT=0.1, INFERENCE_RETRY_INTERVAL=7))
+        self.enterContext(mock.patch.object(inference_client, "_down_until", 0.0))
+        inference_client._drop_connection()
+        self.addCleanup(inference_client._drop_connection)
+
+    def _server(self, listen=True):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        if listen:
+            server.listen(1)
+        self.addCleanup(server.close)
+        return server
+
+    def test_timeout_is_busy_not_down(self):
+        self._server()  # accepts (backlog) but never answers
+        with self.assertRaises(ml_gate.Saturated) as caught:
+            inference_client.ping()
+        self.assertEqual(caught.exception.retry_after, 7)
+        self.assertFalse(inference_client.status()["marked_down"])
+
+    def test_refused_connection_marks_the_daemon_down(self):
+        self._server(listen=False)
+        with self.assertRaises(inference_client.InferenceUnavailable):
+            inference_client.ping()
+        self.assertTrue(inference_client.status()["marked_down"])
+        with mock.patch.object(inference_client, "_connect") as connect:
+            with self.assertRaises(inference_client.InferenceUnavailable):
+                inference_client.ping()
+        connect.assert_not_called()
+
+    def test_missing_socket_marks_the_daemon_down(self):
+        with self.assertRaises(inference_client.InferenceUnavailable):
+            inference_client.ping()
+        self.assertTrue(inference_client.status()["marked_down"])
+
+
+# ---------------------- model_registry ----------------------
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(
+            MODEL_REGISTRY_DIR=self.root, MODEL_REGISTRY_POLL_INTERVAL=0, MODEL_REGISTRY_RETRY_MAX=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # a private watcher table, so the real artist/price models are never reloaded
+        for name in ("_watchers", "_seen", "_failures"):
+            patcher = mock.patch.dict(getattr(model_registry, name), clear=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name, value in (("_manifest_cache", None), ("_next_check", 0.0), ("_reloading", set())):
+            patcher = mock.patch.object(model_registry, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _file(self, content):
+        path = os.path.join(self.root, f"src-{content}.joblib")
+        with open(path, "wb") as f:
+            f.write(content.encode())
+        return path
+
+    def _poll_and_wait(self):
+        model_registry.poll()
+        wait_until(lambda: not model_registry._reloading)
+
+    def test_publish_activates_the_first_version_only(self):
+        first = model_registry.publish("price", self._file("one"), version="v1")
+        model_registry.publish("price", self._file("two"), version="v2")
+        self.assertEqual(model_registry.resolve("price").version, "v1")
+        self.assertEqual(model_registry.resolve("price").sha256, first.sha256)
+        self.assertTrue(model_registry.is_managed(first.path))
+        with self.assertRaises(model_registry.RegistryError):
+            model_registry.publish("price", self._file("three"), version="v1")
+
+    def test_activate_checks_the_version(self):
+        model_registry.publish("price", self._file("one"), version="v1")
+        model_registry.publish("price", self._file("two"), version="v2")
+        self.assertEqual(model_registry.activate("price", "v2").version, "v2")
+        with self.assertRaises(model_registry.RegistryError):
+            model_registry.activate("price", "v9")
+
+    def test_poll_reloads_watchers_on_a_new_active_version(self):
+        model_registry.publish("price", self._file("one"), version="v1")
+        seen = []
+        model_registry.watch("price", seen.append)
+        self._poll_and_wait()
+        self.assertEqual(seen, [])
+
+        model_registry.publish("price", self._file("two"), version="v2", activate=True)
+        self._poll_and_wait()
+        self.assertEqual([a.version for a in seen], ["v2"])
+        self.assertEqual(model_registry.status()["models"]["price"]["loaded"], "v2")
+
+    def test_failed_reload_is_retried(self):
+        model_registry.publish("price", self._file("one"), version="v1")
+        calls = []
+
+        def flaky(artifact):
+            calls.append(artifact.version)
+            if len(calls) == 1:
+                raise OSError("file still being copied")
+
+        model_registry.watch("price", flaky)
+        model_registry.publish("price", self._file("two"), version="v2", activate=True)
+        self._poll_and_wait()
+        self.assertEqual(model_registry.status()["models"]["price"]["loaded"], "v1")
+        self.assertEqual(model_registry.status()["models"]["price"]["failed_reloads"], 1)
+
+        self._poll_and_wait()
+        self.assertEqual(calls, ["v2", "v2"])
+        self.assertEqual(model_registry.status()["models"]["price"]["loaded"], "v2")
+        self.assertEqual(model_registry.status()["models"]["price"]["failed_reloads"], 0)
+
+    def test_concurrent_publishers_take_turns(self):
+        files = [self._file(str(i)) for i in range(4)]
+        threads = [
+            threading.Thread(target=model_registry.publish, args=("price", path), kwargs={"version": f"v{i}"})
+            for i, path in enumerate(files)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            sorted(model_registry.read_manifest()["artifacts"]["price"]["versions"]), ["v0", "v1", "v2", "v3"],
+        )
+
+
+class LockTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.enterContext(override_settings(LOCK_DIR=self.dir))
+
+    def test_second_holder_is_refused_without_blocking(self):
+        with locks.held("job") as first:
+            with locks.held("job") as second:
+                self.assertEqual((first, second), (True, False))
+        with locks.held("job") as again:
+            self.assertTrue(again)
+
+    def test_blocking_waits_for_the_holder(self):
+        order = []
+
+        def waiter():
+            with locks.held("job", blocking=True) as acquired:
+                order.append(("waiter", acquired))
+
+        with locks.held("job"):
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            thread.join(0.1)
+            order.append(("holder", True))
+        thread.join()
+        self.assertEqual(order, [("holder", True), ("waiter", True)])
+
+
+# ---------------------- ml_model ----------------------
+
+class ArtistModelManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = ml_model.ArtistModelManager("artist_model.pth", device="cpu")
+        loaded = (object(), ["Ava", "Noah"], "compiled", "cuda:0")
+        self.enterContext(mock.patch.object(self.manager, "_load_backend", return_value=loaded))
+        self.enterContext(mock.patch.object(model_registry, "poll"))
+
+    def test_unload_forgets_everything_the_load_set(self):
+        self.manager.get()
+        self.assertEqual((self.manager.status()["active_backend"], self.manager.input_device), ("compiled", "cuda:0"))
+
+        self.manager._unload()
+        status = self.manager.status()
+        self.assertFalse(status["ready"])
+        self.assertEqual((status["active_backend"], status["classes"], status["unload_count"]), (None, None, 1))
+        self.assertEqual(self.manager.input_device, "cpu")
+
+
+# ---------------------- ml_batching ----------------------
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_each_caller_gets_its_own_result(self):
+        batcher = MicroBatcher(lambda items: [item * 10 for item in items], max_batch_size=4, max_wait_ms=20)
+        results = {}
+
+        def call(n):
+            results[n] = batcher.submit(n, timeout=5)
+
+        threads = [threading.Thread(target=call, args=(n,)) for n in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, {n: n * 10 for n in range(12)})
+        self.assertLessEqual(batcher.stats()["largest_batch"], 4)
+
+    def test_wrong_result_count_fails_every_caller(self):
+        batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=2, max_wait_ms=50)
+        futures = [batcher.submit_async(n) for n in range(2)]
+        for fut in futures:
+            with self.assertRaises(RuntimeError):
+                fut.result(timeout=5)
+
+    def test_caller_stops_waiting_after_timeout(self):
+        release = threading.Event()
+
+        def slow(items):
+            release.wait(5)
+            return items
+
+        batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0)
+        try:
+            with self.assertRaises(TimeoutError):
+                batcher.submit("a", timeout=0.05)
+        finally:
+            release.set()
+        self.assertEqual(batcher.submit("b", timeout=5), "b")  # the worker survived
+
+
+# ---------------------- prediction_cache ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, ARTIST_PREDICTION_CACHE_MAX_ENTRIES=2, ARTIST_PREDICTION_CACHE_EVICT_EVERY=3)
+class PredictionCacheTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        self.enterContext(mock.patch.object(prediction_cache, "_stores_since_evict", 0))
+
+    def _put(self, name):
+        prediction_cache.put(name, "v1", {"top": name})
+
+    def test_trim_runs_every_nth_store_and_keeps_recently_used_rows(self):
+        self._put("a")
+        self._put("b")
+        self.assertEqual(prediction_cache.get("a", "v1"), {"top": "a"})  # "b" is now the least recently used
+        self._put("c")  # third store: trimmed back to the max
+        self.assertEqual(sorted(ArtistPrediction.objects.values_list("content_hash", flat=True)), ["a", "c"])
+
+        self._put("d")
+        self._put("e")
+        self.assertEqual(ArtistPrediction.objects.count(), 4)  # over the max until the next trim
+        self.assertEqual(prediction_cache.evict(), 2)
+        self.assertEqual(prediction_cache.stats()["evictions"], 3)
+
+    def test_counters_are_shared_between_workers(self):
+        self._put("a")
+        prediction_cache.get("a", "v1")
+        prediction_cache.get("b", "v1")
+        self.assertEqual(caches["shared"].get("artist_prediction_cache:hits"), 1)
+        stats = prediction_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["stores"], stats["hit_ratio"]), (1, 1, 1, 0.5))
+
+    def test_other_versions_are_purged(self):
+        self._put("a")
+        prediction_cache.put("a", "v2", {"top": "a"})
+        self.assertEqual(prediction_cache.purge_other_versions("v2"), 1)
+        self.assertIsNone(prediction_cache.get("a", "v1"))
+        self.assertEqual(prediction_cache.stats()["invalidations"], 1)
+
+
+# ---------------------- upload_store ----------------------
+
+class UploadPreviewTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media, ARTIST_UPLOAD_PREVIEW_CLEANUP_INTERVAL=3600))
+        self.enterContext(mock.patch.object(upload_store, "_last_cleanup", time.monotonic()))
+        self.dir = os.path.join(media, upload_store.SUBDIR)
+
+    def _save(self, content, name="art.JPG"):
+        digest = hashlib.sha256(content).hexdigest()
+        return digest, upload_store.save_preview(SimpleUploadedFile(name, content), digest)
+
+    def _touch(self, name, age):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(b"x")
+        os.utime(path, (time.time() - age, time.time() - age))
+        return name
+
+    def test_same_image_is_stored_once_under_its_hash(self):
+        digest, url = self._save(b"pixels")
+        self.assertEqual(url, f"{settings.MEDIA_URL}uploads/{digest}.jpg")
+        self.assertEqual(self._save(b"pixels")[1], url)
+        self.assertEqual(os.listdir(self.dir), [f"{digest}.jpg"])
+
+    def test_concurrent_writes_leave_whole_files_and_no_temp_files(self):
+        contents = [bytes([n]) * 200_000 for n in range(6)]
+        threads = [threading.Thread(target=self._save, args=(c,)) for c in contents * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(os.listdir(self.dir)), 6)
+        for content in contents:
+            with open(os.path.join(self.dir, hashlib.sha256(content).hexdigest() + ".jpg"), "rb") as f:
+                self.assertEqual(f.read(), content)
+
+    def test_trim_spares_referenced_and_foreign_files(self):
+        os.makedirs(self.dir)
+        oldest, referenced, old, newest = (self._touch(f"{n:064x}.png", age) for n, age in enumerate((400, 300, 200, 100)))
+        IdentificationJob.objects.create(content_hash="0" * 64, image_url=f"{settings.MEDIA_URL}uploads/{referenced}")
+        foreign = self._touch("README.txt", 500)
+        self._touch(f"{oldest}.abc123.tmp", 2 * upload_store.STALE_TMP_SECONDS)  # left by a crashed write
+        fresh_tmp = self._touch(f"{newest}.def456.tmp", 0)  # a write in progress
+
+        self.assertEqual(upload_store.cleanup(limit=2), 2)
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted([foreign, referenced, newest, fresh_tmp]))
+
+
+# ---------------------- image_preprocess ----------------------
+
+def image_bytes(size, fmt, seed=0):
+    """Encoded test image: smooth gradients plus noise, close to a photo for the resampling filters."""
+    width, height = size
+    ramp = np.add.outer(np.linspace(0, 180, height), np.linspace(0, 60, width))
+    pixels = np.stack([ramp, ramp[::-1], ramp[:, ::-1]], axis=-1)
+    pixels += np.random.default_rng(seed).normal(0, 8, pixels.shape)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, fmt, **({"quality": 95} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+class PreprocessParityTests(SimpleTestCase):
+    def _reference(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            return ml_model.legacy_preprocess()(img.convert("RGB"))
+
+    def test_matches_the_training_transform(self):
+        for size in ((640, 480), (300, 900), (256, 256)):
+            data = image_bytes(size, "PNG")
+            fast = image_preprocess.preprocess(data)
+            self.assertEqual(tuple(fast.shape), (3, 224, 224))
+            np.testing.assert_allclose(fast.numpy(), self._reference(data).numpy(), atol=1e-5)
+
+    def test_reduced_jpeg_decode_stays_close_to_the_full_decode(self):
+        data = image_bytes((2048, 2048), "JPEG")
+        with image_preprocess.open_bounded(data) as img:
+            self.assertEqual(img.size, (256, 256))  # decoded at 1/8 scale
+        fast = image_preprocess.preprocess(data).numpy()
+        self.assertLess(np.abs(fast - self._reference(data).numpy()).mean(), 0.05)
+
+    def test_writes_into_a_batch_slot(self):
+        batch = torch.zeros((2, 3, 224, 224))
+        image_preprocess.preprocess(image_bytes((400, 400), "PNG"), out=batch[1])
+        self.assertEqual(float(batch[0].abs().sum()), 0.0)
+        self.assertGreater(float(batch[1].abs().sum()), 0.0)
+
+    def test_pixel_cap_is_checked_before_decoding(self):
+        data = image_bytes((1000, 1000), "PNG")
+        with mock.patch.object(Image.Image, "load") as load:
+            with self.assertRaises(image_preprocess.ImageTooLarge):
+                image_preprocess.preprocess(data, max_pixels=999_999)
+        load.assert_not_called()
+
+
+# ---------------------- benchmarking ----------------------
+
+class BenchmarkingHelperTests(SimpleTestCase):
+    def test_percentiles(self):
+        stats = benchmarking.percentiles([float(n) for n in range(1, 101)])
+        self.assertEqual((stats["count"], stats["p50_ms"], stats["p99_ms"], stats["max_ms"]), (100, 51.0, 99.0, 100.0))
+        self.assertEqual(benchmarking.percentiles([]), {})
+
+    def test_run_concurrent_makes_every_call(self):
+        seen = []
+        result = benchmarking.run_concurrent(seen.append, ["a", "b", "c"], concurrency=4, total=10)
+        self.assertEqual(sorted(seen), ["a"] * 4 + ["b"] * 3 + ["c"] * 3)
+        self.assertEqual((result["requests"], result["count"], result["concurrency"]), (10, 10, 4))
+
+    def test_synthetic_image_has_the_requested_size(self):
+        with Image.open(io.BytesIO(benchmarking.synthetic_image(320, 200))) as img:
+            self.assertEqual((img.format, img.size), ("JPEG", (320, 200)))
+
+    def test_synthetic_price_rows_are_valid_form_submissions(self):
+        rows = benchmarking.synthetic_price_rows(50)
+        self.assertEqual(rows, benchmarking.synthetic_price_rows(50))  # same seed, same rows
+        for row in rows:
+            form = PriceForm(row)
+            self.assertTrue(form.is_valid(), form.errors)
+
+
+# ---------------------- finetune_artist_head ----------------------
+
+class FeatureCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def _rows(self, n, start=0):
+        return np.arange(start, start + n, dtype=np.float32)[:, None] * np.ones((1, feature_cache.FEATURE_DIM), np.float32)
+
+    def _open(self):
+        return feature_cache.FeatureCache("backbone", root=self.root)
+
+    def test_rows_survive_a_reopen(self):
+        cache = self._open()
+        cache.add(["a", "b"], self._rows(2))
+        cache.add(["file:/art/c.jpg|10|1"], self._rows(1, start=2))
+        cache = self._open()
+        self.assertEqual(cache.keys, ["a", "b", "file:/art/c.jpg|10|1"])
+        self.assertEqual(cache.missing(["a", "d"]), ["d"])
+        np.testing.assert_array_equal(cache.vectors()[cache.rows_for(["b"])], self._rows(1, start=1))
+
+    def test_rows_without_keys_are_cut_off(self):
+        cache = self._open()
+        cache.add(["a"], self._rows(1))
+        with open(cache.data_path, "ab") as f:  # crash after the rows, before the keys
+            f.write(self._rows(2, start=1).tobytes())
+        cache = self._open()
+        self.assertEqual(cache.keys, ["a"])
+        self.assertEqual(os.path.getsize(cache.data_path), feature_cache.FEATURE_DIM * 4)
+        cache.add(["b"], self._rows(1, start=5))
+        np.testing.assert_array_equal(self._open().vectors()[1], self._rows(1, start=5)[0])
+
+    def test_half_written_key_line_is_cut_off(self):
+        cache = self._open()
+        cache.add(["a", "b"], self._rows(2))
+        with open(cache.keys_path, "a") as f:
+            f.write('"c')
+        self.assertEqual(self._open().keys, ["a", "b"])
+        with open(cache.keys_path) as f:
+            self.assertEqual(f.read(), '"a"\n"b"\n')
+
+    def test_keys_without_rows_are_dropped(self):
+        cache = self._open()
+        cache.add(["a", "b"], self._rows(2))
+        with open(cache.data_path, "r+b") as f:
+            f.truncate(feature_cache.FEATURE_DIM * 4 + 10)
+        cache = self._open()
+        self.assertEqual(cache.keys, ["a"])
+        self.assertEqual(os.path.getsize(cache.data_path), feature_cache.FEATURE_DIM * 4)
+
+    def test_fingerprint_ignores_the_head(self):
+        model = nn.Sequential()
+        model.add_module("body", nn.Linear(4, 4))
+        model.add_module("fc", nn.Linear(4, 2))
+        before = feature_cache.backbone_fingerprint(model)
+        with torch.no_grad():
+            model.fc.weight.add_(1.0)
+        self.assertEqual(feature_cache.backbone_fingerprint(model), before)
+        with torch.no_grad():
+            model.body.weight.add_(1.0)
+        self.assertNotEqual(feature_cache.backbone_fingerprint(model), before)
+
+
+class FinetuneHeadTests(SimpleTestCase):
+    OPTS = {"seed": 0, "val": 0.2, "lr": 0.05, "weight_decay": 1e-4, "epochs": 30, "batch_size": 32}
+
+    def test_new_artist_is_learned_and_absent_ones_are_kept(self):
+        rng = np.random.default_rng(0)
+        centers = np.eye(8, dtype=np.float32) * 4
+        labels = np.repeat([0, 2], 40)  # images of the old "Ava" (0) and the new "Noah" (2), none of "Liam" (1)
+        vectors = centers[labels] + rng.normal(0, 0.3, (len(labels), 8)).astype(np.float32)
+        old_fc = nn.Linear(8, 2)
+
+        fc, stats = FinetuneCommand(stdout=io.StringIO())._train(
+            old_fc, vectors, np.arange(len(labels)), labels, ["Ava", "Liam"], ["Ava", "Liam", "Noah"], dict(self.OPTS),
+        )
+
+        self.assertEqual(fc.out_features, 3)
+        self.assertEqual(stats["val_images"], 16)
+        self.assertGreaterEqual(stats["val_top1"], 0.9)
+        self.assertTrue(torch.equal(fc.weight[1], old_fc.weight[1]))
+        self.assertTrue(torch.equal(fc.bias[1], old_fc.bias[1]))
+
+
+# ---------------------- identify_jobs ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, ML_GATE_ENABLED=False, ARTIST_UPLOAD_KEEP_PREVIEW=False,
+                   ARTIST_JOB_BUSY_RETRIES=1)
+class IdentificationJobTests(TestCase):
+    RESULT = {"top": {"artist": "Ava", "confidence": 0.9}, "top3": []}
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(identify_jobs, "close_old_connections"))  # keep the test transaction
+        self.enterContext(mock.patch.object(identify_jobs, "_last_sweep", time.monotonic()))
+        self.enterContext(mock.patch.object(identify_jobs, "_pending", 0))  # on_commit never runs in a TestCase
+        self.enterContext(mock.patch.object(prediction_cache, "model_version", return_value="v1"))
+        self.enterContext(mock.patch.object(time, "sleep"))
+
+    def _upload(self, content=b"image bytes"):
+        return SimpleUploadedFile("art.jpg", content, content_type="image/jpeg")
+
+    def _submit_and_run(self, **predict):
+        job = identify_jobs.submit(self._upload())
+        self.assertEqual(job.status, "queued")
+        with mock.patch("main.ml_model.predict_image", **predict):
+            identify_jobs._run(job.id, job.content_hash, b"image bytes")
+        job.refresh_from_db()
+        return job
+
+    def test_job_runs_and_feeds_the_cache(self):
+        job = self._submit_and_run(return_value=self.RESULT)
+        self.assertEqual((job.status, job.result), ("done", self.RESULT))
+        self.assertEqual(prediction_cache.get(job.content_hash, "v1"), self.RESULT)
+
+        again = identify_jobs.submit(self._upload())  # answered from the cache, nothing queued
+        self.assertEqual((again.status, again.result), ("done", self.RESULT))
+
+    def test_busy_model_is_retried_then_reported(self):
+        job = self._submit_and_run(side_effect=ml_gate.Saturated("queue full", 1))
+        self.assertEqual(job.status, "busy")
+
+        job = self._submit_and_run(side_effect=[ml_gate.Saturated("queue full", 1), self.RESULT])
+        self.assertEqual(job.status, "done")
+
+    def test_full_queue_is_refused(self):
+        with override_settings(ARTIST_JOB_MAX_PENDING=0):
+            with self.assertRaises(ml_gate.Saturated):
+                identify_jobs.submit(self._upload(b"other bytes"))
+        self.assertFalse(IdentificationJob.objects.exists())
+
+    def test_abandoned_jobs_expire_and_old_ones_are_deleted(self):
+        now = timezone.now()
+        stuck = IdentificationJob.objects.create(content_hash="a" * 64, status="running")
+        old = IdentificationJob.objects.create(content_hash="b" * 64, status="done")
+        IdentificationJob.objects.filter(id=stuck.id).update(created_at=now - timedelta(minutes=10))
+        IdentificationJob.objects.filter(id=old.id).update(created_at=now - timedelta(hours=2))
+
+        self.assertEqual(identify_jobs.expire_stale(now), (1, 1))
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, "expired")
+        self.assertFalse(IdentificationJob.objects.filter(id=old.id).exists())
+
+
+# ---------------------- price_batch ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, ML_GATE_ENABLED=True, INFERENCE_SOCKET=None)
+class PriceBatchViewTests(TestCase):
+    def _post(self, text, name="artworks.csv"):
+        return self.client.post(reverse("predict-price-batch"), {"file": SimpleUploadedFile(name, text.encode())})
+
+    def test_csv_comes_back_priced_with_per_row_errors(self):
+        def prices(samples):
+            if any(s["artist"] == "Nobody" for s in samples):
+                raise ValueError("unknown artist")
+            return fake_prices(samples)
+
+        text = "artist,medium\nVincent,Oil\n,\nNobody,Oil\nAva,\n"
+        with mock.patch("main.price_batch.predict_prices", side_effect=prices):
+            response = self._post(text)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('filename="artworks_priced.csv"', response["Content-Disposition"])
+        self.assertEqual(ml_gate.gate.stats()["in_flight"], 0)  # released before the body is sent
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ["artist", "medium", "Predicted price", "Price error"],
+            ["Vincent", "Oil", "160.0", ""],
+            ["", "", "", ""],
+            ["Nobody", "Oil", "", "unknown artist"],
+            ["Ava", "", "150.0", ""],
+        ])
+
+    def test_sheet_without_an_artist_column_is_rejected(self):
+        with mock.patch("main.price_batch.predict_prices") as prices:
+            response = self._post("style,medium\nAbstract,Oil\n")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "No artist column")
+        prices.assert_not_called()
+
+
+# ---------------------- price_compiled ----------------------
+
+def fitted_pipeline(estimator, handle_unknown="ignore", n=300, seed=0):
+    """Small price-like pipeline fitted on random rows: categories + numbers with gaps."""
+    import pandas as pd
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "Artist": rng.choice(["Ava", "Noah", "Liam"], n),
+        "Medium": rng.choice(["Oil", "Ink", ""], n),
+        "Height": np.where(rng.random(n) < 0.1, np.nan, rng.uniform(10, 120, n)),
+        "Delivery": rng.integers(1, 30, n).astype(float),
+    })
+    target = np.log1p(frame["Height"].fillna(50) * 10 + (frame["Artist"] == "Ava") * 300)
+    pipe = Pipeline([
+        ("prep", ColumnTransformer([
+            ("cat", OneHotEncoder(handle_unknown=handle_unknown), ["Artist", "Medium"]),
+            ("num", Pipeline([("impute", SimpleImputer(strategy="median")), ("scale", StandardScaler())]), ["Height"]),
+            ("days", SimpleImputer(), ["Delivery"]),
+        ])),
+        ("model", estimator),
+    ])
+    return pipe.fit(frame, target)
+
+
+class CompiledPipelineTests(SimpleTestCase):
+    def test_matches_the_pipeline_for_a_forest(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        pipe = fitted_pipeline(RandomForestRegressor(n_estimators=8, random_state=0))
+        compiled = price_compiled.compile_pipeline(pipe)
+        self.assertLess(price_compiled.self_check(pipe, compiled), 1e-9)
+
+    def test_matches_the_pipeline_for_a_linear_model(self):
+        from sklearn.linear_model import Ridge
+
+        pipe = fitted_pipeline(Ridge())
+        self.assertLess(price_compiled.self_check(pipe, price_compiled.compile_pipeline(pipe)), 1e-9)
+
+    def test_unseen_category_falls_back_when_the_encoder_rejects_it(self):
+        from sklearn.linear_model import Ridge
+
+        compiled = price_compiled.compile_pipeline(fitted_pipeline(Ridge(), handle_unknown="error"))
+        row = {"Artist": "Ava", "Medium": "Oil", "Height": 40.0, "Delivery": 3.0}
+        compiled.predict_one(row)
+        with self.assertRaises(price_compiled.Fallback):
+            compiled.predict_one(dict(row, Artist="Nobody"))
+
+    def test_self_check_notices_a_wrong_compilation(self):
+        from sklearn.linear_model import Ridge
+
+        pipe = fitted_pipeline(Ridge())
+        compiled = price_compiled.compile_pipeline(pipe)
+        compiled.post.append(lambda x: [v * 1.01 for v in x])
+        self.assertGreater(price_compiled.self_check(pipe, compiled), 1e-3)
+
+    def test_unknown_steps_are_not_compiled(self):
+        from sklearn.linear_model import Ridge
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import PolynomialFeatures
+
+        with self.assertRaises(price_compiled.Unsupported):
+            price_compiled.compile_pipeline(Pipeline([("poly", PolynomialFeatures()), ("model", Ridge())]))
+
+
+# ---------------------- price_sweep ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, ML_GATE_ENABLED=True, INFERENCE_SOCKET=None)
+class PriceSweepViewTests(TestCase):
+    def _post(self, payload):
+        return self.client.post(reverse("predict-price-sweep"), data=json.dumps(payload), content_type="application/json")
+
+    def test_two_field_grid_is_scored_in_one_call(self):
+        vary = [{"field": "artist", "values": ["Ava", "Noah"]}, {"field": "medium", "values": ["Oil", "Ink", "Acrylic"]}]
+        with mock.patch("main.price_sweep.predict_prices", side_effect=fake_prices) as scored:
+            response = self._post({"base": dict(SAMPLE, medium=""), "vary": vary})
+        self.assertEqual(response.status_code, 200)
+        scored.assert_called_once()
+        result = response.json()
+        self.assertEqual((result["base_price"], result["points"]), (150.0, 6))
+        self.assertEqual(result["prices"], [[160.0] * 3, [160.0] * 3])
+        self.assertEqual([axis["values"] for axis in result["axes"]], [["Ava", "Noah"], ["Oil", "Ink", "Acrylic"]])
+
+    def test_size_defaults_to_scaled_base_sizes(self):
+        dims, samples = price_sweep.grid({"base": SAMPLE, "vary": ["size"]})
+        self.assertEqual(dims, [("size", [f"{50 * f:g}x{60 * f:g}cm" for f in price_sweep.SIZE_FACTORS])])
+        self.assertEqual(len(samples), len(price_sweep.SIZE_FACTORS) + 1)
+
+    def test_bad_requests_are_refused_before_scoring(self):
+        bad = [
+            {"base": SAMPLE, "vary": []},
+            {"base": SAMPLE, "vary": ["medium", "medium"]},
+            {"base": SAMPLE, "vary": [{"field": "medium", "values": ["Gold leaf"]}]},
+            {"base": SAMPLE, "vary": [{"field": "size", "values": ["huge"]}]},
+            {"base": SAMPLE, "vary": ["color_hex"]},
+            {"base": {"style": "Modern"}, "vary": ["medium"]},
+        ]
+        with mock.patch("main.price_sweep.predict_prices") as scored:
+            for payload in bad:
+                self.assertEqual(self._post(payload).status_code, 400, payload)
+            with override_settings(PRICE_SWEEP_MAX_POINTS=4):
+                self.assertEqual(self._post({"base": SAMPLE, "vary": ["medium"]}).status_code, 400)
+        scored.assert_not_called()
+
+
+# ---------------------- http_client ----------------------
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503, or stalls past the read timeout on /slow; counts requests per method."""
+
+    def _answer(self):
+        self.server.seen.append(self.command)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.path == "/slow":
+            time.sleep(0.3)
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(HTTP_RETRIES=2, HTTP_BACKOFF=0)
+class HttpClientRetryTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        http_client.close_all()
+        self.addCleanup(http_client.close_all)
+
+    def test_get_is_retried_on_5xx(self):
+        self.assertEqual(http_client.get(self.url + "/", timeout=2).status_code, 503)
+        self.assertEqual(self.server.seen, ["GET"] * 3)
+
+    def test_post_is_never_sent_twice(self):
+        self.assertEqual(http_client.post(self.url + "/", data=b"image", timeout=2).status_code, 503)
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            http_client.post(self.url + "/slow", data=b"image", timeout=0.1)
+        self.assertEqual(self.server.seen, ["POST", "POST"])
+
+    def test_number_timeout_keeps_the_connect_timeout(self):
+        with override_settings(HTTP_CONNECT_TIMEOUT=1.5):
+            self.assertEqual(http_client._timeout(7), (1.5, 7))
+            self.assertEqual(http_client._timeout(None)[0], 1.5)
+
+
+# ---------------------- weather_cache ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, WEATHER_CACHE_TTL=60, WEATHER_FAILURE_BACKOFF=30)
+class WeatherCacheTests(SimpleTestCase):
+    LOCATION = {"lat": 48.85, "lon": 2.35, "name": "Paris"}
+
+    def setUp(self):
+        caches["shared"].clear()
+
+    def test_fresh_entry_skips_upstream(self):
+        weather_cache.store(48.85, 2.35, {"temp": 20})
+        fetch = mock.Mock()
+        result = weather_cache.weather_at(self.LOCATION, fetch)
+        self.assertEqual((result["temp"], result["stale"], result["city"]), (20, False, "Paris"))
+        fetch.assert_not_called()
+
+    def test_last_known_value_is_served_when_upstream_fails(self):
+        weather_cache.store(48.85, 2.35, {"temp": 18}, fetched_at=time.time() - 120)
+        fetch = mock.Mock(side_effect=requests.ConnectionError("down"))
+
+        result = weather_cache.weather_at(self.LOCATION, fetch)
+        self.assertEqual((result["temp"], result["stale"]), (18, True))
+
+        # within WEATHER_FAILURE_BACKOFF nobody asks upstream again
+        result = weather_cache.weather_at(self.LOCATION, fetch)
+        self.assertTrue(result["stale"])
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_failure_without_a_cached_value_is_an_error(self):
+        fetch = mock.Mock(side_effect=requests.ConnectionError("down"))
+        self.assertEqual(weather_cache.weather_at(self.LOCATION, fetch), {"error": "Weather service unreachable."})
+
+    def test_single_flight_waiters_get_the_leaders_exception(self):
+        release = threading.Event()
+        errors = []
+
+        def leader_fn():
+            release.wait(5)
+            raise KeyError("boom")
+
+        def call():
+            try:
+                weather_cache._single_flight("k", leader_fn)
+            except KeyError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for t in threads:
+            t.start()
+        wait_until(lambda: "k" in weather_cache._flights)
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(weather_cache._flights, {})
+
+
+# ---------------------- place weather ----------------------
+
+@override_settings(CACHES=LOCMEM_CACHES, PLACE_GEOCODE_ON_SAVE=False)
+class PlaceWeatherTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+
+    def test_city_known_to_be_unknown_is_not_geocoded_again(self):
+        place = Place.objects.create(name="Nowhere Hall", city="Atlantis", geocoded_city="Atlantis")
+        with mock.patch.object(utils, "geocode_city") as geocode:
+            self.assertEqual(utils.get_weather_for_place(place), {"error": "Could not locate city."})
+        geocode.assert_not_called()
+
+    def test_temporary_flag_stays_internal(self):
+        place = Place.objects.create(name="Hall", city="Paris")
+        with mock.patch.object(utils, "geocode_city", side_effect=requests.ConnectionError("down")):
+            self.assertEqual(utils.get_weather_for_place(place), {"error": "Weather service unreachable."})
+
+
+# ---------------------- weather_prefetch ----------------------
+
+def fake_weather_many(points):
+    return [{"temp": round(lat), "city": None} for lat, _ in points]
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PLACE_GEOCODE_ON_SAVE=False,
+                   WEATHER_PREFETCH_INTERVAL=0, WEATHER_PREFETCH_BATCH_SIZE=2)
+class WeatherPrefetchTests(TestCase):
+    def setUp(self):
+        caches["shared"].clear()
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir, ignore_errors=True)
+        self.enterContext(override_settings(LOCK_DIR=lock_dir))
+
+        now = timezone.now()
+        soon, later, past = now + timedelta(days=1), now + timedelta(days=2), now - timedelta(days=1)
+
+        def place(name, city, lat=None, lon=None):
+            return Place.objects.create(name=name, city=city, latitude=lat, longitude=lon,
+                                        geocoded_city=city if lat is not None else "")
+
+        louvre = place("Louvre", "Paris", 48.8606, 2.3376)
+        orsay = place("Orsay", "Paris", 48.8599, 2.3449)  # same ~1 km cell as the Louvre
+        colosseum = place("Colosseum", "Rome", 41.8902, 12.4922)
+        gallery = place("Gallery", "Berlin")  # not geocoded yet
+        tate = place("Tate", "London", 51.5076, -0.0994)  # only a past event
+        hidden = place("Hidden", "Madrid", 40.4138, -3.6921)  # only an unpublished event
+
+        for venue in (louvre, colosseum, gallery):
+            Event.objects.create(title=venue.name, place=venue, start_date=soon, end_date=later)
+        Event.objects.create(title="Over", place=tate, start_date=past, end_date=past)
+        Event.objects.create(title="Draft", place=hidden, start_date=soon, end_date=later, is_published=False)
+        Workshop.objects.create(title="Sketching", place=orsay, start_time=soon, end_time=later)
+
+    def _prefetch(self, fetch=fake_weather_many, **kwargs):
+        berlin = {"lat": 52.52, "lon": 13.405, "name": "Berlin"}
+        with mock.patch.object(utils, "geocode_city", return_value=berlin), \
+                mock.patch.object(utils, "fetch_current_weather_many", side_effect=fetch) as fetched:
+            return weather_prefetch.prefetch(**kwargs), fetched
+
+    def test_upcoming_locations_are_fetched_in_batches(self):
+        summary, fetched = self._prefetch()
+        self.assertEqual(
+            {k: summary[k] for k in ("places", "geocoded", "locations", "fetched", "requests", "failed")},
+            {"places": 4, "geocoded": 1, "locations": 3, "fetched": 3, "requests": 2, "failed": 0},
+        )
+        self.assertEqual([len(call.args[0]) for call in fetched.call_args_list], [2, 1])
+        self.assertIsNotNone(weather_cache.age(52.52, 13.405))
+
+        summary, fetched = self._prefetch()  # everything is fresh now
+        self.assertEqual((summary["fresh"], summary["requests"]), (3, 0))
+        fetched.assert_not_called()
+
+    def test_rate_limit_ends_the_run(self):
+        response = requests.Response()
+        response.status_code = 429
+        summary, fetched = self._prefetch(fetch=requests.HTTPError(response=response))
+        self.assertEqual((summary["requests"], summary["failed"], summary["fetched"]), (1, 3, 0))
+
+    def test_overlapping_run_is_skipped(self):
+        with locks.held("prefetch_weather"):
+            summary, fetched = self._prefetch()
+        self.assertTrue(summary["locked"])
+        fetched.assert_not_called()
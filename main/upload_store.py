@@ -0,0 +1,157 @@
+"""
+Optional preview copies of images uploaded to the artist identifier.
+
+Files are content-addressed (`uploads/<sha256><ext>`), so the same image is
+stored once and different images can't overwrite each other. Each write
+goes to its own mkstemp() file in the directory and is renamed into place,
+so concurrent requests (threads or processes) never share a temp file and
+never serve half a file.
+
+The directory is bounded: once it holds more than
+ARTIST_UPLOAD_PREVIEW_MAX_FILES previews, the least recently used ones
+(oldest mtime; a re-upload touches the file) are deleted. The trim scans the
+directory, so it runs at most once every ARTIST_UPLOAD_PREVIEW_CLEANUP_INTERVAL
+seconds per process from save_preview(), or on demand with
+`manage.py artist_model trim-previews`. Only content-addressed names are
+candidates, and files still referenced from the database (an
+IdentificationJob's image_url, or any FileField stored under uploads/) are
+never deleted.
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SUBDIR = "uploads"
+STALE_TMP_SECONDS = 3600  # temp files left behind by a crashed write
+
+_PREVIEW_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+
+_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def is_enabled():
+    return getattr(settings, "ARTIST_UPLOAD_KEEP_PREVIEW", True)
+
+
+def max_files():
+    return getattr(settings, "ARTIST_UPLOAD_PREVIEW_MAX_FILES", 500)
+
+
+def cleanup_interval():
+    return getattr(settings, "ARTIST_UPLOAD_PREVIEW_CLEANUP_INTERVAL", 60)
+
+
+def safe_ext(filename, default=".jpg"):
+    ext = os.path.splitext(filename or "")[1].lower()
+    if 1 < len(ext) <= 6 and ext[1:].isalnum():
+        return ext
+    return default
+
+
+def save_preview(uploaded_file, content_hash):
+    """
+    Store (or refresh) the preview copy; returns its public URL.
+    """
+    upload_dir = os.path.join(settings.MEDIA_ROOT, SUBDIR)
+    os.makedirs(upload_dir, exist_ok=True)
+
+    name = content_hash + safe_ext(uploaded_file.name)
+    path = os.path.join(upload_dir, name)
+
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used
+    else:
+        fd, tmp = tempfile.mkstemp(dir=upload_dir, prefix=name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dest:
+                for chunk in uploaded_file.chunks():
+                    dest.write(chunk)
+            os.chmod(tmp, getattr(settings, "FILE_UPLOAD_PERMISSIONS", None) or 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        _maybe_cleanup(upload_dir)
+
+    return settings.MEDIA_URL + SUBDIR + "/" + name
+
+
+def _maybe_cleanup(upload_dir):
+    global _last_cleanup
+    now = time.monotonic()
+    with _lock:
+        if now - _last_cleanup < cleanup_interval():
+            return
+        _last_cleanup = now
+    try:
+        cleanup(upload_dir)
+    except Exception:
+        logger.exception("Upload preview cleanup failed")
+
+
+def referenced_names():
+    """Names under uploads/ that rows in the database still point at."""
+    from django.apps import apps
+    from django.db import models
+
+    from .models import IdentificationJob
+
+    prefix = settings.MEDIA_URL + SUBDIR + "/"
+    names = {
+        url[len(prefix):]
+        for url in IdentificationJob.objects.filter(image_url__startswith=prefix)
+        .values_list("image_url", flat=True)
+    }
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                stored = model._default_manager.filter(**{f"{field.name}__startswith": SUBDIR + "/"})
+                names.update(n[len(SUBDIR) + 1:] for n in stored.values_list(field.name, flat=True))
+    return names
+
+
+def cleanup(upload_dir=None, limit=None):
+    """Delete least-recently-used previews beyond the limit. Returns the count removed."""
+    upload_dir = upload_dir or os.path.join(settings.MEDIA_ROOT, SUBDIR)
+    limit = max_files() if limit is None else limit
+
+    try:
+        entries = [e for e in os.scandir(upload_dir) if e.is_file()]
+    except OSError:
+        return 0
+
+    now = time.time()
+    for entry in entries:
+        if entry.name.endswith(".tmp") and now - entry.stat().st_mtime > STALE_TMP_SECONDS:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    previews = [e for e in entries if _PREVIEW_NAME.match(e.name)]
+    if len(previews) <= limit:
+        return 0
+
+    keep = referenced_names()
+    candidates = sorted((e for e in previews if e.name not in keep), key=lambda e: e.stat().st_mtime)
+    removed = 0
+    for entry in candidates[:len(previews) - limit]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        logger.info("Removed %d old upload previews", removed)
+    return removed
@@ -19,6 +19,7 @@ urlpatterns = [
    # ----- artworks -----
     path('artworks/', views.public_artwork_list_view, name='public_artwork_list'),
     path('artworks/<int:artwork_id>/', views.public_artwork_detail_view, name='public_artwork_detail'),
+    path('artworks/search-by-image/', views.artwork_image_search_view, name='artwork_image_search'),
 
    # ----- workshops -----
     path('workshops', views.public_workshop_list_view, name='public_workshop_list'),
@@ -45,6 +46,12 @@ urlpatterns = [
 
     #---------------------- ml model --------------------------
     path("identify/", views.identify_artist_view, name="identify-artist"),
+    path("identify/jobs/", views.identify_artist_job_view, name="identify-artist-job"),
+    path("identify/jobs/<uuid:job_id>/", views.identify_artist_job_status_view, name="identify-artist-job-status"),
     path("predict-price/", views.price_predict_view, name="predict-price"),
+    path("predict-price/batch/", views.price_batch_view, name="predict-price-batch"),
+    path("predict-price/sweep/", views.price_sweep_view, name="predict-price-sweep"),
+    path("predict-price/explain/", views.price_explain_view, name="predict-price-explain"),
+    path("ml/status/", views.ml_status_view, name="ml-status"),
 
 ]
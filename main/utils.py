@@ -1,9 +1,12 @@
 # main/utils.py
+import colorsys
 import logging
 import requests
 from django.conf import settings
 from urllib.parse import quote_plus
 
+from . import http_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,7 +39,7 @@ def clean_profanity(text: str) -> str:
     url = f"{base_url}?text={quote_plus(text)}"
 
     try:
-        resp = requests.get(
+        resp = http_client.get(
             url,
             headers={"X-Api-Key": api_key},
             timeout=timeout,
@@ -66,6 +69,25 @@ def clean_profanity(text: str) -> str:
         return text
 
 
+# -------- COLOR PALETTE --------
+def hex_to_palette(hex_str: str) -> str:
+    try:
+        hex_str = hex_str.lstrip("#")
+        r = int(hex_str[0:2], 16) / 255.0
+        g = int(hex_str[2:4], 16) / 255.0
+        b = int(hex_str[4:6], 16) / 255.0
+    except Exception:
+        return ""
+
+    h, s, v = colorsys.rgb_to_hsv(r, g, b)
+    hue = h * 360.0
+    if 25 <= hue < 70:   return "Warm Tones"     # yellows/oranges
+    if 70 <= hue < 170:  return "Earthy Tones"   # greens
+    if 170 <= hue < 270: return "Cool Tones"     # blues
+    if hue >= 270 or hue < 25: return "Warm Tones"  # reds/magentas
+    return "Neutral Tones"
+
+
 # -------- WEATHER API --------
 def get_weather_for_city(city: str) -> dict:
     """
@@ -79,90 +101,166 @@ def get_weather_for_city(city: str) -> dict:
         "humidity": 60,
         "wind_speed": 14.5,
         "cloud_pct": 40,
+        "stale": False,   # True: upstream failed, this is the last known value
+        "age_s": 12,      # seconds since it was fetched
     }
     On failure:
     { "error": "..." }
+
+    Both lookups are cached (main/weather_cache.py): city -> coordinates for
+    days, coordinates -> weather for WEATHER_CACHE_TTL seconds.
     """
+    from . import weather_cache
 
     if not city:
         return {"error": "No city provided."}
 
-    try:
-        # 1) Geocode city -> lat/lon
-        geo_url = (
-            f"{settings.OPENMETEO_GEOCODE_URL}"
-            f"?name={quote_plus(city)}&count=1"
-        )
+    location = weather_cache.location_for_city(city, geocode_city)
+    if "error" in location:
+        return {"error": location["error"]}  # without the internal "temporary" flag
+    return weather_cache.weather_at(location, fetch_current_weather)
 
-        geo_resp = requests.get(
-            geo_url,
-            timeout=settings.OPENMETEO_TIMEOUT,
-        )
 
-        if geo_resp.status_code != 200:
-            logger.error(
-                "Geocoding non-200: %s %s",
-                geo_resp.status_code,
-                geo_resp.text[:200],
-            )
+def get_weather_for_place(place) -> dict:
+    """
+    Like get_weather_for_city, for an events.Place: when the place already
+    has stored coordinates (events/geocoding.py) the geocoding step is
+    skipped and only the (cached) weather call is made. A city the geocoder
+    already reported as unknown isn't looked up again.
+    """
+    from . import weather_cache
+
+    if place is None:
+        return {"error": "No city provided."}
+    if not place.has_coordinates:
+        if place.city.strip() and place.geocoded_city == place.city:
             return {"error": "Could not locate city."}
+        return get_weather_for_city(place.city)
+
+    location = {
+        "lat": float(place.latitude),
+        "lon": float(place.longitude),
+        "name": place.geocoded_name or place.city,
+    }
+    return weather_cache.weather_at(location, fetch_current_weather)
+
 
-        geo_json = geo_resp.json()
-        results = geo_json.get("results")
-        if not results:
-            return {"error": "City not found."}
-
-        first = results[0]
-        lat = first.get("latitude")
-        lon = first.get("longitude")
-        resolved_name = first.get("name")  # use normalized/pretty name if available
-        if lat is None or lon is None:
-            return {"error": "Invalid location data."}
-
-        # 2) Fetch current weather
-        # We'll ask for current weather + humidity, etc.
-        weather_url = (
-            f"{settings.OPENMETEO_WEATHER_URL}"
-            f"?latitude={lat}&longitude={lon}"
-            f"&current=temperature_2m,relative_humidity_2m,wind_speed_10m,cloud_cover"
-            f"&timezone=auto"
+def geocode_city(city: str) -> dict:
+    """
+    City name -> {"lat": ..., "lon": ..., "name": ...} via Open-Meteo geocoding.
+    { "error": "..." } if the city is unknown; raises requests.RequestException
+    if the service can't be reached.
+    """
+    geo_url = (
+        f"{settings.OPENMETEO_GEOCODE_URL}"
+        f"?name={quote_plus(city)}&count=1"
+    )
+
+    geo_resp = http_client.get(
+        geo_url,
+        timeout=settings.OPENMETEO_TIMEOUT,
+    )
+
+    if geo_resp.status_code != 200:
+        logger.error(
+            "Geocoding non-200: %s %s",
+            geo_resp.status_code,
+            geo_resp.text[:200],
         )
+        raise requests.HTTPError(f"Geocoding returned {geo_resp.status_code}", response=geo_resp)
+
+    geo_json = geo_resp.json()
+    results = geo_json.get("results")
+    if not results:
+        return {"error": "City not found."}
 
-        w_resp = requests.get(
-            weather_url,
-            timeout=settings.OPENMETEO_TIMEOUT,
+    first = results[0]
+    lat = first.get("latitude")
+    lon = first.get("longitude")
+    if lat is None or lon is None:
+        return {"error": "Invalid location data."}
+
+    # use normalized/pretty name if available
+    return {"lat": lat, "lon": lon, "name": first.get("name") or city}
+
+
+def fetch_current_weather(lat, lon) -> dict:
+    """
+    Current weather at (lat, lon) in the frontend's shape (without "city").
+    Raises requests.RequestException if Open-Meteo can't be reached or errors.
+    """
+    # We'll ask for current weather + humidity, etc.
+    weather_url = (
+        f"{settings.OPENMETEO_WEATHER_URL}"
+        f"?latitude={lat}&longitude={lon}"
+        f"&current=temperature_2m,relative_humidity_2m,wind_speed_10m,cloud_cover"
+        f"&timezone=auto"
+    )
+
+    w_resp = http_client.get(
+        weather_url,
+        timeout=settings.OPENMETEO_TIMEOUT,
+    )
+
+    if w_resp.status_code != 200:
+        logger.error(
+            "Weather non-200: %s %s",
+            w_resp.status_code,
+            w_resp.text[:200],
         )
+        raise requests.HTTPError(f"Weather returned {w_resp.status_code}", response=w_resp)
 
-        if w_resp.status_code != 200:
-            logger.error(
-                "Weather non-200: %s %s",
-                w_resp.status_code,
-                w_resp.text[:200],
-            )
-            return {"error": "Could not fetch weather."}
-
-        w_json = w_resp.json()
-        current = w_json.get("current", {})
-
-        temp_c = current.get("temperature_2m")
-        humidity = current.get("relative_humidity_2m")
-        wind_speed = current.get("wind_speed_10m")
-        cloud_pct = current.get("cloud_cover")
-
-        # Open-Meteo does not give 'feels_like' in this endpoint.
-        # We'll just reuse temp as feels_like for display
-        feels_like = temp_c
-
-        return {
-            "ok": True,
-            "city": resolved_name or city,
-            "temp": temp_c,
-            "feels_like": feels_like,
-            "humidity": humidity,
-            "wind_speed": wind_speed,
-            "cloud_pct": cloud_pct,
-        }
+    return current_weather_fields(w_resp.json().get("current", {}))
 
-    except requests.RequestException as e:
-        logger.exception("Weather request failed: %s", e)
-        return {"error": "Weather service unreachable."}
\ No newline at end of file
+
+def fetch_current_weather_many(points) -> list:
+    """
+    Current weather at several (lat, lon) points with one Open-Meteo request
+    (comma-separated coordinate lists). Returns one dict per point, in order,
+    shaped like fetch_current_weather. Raises requests.RequestException on
+    failure.
+    """
+    if not points:
+        return []
+    weather_url = (
+        f"{settings.OPENMETEO_WEATHER_URL}"
+        f"?latitude={','.join(str(lat) for lat, _ in points)}"
+        f"&longitude={','.join(str(lon) for _, lon in points)}"
+        f"&current=temperature_2m,relative_humidity_2m,wind_speed_10m,cloud_cover"
+        f"&timezone=auto"
+    )
+
+    w_resp = http_client.get(
+        weather_url,
+        timeout=settings.OPENMETEO_TIMEOUT,
+    )
+
+    if w_resp.status_code != 200:
+        logger.error(
+            "Weather non-200: %s %s",
+            w_resp.status_code,
+            w_resp.text[:200],
+        )
+        raise requests.HTTPError(f"Weather returned {w_resp.status_code}", response=w_resp)
+
+    body = w_resp.json()
+    results = body if isinstance(body, list) else [body]  # a single point comes back unwrapped
+    if len(results) != len(points):
+        raise requests.RequestException(f"Weather returned {len(results)} results for {len(points)} points")
+    return [current_weather_fields(r.get("current", {})) for r in results]
+
+
+def current_weather_fields(current: dict) -> dict:
+    """Open-Meteo "current" block -> the fields the frontend shows."""
+    temp_c = current.get("temperature_2m")
+
+    # Open-Meteo does not give 'feels_like' in this endpoint.
+    # We'll just reuse temp as feels_like for display
+    return {
+        "ok": True,
+        "temp": temp_c,
+        "feels_like": temp_c,
+        "humidity": current.get("relative_humidity_2m"),
+        "wind_speed": current.get("wind_speed_10m"),
+        "cloud_pct": current.get("cloud_cover"),
+    }
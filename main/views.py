@@ -6,29 +6,46 @@ from workshops.models import Workshop
 from .forms import ImageGenerateForm, BackgroundRemoveForm , ImageEditorForm
 from django.utils import timezone
 from django.shortcuts import  redirect
+from django.urls import reverse
 from django.contrib import messages
 import base64
 import requests
-from django.db.models import Q
+from django.db.models import F, Q
 from gallery.models import Artwork
+from gallery import similarity
 import json
-from django.http import JsonResponse
+import logging
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.shortcuts import render
-from groq import Groq
 from .utils import clean_profanity
-from .utils import get_weather_for_city
+from .utils import get_weather_for_place
+from .utils import hex_to_palette
 import os
 from django.conf import settings
 from django.shortcuts import render
 from .forms import ArtUploadForm
 from .ml_model import predict_image
-from .forms import PriceForm
+from .ml_model import manager as artist_model_manager
+from .ml_model import get_batcher as get_artist_batcher
+from .ml_model import ImageTooLarge
+from .forms import PriceForm, PriceBatchUploadForm
 from .price_ml import predict_price
-import colorsys
-
-
+from .price_ml import status as price_model_status
+from . import prediction_cache
+from . import price_cache
+from . import model_registry
+from . import upload_store
+from . import ml_gate
+from . import identify_jobs
+from . import inference_client
+from . import price_batch
+from . import price_sweep
+from . import price_explain
+from . import http_client
+
+logger = logging.getLogger(__name__)
 
 
 FACEPP_API_KEY = "jzgXwXuwHh0xrjV-EG3aAo6G9fvjleK8"
@@ -64,8 +81,7 @@ def public_event_weather_view(request, event_id):
         is_published=True
     )
 
-    city = event.place.city if event.place and event.place.city else ""
-    weather_data = get_weather_for_city(city)
+    weather_data = get_weather_for_place(event.place)
 
     return JsonResponse(weather_data)
 
@@ -112,10 +128,20 @@ def public_article_detail_view(request, article_id):
 def public_artwork_list_view(request):
     """
     Show all visible artworks to visitors.
+    ?sort=price / price_asc orders by the stored estimate (gallery.pricing).
     """
-    artworks = Artwork.objects.filter(is_visible=True).order_by('-created_at')
+    sort = request.GET.get('sort', '').strip()
+    artworks = Artwork.objects.filter(is_visible=True)
+    if sort == 'price':
+        artworks = artworks.order_by(F('estimated_price').desc(nulls_last=True), '-created_at')
+    elif sort == 'price_asc':
+        artworks = artworks.order_by(F('estimated_price').asc(nulls_last=True), '-created_at')
+    else:
+        sort = ''
+        artworks = artworks.order_by('-created_at')
     return render(request, 'main/artwork/public_artwork_list.html', {
-        'artworks': artworks
+        'artworks': artworks,
+        'sort': sort,
     })
 
 
@@ -185,14 +211,57 @@ def public_artwork_detail_view(request, artwork_id):
     # 4. Prefill name in form if logged in
     initial_name = request.user.username if request.user.is_authenticated else ""
 
+    # 5. "more like this" from the precomputed similarity index (no model run)
+    similar = similarity.similar_artworks(artwork, k=6)
+
     context = {
         "artwork": artwork,
         "approved_feedback": approved_feedback,
         "initial_name": initial_name,
+        "similar_artworks": similar,
     }
     return render(request, "main/artwork/public_artwork_detail.html", context)
 
 
+def artwork_image_search_view(request):
+    """
+    POST multipart { image: <file> }
+    Returns the visually closest visible artworks as JSON.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+
+    form = ArtUploadForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({"error": "Please upload a valid image."}, status=400)
+
+    try:
+        with ml_gate.slot():
+            hits = similarity.search_by_image(form.cleaned_data["image"], k=12)
+    except ml_gate.Saturated as e:
+        return ml_gate.busy_response(e, json=True)
+    except ImageTooLarge as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception:
+        logger.exception("Image search failed")
+        return JsonResponse({"error": "Search failed, please try again later."}, status=500)
+
+    return JsonResponse({
+        "status": "ok",
+        "count": len(hits),
+        "artworks": [
+            {
+                "id": art.id,
+                "title": art.title,
+                "artist": art.artist,
+                "image_url": art.image.url if art.image else None,
+                "score": round(score, 4),
+            }
+            for art, score in hits
+        ],
+    })
+
+
 
 
 # ---------------------- workshops --------------------------
@@ -226,8 +295,7 @@ def public_workshop_weather_view(request, workshop_id):
         is_active=True
     )
 
-    city = workshop.place.city if workshop.place and workshop.place.city else ""
-    weather_data = get_weather_for_city(city)
+    weather_data = get_weather_for_place(workshop.place)
 
     return JsonResponse(weather_data)
 
@@ -263,7 +331,7 @@ def ai_image_generator_page(request):
             prompt = form.cleaned_data["prompt"]
 
             try:
-                resp = requests.post(
+                resp = http_client.post(
                     "https://api.deepai.org/api/text2img",
                     data={'text': prompt},
                     headers={'api-key': settings.DEEPAI_API_KEY},
@@ -309,7 +377,7 @@ def ai_background_remover_page(request):
             api_key = getattr(settings, "DEEPAI_API_KEY", None) or "94242180-9293-4b4f-af09-f9e3fe00b173"
 
             try:
-                resp = requests.post(
+                resp = http_client.post(
                     "https://api.deepai.org/api/background-remover",
                     headers={"api-key": api_key},
                     files={
@@ -359,7 +427,7 @@ def ai_photo_editor_page(request):
             api_key = getattr(settings, "DEEPAI_API_KEY", None) or "94242180-9293-4b4f-af09-f9e3fe00b173"
 
             try:
-                resp = requests.post(
+                resp = http_client.post(
                     "https://api.deepai.org/api/image-editor",
                     headers={"api-key": api_key},
                     files={
@@ -444,7 +512,7 @@ def emotion_analyze(request):
 
     # Call Face++
     try:
-        face_resp = requests.post(
+        face_resp = http_client.post(
             "https://api-us.faceplusplus.com/facepp/v3/detect",
             data=data,
             files=files,
@@ -589,9 +657,6 @@ def ai_chat_send(request):
     if not user_message:
         return JsonResponse({"error": "Empty message"}, status=400)
 
-    # init Groq client
-    client = Groq(api_key=getattr(settings, "GROQ_API_KEY", None))
-
     # Build messages list.
     # For now we give minimal context: a system-style intro + latest user message.
     # You can later extend this to include previous turns (chat history).
@@ -607,6 +672,8 @@ def ai_chat_send(request):
     ]
 
     try:
+        # one Groq client per process: its connections stay open between messages
+        client = http_client.groq_client()
         completion = client.chat.completions.create(
             model="openai/gpt-oss-20b",
             messages=groq_messages,
@@ -632,6 +699,27 @@ def ai_chat_send(request):
 
 # ---------------------- ml model for artist prediction --------------------------
 
+def ml_status_view(request):
+    """
+    Ops endpoint (staff only): readiness / load state of the in-process models.
+    """
+    if not (request.user.is_authenticated and (request.user.is_staff or request.user.is_superuser)):
+        return JsonResponse({"error": "Forbidden"}, status=403)
+
+    batcher = get_artist_batcher()
+    return JsonResponse({
+        "artist_model": artist_model_manager.status(),
+        "artist_batching": batcher.stats() if batcher else None,
+        "artist_prediction_cache": prediction_cache.stats(),
+        "ml_gate": {**ml_gate.gate.stats(), "enabled": ml_gate.is_enabled(), "torch_threads": ml_gate.thread_budget()},
+        "identify_jobs": {"pending_in_process": identify_jobs.pending(), "max_pending": identify_jobs.max_pending()},
+        "price_model": price_model_status(),
+        "price_cache": price_cache.stats(),
+        "model_registry": model_registry.status(),
+        "inference_server": inference_client.status(),
+    })
+
+
 def identify_artist_view(request):
     context = {
         "form": ArtUploadForm(),
@@ -646,22 +734,35 @@ def identify_artist_view(request):
             # 1. get uploaded file
             img_file = form.cleaned_data["image"]
 
-            # 2. save it to media/uploads/
-            upload_dir = os.path.join(settings.MEDIA_ROOT, "uploads")
-            os.makedirs(upload_dir, exist_ok=True)
-
-            file_path = os.path.join(upload_dir, img_file.name)
-
-            # Write file to disk
-            with open(file_path, "wb+") as dest:
-                for chunk in img_file.chunks():
-                    dest.write(chunk)
-
-            # 3. run prediction
-            result = predict_image(file_path)
-
-            # 4. build public URL so we can display the uploaded image back to user
-            uploaded_image_url = settings.MEDIA_URL + "uploads/" + img_file.name
+            # 2. hash the bytes: key for the prediction cache + preview file name
+            content_hash = prediction_cache.hash_upload(img_file)
+
+            # 3. cached prediction, or run the model straight from the upload
+            #    (decoded from memory, no disk round-trip)
+            result = None
+            version = None
+            if prediction_cache.is_enabled():
+                version = prediction_cache.model_version()
+                if version:
+                    result = prediction_cache.get(content_hash, version)
+
+            if result is None:
+                try:
+                    with ml_gate.slot():
+                        result = predict_image(img_file)
+                except ml_gate.Saturated as e:
+                    return ml_gate.busy_response(e)
+                except ImageTooLarge as e:
+                    context["form"] = form
+                    context["error"] = str(e)
+                    return render(request, "main/Ml/upload.html", context)
+                if version:
+                    prediction_cache.put(content_hash, version, result)
+
+            # 4. optional preview copy so we can display the image back to the user
+            uploaded_image_url = None
+            if upload_store.is_enabled():
+                uploaded_image_url = upload_store.save_preview(img_file, content_hash)
 
             context["form"] = ArtUploadForm()  # empty form again
             context["result"] = result
@@ -677,6 +778,36 @@ def identify_artist_view(request):
     return render(request, "main/Ml/upload.html", context)
 
 
+def identify_artist_job_view(request):
+    """
+    POST multipart { image: <file> }
+    Queues an identification and answers at once (202) with the job id;
+    poll `status_url` until status is done / error / expired.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+
+    form = ArtUploadForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({"error": "Please upload a valid image."}, status=400)
+
+    try:
+        job = identify_jobs.submit(form.cleaned_data["image"])
+    except ml_gate.Saturated as e:
+        return ml_gate.busy_response(e, json=True)
+
+    data = identify_jobs.as_dict(job)
+    data["status_url"] = reverse("identify-artist-job-status", args=[job.id])
+    return JsonResponse(data, status=202)
+
+
+def identify_artist_job_status_view(request, job_id):
+    job = identify_jobs.get(job_id)
+    if job is None:
+        return JsonResponse({"error": "Unknown or expired job"}, status=404)
+    return JsonResponse(identify_jobs.as_dict(job))
+
+
 
 
 #--------------------------- price prediction -----------------------------
@@ -698,23 +829,6 @@ def price_predict_view(request):
 
 
 
-def _hex_to_palette(hex_str: str) -> str:
-    try:
-        hex_str = hex_str.lstrip("#")
-        r = int(hex_str[0:2], 16) / 255.0
-        g = int(hex_str[2:4], 16) / 255.0
-        b = int(hex_str[4:6], 16) / 255.0
-    except Exception:
-        return ""
-
-    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-    hue = h * 360.0
-    if 25 <= hue < 70:   return "Warm Tones"     # yellows/oranges
-    if 70 <= hue < 170:  return "Earthy Tones"   # greens
-    if 170 <= hue < 270: return "Cool Tones"     # blues
-    if hue >= 270 or hue < 25: return "Warm Tones"  # reds/magentas
-    return "Neutral Tones"
-
 def price_predict_view(request):
     # use one 'form' variable for both GET and POST to keep the template happy
     form = PriceForm(request.POST or None)
@@ -725,10 +839,14 @@ def price_predict_view(request):
 
         # If user picked a color on the wheel but didn’t set a palette, auto-fill it
         if not data.get("color_palette") and data.get("color_hex"):
-            data["color_palette"] = _hex_to_palette(data["color_hex"])
+            data["color_palette"] = hex_to_palette(data["color_hex"])
 
         # IMPORTANT: keep your model’s expected keys (we already match them in price_ml.predict_price)
-        prediction = predict_price(data)
+        try:
+            with ml_gate.slot():
+                prediction = predict_price(data)
+        except ml_gate.Saturated as e:
+            return ml_gate.busy_response(e)
 
     return render(request, "main/Ml/price_predict.html", {
         "form": form,
@@ -736,3 +854,102 @@ def price_predict_view(request):
     })
 
 
+def price_batch_view(request):
+    """Upload a CSV/XLSX of artworks, get the same file back with a predicted price per row."""
+    form = PriceBatchUploadForm(request.POST or None, request.FILES or None)
+    if request.method == "POST" and form.is_valid():
+        upload = form.cleaned_data["file"]
+        try:
+            kind, header, rows = price_batch.open_sheet(upload)
+            mapping = price_batch.column_map(header)
+        except price_batch.SheetError as e:
+            form.add_error("file", str(e))
+        else:
+            # price everything inside the slot, then write the file without holding it
+            try:
+                with ml_gate.slot():
+                    priced = list(price_batch.priced_rows(rows, mapping))
+            except ml_gate.Saturated as e:
+                return ml_gate.busy_response(e)
+
+            stem = os.path.splitext(os.path.basename(upload.name))[0] or "artworks"
+            if kind == "csv":
+                response = StreamingHttpResponse(
+                    price_batch.csv_chunks(header, priced),
+                    content_type="text/csv; charset=utf-8",
+                )
+                response["Content-Disposition"] = f'attachment; filename="{stem}_priced.csv"'
+                return response
+
+            response = HttpResponse(
+                price_batch.xlsx_bytes(header, priced),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+            response["Content-Disposition"] = f'attachment; filename="{stem}_priced.xlsx"'
+            return response
+
+    return render(request, "main/Ml/price_batch.html", {
+        "form": form,
+        "max_rows": price_batch.max_rows(),
+        "columns": list(price_batch.COLUMNS.values()),
+    })
+
+
+@csrf_exempt
+def price_sweep_view(request):
+    """
+    POST {"base": {<PriceForm fields>}, "vary": [{"field": "medium"}, {"field": "size", "values": [...]}]}
+    -> the predicted price over the grid, scored in one pipeline call (see price_sweep).
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only", "fields": price_sweep.sweepable_fields()}, status=405)
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    try:
+        axes, samples = price_sweep.grid(payload)
+    except price_sweep.SweepError as e:
+        return JsonResponse({"error": e.args[0]}, status=400)
+
+    try:
+        with ml_gate.slot():
+            surface = price_sweep.surface(axes, samples)
+    except ml_gate.Saturated as e:
+        return ml_gate.busy_response(e, json=True)
+    return JsonResponse(surface)
+
+
+@csrf_exempt
+def price_explain_view(request):
+    """
+    POST {"sample": {<PriceForm fields>}, "method": "shapley"|"occlusion", "samples": 16}
+    -> per-input contributions to the predicted price (see price_explain).
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only", "methods": list(price_explain.METHODS)}, status=405)
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "Expected a JSON object."}, status=400)
+
+    try:
+        sample = price_sweep.base_sample(payload.get("sample") or {})
+    except price_sweep.SweepError as e:
+        return JsonResponse({"error": e.args[0]}, status=400)
+
+    try:
+        with ml_gate.slot():
+            result = price_explain.explain(
+                sample,
+                method=payload.get("method", "shapley"),
+                samples=payload.get("samples", 16),
+            )
+    except price_explain.ExplainError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except ml_gate.Saturated as e:
+        return ml_gate.busy_response(e, json=True)
+    return JsonResponse(result)
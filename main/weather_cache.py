@@ -0,0 +1,236 @@
+"""
+Cached current weather for the event / workshop detail pages.
+
+Every detail page asks for the weather of its place's city, and many
+visitors look at places in the same few cities, so upstream calls are
+shared instead of made per page view:
+
+- city -> coordinates (geocoding) is cached for WEATHER_GEOCODE_TTL
+  (unknown cities for WEATHER_GEOCODE_MISS_TTL)
+- coordinates -> weather is cached per location (lat/lon rounded to
+  ~1 km) and counts as fresh for WEATHER_CACHE_TTL; the entry itself is
+  kept for WEATHER_STALE_TTL as the last known value
+- single flight: concurrent misses for one key make one upstream call.
+  Threads of a process wait on the same call (and get its exception, if it
+  raised); other processes wait up to WEATHER_COALESCE_WAIT seconds for the
+  one holding the cache lock. The lock is a cache.add: atomic on redis,
+  best effort with the file backend (two processes may both fetch)
+- when upstream fails, the last known value is served with "stale": True,
+  and nobody calls upstream for that location again for
+  WEATHER_FAILURE_BACKOFF seconds
+
+Entries live in CACHES["shared"] (redis, or files on this host), so they
+are shared by all workers and by `manage.py prefetch_weather`
+(weather_prefetch.py), which fills them ahead of time for every upcoming
+event / workshop place.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = "shared"
+cache = ConnectionProxy(caches, CACHE_ALIAS)
+
+_PREFIX = "weather:"
+_POLL_INTERVAL = 0.05
+
+_flights_lock = threading.Lock()
+_flights = {}  # key -> _Flight
+
+
+def is_shared():
+    """False if CACHES["shared"] is per process (LocMemCache / DummyCache), so nothing is shared."""
+    from django.core.cache.backends.dummy import DummyCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    return not isinstance(caches[CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def ttl():
+    return getattr(settings, "WEATHER_CACHE_TTL", 600)
+
+
+def stale_ttl():
+    return getattr(settings, "WEATHER_STALE_TTL", 24 * 3600)
+
+
+def location_key(lat, lon):
+    return f"{float(lat):.2f},{float(lon):.2f}"
+
+
+def _city_key(city):
+    normalized = " ".join(city.lower().split())
+    return f"{_PREFIX}geo:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+# ---------------------- single flight ----------------------
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _single_flight(key, fn):
+    """Run fn() once per key at a time in this process; concurrent callers get its result."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    try:
+        flight.result = fn()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _coalesced(key, lookup, fetch):
+    """
+    lookup() from the cache; on a miss, one process runs fetch() while the
+    others wait (up to WEATHER_COALESCE_WAIT) for its result to appear.
+    """
+    lock = key + ":lock"
+    if cache.add(lock, 1, timeout=getattr(settings, "WEATHER_LOCK_TIMEOUT", 30)):
+        try:
+            return fetch()
+        finally:
+            cache.delete(lock)
+
+    deadline = time.monotonic() + getattr(settings, "WEATHER_COALESCE_WAIT", 5)
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        found = lookup()
+        if found is not None:
+            return found
+        if cache.get(lock) is None:
+            break  # the other process finished without a result (or died)
+    return fetch()
+
+
+# ---------------------- geocoding ----------------------
+
+def location_for_city(city, geocode):
+    """
+    City name -> {"lat", "lon", "name"} (or {"error": ...}), cached.
+    `geocode(city)` does the upstream lookup (utils.geocode_city). Errors
+    from an unreachable service are marked "temporary" and not cached.
+    """
+    key = _city_key(city)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        found = cache.get(key)  # filled while we waited for the lock
+        if found is not None:
+            return found
+        try:
+            location = geocode(city)
+        except requests.RequestException as e:
+            logger.warning("Geocoding %r failed: %s", city, e)
+            return {"error": _failure_message(e, "Could not locate city."), "temporary": True}
+        if "error" in location:
+            cache.set(key, location, timeout=getattr(settings, "WEATHER_GEOCODE_MISS_TTL", 3600))
+        else:
+            cache.set(key, location, timeout=getattr(settings, "WEATHER_GEOCODE_TTL", 7 * 24 * 3600))
+        return location
+
+    return _single_flight(key, lambda: _coalesced(key, lambda: cache.get(key), fetch))
+
+
+# ---------------------- weather ----------------------
+
+def _entry_key(lat, lon):
+    return f"{_PREFIX}now:{location_key(lat, lon)}"
+
+
+def store(lat, lon, data, fetched_at=None):
+    """Cache `data` (utils.current_weather_fields shape) as the weather at (lat, lon)."""
+    entry = {"data": data, "fetched_at": fetched_at or time.time()}
+    cache.set(_entry_key(lat, lon), entry, timeout=stale_ttl())
+    return entry
+
+
+def age(lat, lon):
+    """Seconds since the cached weather at (lat, lon) was fetched, or None."""
+    entry = cache.get(_entry_key(lat, lon))
+    return None if entry is None else time.time() - entry["fetched_at"]
+
+
+def _fresh(entry):
+    return entry is not None and time.time() - entry["fetched_at"] < ttl()
+
+
+def _response(entry, location, stale):
+    return dict(
+        entry["data"],
+        city=location.get("name"),
+        stale=stale,
+        age_s=int(time.time() - entry["fetched_at"]),
+    )
+
+
+def weather_at(location, fetch_weather):
+    """
+    Current weather at location {"lat", "lon", "name"}, cached and coalesced.
+    `fetch_weather(lat, lon)` does the upstream call (utils.fetch_current_weather).
+    """
+    lat, lon = location["lat"], location["lon"]
+    key = _entry_key(lat, lon)
+    entry = cache.get(key)
+    if _fresh(entry):
+        return _response(entry, location, stale=False)
+
+    backoff_key = key + ":down"
+    if entry is not None and cache.get(backoff_key):
+        return _response(entry, location, stale=True)  # upstream failed a moment ago
+
+    def lookup():
+        found = cache.get(key)
+        return found if _fresh(found) else None
+
+    def fetch():
+        found = lookup()
+        if found is not None:
+            return found
+        if cache.get(backoff_key):
+            return {"error": "Weather service unreachable."}  # another process just failed
+        try:
+            return store(lat, lon, fetch_weather(lat, lon))
+        except requests.RequestException as e:
+            logger.warning("Weather for %s failed: %s", location_key(lat, lon), e)
+            cache.set(backoff_key, 1, timeout=getattr(settings, "WEATHER_FAILURE_BACKOFF", 30))
+            return {"error": _failure_message(e, "Could not fetch weather.")}
+
+    result = _single_flight(key, lambda: _coalesced(key, lookup, fetch))
+    if "error" not in result:
+        return _response(result, location, stale=False)
+
+    last = cache.get(key)
+    if last is not None:
+        return _response(last, location, stale=True)
+    return result
+
+
+def _failure_message(exc, http_message):
+    return http_message if isinstance(exc, requests.HTTPError) else "Weather service unreachable."
@@ -0,0 +1,152 @@
+"""
+Weather for upcoming events and workshops, fetched ahead of page views.
+
+`manage.py prefetch_weather` (run from cron more often than
+WEATHER_CACHE_TTL, e.g. every 5 minutes) collects the places of published
+events and active workshops that haven't ended, and stores the current
+weather of each distinct location in weather_cache, so the detail pages'
+weather calls are cache hits. That only works if the web workers read the
+same cache, so it refuses to run when CACHES["shared"] is per process:
+
+- places without coordinates are geocoded first (events/geocoding.py), one
+  lookup per distinct city
+- locations are de-duplicated on weather_cache's ~1 km key; ones fetched
+  less than WEATHER_PREFETCH_MIN_AGE seconds ago are skipped
+- Open-Meteo takes comma-separated coordinate lists, so up to
+  WEATHER_PREFETCH_BATCH_SIZE locations go in one request
+- upstream requests are at least WEATHER_PREFETCH_INTERVAL seconds apart,
+  and a 429 ends the run (the next one picks up the rest)
+- overlapping runs on this host are prevented with a lock (main/locks.py)
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import locks, weather_cache
+
+logger = logging.getLogger(__name__)
+
+_LOCK_NAME = "prefetch_weather"
+
+
+def batch_size():
+    return getattr(settings, "WEATHER_PREFETCH_BATCH_SIZE", 50)
+
+
+def min_age():
+    return getattr(settings, "WEATHER_PREFETCH_MIN_AGE", 300)
+
+
+class _Pacer:
+    """Spaces calls at least `interval` seconds apart."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._last = None
+
+    def wait(self):
+        if self._last is not None:
+            delay = self._last + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._last = time.monotonic()
+
+
+def upcoming_places():
+    """Places of published events and active workshops that haven't ended yet."""
+    from events.models import Event, Place
+    from workshops.models import Workshop
+
+    now = timezone.now()
+    events = Event.objects.filter(is_published=True, end_date__gte=now).values("place_id")
+    workshops = Workshop.objects.filter(is_active=True, end_time__gte=now).values("place_id")
+    return Place.objects.filter(Q(id__in=events) | Q(id__in=workshops))
+
+
+def locations(places):
+    """Distinct locations of `places` that have coordinates: {location key: (lat, lon)}."""
+    out = {}
+    for lat, lon in places.exclude(latitude=None).exclude(longitude=None).values_list("latitude", "longitude"):
+        point = (float(lat), float(lon))
+        out.setdefault(weather_cache.location_key(*point), point)
+    return out
+
+
+def prefetch(force=False, size=None, dry_run=False, progress=None):
+    """Fetch and cache the weather of every upcoming location. Returns a summary dict."""
+    summary = {"places": 0, "geocoded": 0, "locations": 0, "fresh": 0,
+               "fetched": 0, "failed": 0, "requests": 0, "locked": False}
+    if dry_run:
+        return _prefetch(summary, force, size, dry_run, progress)
+    with locks.held(_LOCK_NAME) as acquired:
+        if not acquired:
+            summary["locked"] = True  # another run is still going
+            return summary
+        return _prefetch(summary, force, size, dry_run, progress)
+
+
+def _prefetch(summary, force, size, dry_run, progress):
+    from events import geocoding
+
+    started = time.perf_counter()
+    pacer = _Pacer(getattr(settings, "WEATHER_PREFETCH_INTERVAL", 1.0))
+    places = upcoming_places()
+    summary["places"] = places.count()
+
+    pending = places.filter(id__in=geocoding.unresolved().values("id"))
+    if not dry_run and pending.exists():
+        # backfill reports after each city it looked up; pace the next one from there
+        summary["geocoded"] = geocoding.backfill(pending, progress=lambda *_: pacer.wait())["places"]
+
+    todo = locations(places)
+    summary["locations"] = len(todo)
+    if not force:
+        for key, point in list(todo.items()):
+            age = weather_cache.age(*point)
+            if age is not None and age < min_age():
+                del todo[key]
+                summary["fresh"] += 1
+
+    points = list(todo.values())
+    size = size or batch_size()
+    for start in range(0, len(points), size):
+        batch = points[start:start + size]
+        if dry_run:
+            summary["requests"] += 1
+            continue
+        if not _fetch_batch(batch, pacer, summary):
+            summary["failed"] += len(points) - start - len(batch)
+            break
+        if progress:
+            progress(start + len(batch), len(points))
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def _fetch_batch(batch, pacer, summary):
+    """One multi-location request; False if the run should stop (rate limited)."""
+    from .utils import fetch_current_weather_many
+
+    pacer.wait()
+    summary["requests"] += 1
+    try:
+        results = fetch_current_weather_many(batch)
+    except requests.RequestException as e:
+        summary["failed"] += len(batch)
+        response = getattr(e, "response", None)
+        if response is not None and response.status_code == 429:
+            logger.warning("Weather prefetch rate limited; stopping this run")
+            return False
+        logger.warning("Weather prefetch of %d locations failed: %s", len(batch), e)
+        return True
+
+    fetched_at = time.time()
+    for (lat, lon), data in zip(batch, results):
+        weather_cache.store(lat, lon, data, fetched_at=fetched_at)
+    summary["fetched"] += len(batch)
+    return True